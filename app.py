@@ -5,7 +5,7 @@ import pandas as pd
 from datetime import datetime
 import numpy as np
 
-from config.settings import PAGE_CONFIG, MEXICAN_CLIMATE_ZONES, VARIABLES, CIUDADES_NASA
+from config.settings import PAGE_CONFIG, MEXICAN_CLIMATE_ZONES, VARIABLES, CIUDADES_NASA, DATA_CONFIG
 from styles.custom_styles import get_custom_css, get_climate_badge
 from components import (
     render_sidebar,
@@ -28,6 +28,8 @@ from data.precipitation_analyzer import PrecipitationAnalyzer, integrate_with_pr
 from data.wind_analyzer import WindAnalyzer, integrate_wind_with_processor
 from data.humidity_analyzer import HumidityAnalyzer, integrate_humidity_with_processor
 from data.cloudiness_analyzer import CloudinessAnalyzer, integrate_cloudiness_with_processor
+from data.snapshot import load_snapshot
+from data.station_interpolation import point_stations
 
 # Configuración de página
 st.set_page_config(
@@ -44,27 +46,54 @@ if 'selected_city_key' not in st.session_state:
     st.session_state.selected_city_key = 'veracruz'
 
 # INICIALIZAR PROCESADORES
+@st.cache_resource
+def init_snapshot():
+    # Estado listo para servir (python -m data.snapshot); None si falta o está viejo
+    return load_snapshot(
+        DATA_CONFIG['snapshot_path'],
+        settings={'interpolation': DATA_CONFIG['interpolation']}
+    )
+
 @st.cache_resource
 def init_processor():
-    processor = CSVProcessorOptimized()
-    processor.load_all_csvs()
+    snapshot = init_snapshot()
+    if snapshot:
+        processor = snapshot['processor']
+    else:
+        # Perezoso: cada (ciudad, variable) se carga la primera vez que se consulta
+        processor = CSVProcessorOptimized(
+            storage='cube', lazy=True, interpolation=DATA_CONFIG['interpolation']
+        )
+        # CSV ↔ malla (con snapshot ya viene de load_all_csvs); en caché por hash
+        processor.check_consistency()
+    
+    # Varias réplicas en la misma máquina: compartir un solo cubo mapeado
+    # (también con snapshot: se suelta la copia que trajo el pickle)
+    shared_folder = DATA_CONFIG['shared_store']
+    if shared_folder and not processor.attach_shared(shared_folder):
+        processor.publish_shared(shared_folder)
+    
     return processor
 
 @st.cache_resource
 def init_precipitation_analyzer():
-    return PrecipitationAnalyzer()
+    snapshot = init_snapshot()
+    return snapshot['analyzers']['precipitation'] if snapshot else PrecipitationAnalyzer()
 
 @st.cache_resource
 def init_wind_analyzer():
-    return WindAnalyzer()
+    snapshot = init_snapshot()
+    return snapshot['analyzers']['wind'] if snapshot else WindAnalyzer()
 
 @st.cache_resource
 def init_humidity_analyzer():
-    return HumidityAnalyzer()
+    snapshot = init_snapshot()
+    return snapshot['analyzers']['humidity'] if snapshot else HumidityAnalyzer()
 
 @st.cache_resource
 def init_cloudiness_analyzer():
-    return CloudinessAnalyzer()
+    snapshot = init_snapshot()
+    return snapshot['analyzers']['cloudiness'] if snapshot else CloudinessAnalyzer()
 
 processor = init_processor()
 precip_analyzer = init_precipitation_analyzer()
@@ -84,12 +113,23 @@ st.markdown("""
 
 st.markdown("---")
 
-if len(processor.data) > 0:
-    total_vars = sum(len(vars_dict) for vars_dict in processor.data.values())
-    st.success(f"✅ Datos NASA cargados: {len(processor.data)} ciudades | {total_vars} variables (1990-2024)")
+available_pairs = processor.available_pairs()
+if len(available_pairs) > 0:
+    total_cities = len({city_key for city_key, _ in available_pairs})
+    st.success(f"✅ Datos NASA disponibles: {total_cities} ciudades | {len(available_pairs)} variables (1990-2024)")
 else:
     st.error("❌ No se cargaron datos. Verifica la carpeta data/csv/")
 
+# Series que no coinciden con las mallas: se sirven, pero no en silencio
+consistency_issues = getattr(processor, 'consistency_issues', [])
+if consistency_issues:
+    st.warning(f"⚠️ {len(consistency_issues)} series de CSV no coinciden con las mallas NASA "
+               "(python -m data.consistency_check para el detalle)")
+    with st.expander("🔎 Series con diferencias"):
+        for finding in consistency_issues:
+            st.write(f"• **{finding['city']}/{finding['variable']}** ({finding['file']}): "
+                     f"{', '.join(finding['issues'])}")
+
 st.markdown("---")
 
 # TABS
@@ -335,7 +375,7 @@ with tab1:
     
     # ANÁLISIS DE DATOS
     if user_inputs['consultar']:
-        if len(processor.data) == 0:
+        if not available_pairs:
             st.error("❌ No hay datos cargados")
         else:
             with st.spinner('🛰️ Procesando datos históricos NASA GIOVANNI...'):
@@ -352,6 +392,10 @@ with tab1:
                 results_cloudiness = None
                 city_name = None
                 
+                # Origen de cada sección: (etiqueta, True si es una mezcla
+                # de ciudades); solo se anuncia interpolación si la hubo
+                sources = {}
+                
                 # TEMPERATURA
                 if user_inputs['variables'].get('temperatura'):
                     temp_vals, detected_city = processor.get_historical_data(
@@ -362,6 +406,10 @@ with tab1:
                         city_name = detected_city
                     
                     if temp_vals is not None and len(temp_vals) > 0:
+                        sources['temperatura'] = (
+                            detected_city,
+                            len(point_stations(processor, lat, lon, ['temperatura'])) > 1
+                        )
                         var_info = VARIABLES['temperatura']
                         avg_value = float(np.mean(temp_vals))
                         probability = processor.calculate_probability(
@@ -382,6 +430,8 @@ with tab1:
                     results_precip = integrate_with_processor(
                         processor, precip_analyzer, lat, lon, month, day
                     )
+                    if results_precip:
+                        sources['precipitacion'] = (results_precip['city_name'], results_precip.get('interpolated', False))
                     if results_precip and not city_name:
                         city_name = results_precip['city_name']
                 
@@ -390,6 +440,8 @@ with tab1:
                     results_wind = integrate_wind_with_processor(
                         processor, wind_analyzer, lat, lon, month, day
                     )
+                    if results_wind:
+                        sources['viento'] = (results_wind['city_name'], results_wind.get('interpolated', False))
                     if results_wind and not city_name:
                         city_name = results_wind['city_name']
                 
@@ -398,6 +450,8 @@ with tab1:
                     results_humidity = integrate_humidity_with_processor(
                         processor, humidity_analyzer, lat, lon, month, day
                     )
+                    if results_humidity:
+                        sources['humedad'] = (results_humidity['city_name'], results_humidity.get('interpolated', False))
                     if results_humidity and not city_name:
                         city_name = results_humidity['city_name']
                 
@@ -406,35 +460,57 @@ with tab1:
                     results_cloudiness = integrate_cloudiness_with_processor(
                         processor, cloudiness_analyzer, lat, lon, month, day
                     )
+                    if results_cloudiness:
+                        sources['nubosidad'] = (results_cloudiness['city_name'], results_cloudiness.get('interpolated', False))
                     if results_cloudiness and not city_name:
                         city_name = results_cloudiness['city_name']
                 
                 # MOSTRAR RESULTADOS
                 if any([results_temp, results_precip, results_wind, results_humidity, results_cloudiness]):
-                    st.success(f"✅ Análisis completado - Ciudad NASA: **{city_name}**")
+                    # Una sola fuente para todo → en el encabezado; si las
+                    # variables salieron de ciudades distintas → por sección
+                    single_source = len(set(sources.values())) <= 1
+                    any_interpolated = any(interpolated for _, interpolated in sources.values())
+                    
+                    def render_source(var):
+                        if not single_source and var in sources:
+                            label, interpolated = sources[var]
+                            st.caption(f"📐 {label}" if interpolated else f"🏙️ Ciudad NASA: {label}")
+                    
+                    if not single_source:
+                        st.success("✅ Análisis completado - la fuente de cada variable se indica en su sección")
+                    elif any_interpolated:
+                        st.success(f"✅ Análisis completado - 📐 **{city_name}**")
+                    else:
+                        st.success(f"✅ Análisis completado - Ciudad NASA: **{city_name}**")
                     
                     if results_temp:
                         st.markdown("#### 🌡️ Temperatura")
+                        render_source('temperatura')
                         render_metric_cards(results_temp)
                         st.markdown("---")
                     
                     if results_precip:
                         st.markdown("#### 🌧️ Precipitación")
+                        render_source('precipitacion')
                         render_precipitation_card(results_precip)
                         st.markdown("---")
                     
                     if results_wind:
                         st.markdown("#### 💨 Viento")
+                        render_source('viento')
                         render_wind_card(results_wind)
                         st.markdown("---")
                     
                     if results_humidity:
                         st.markdown("#### 💧 Humedad")
+                        render_source('humedad')
                         render_humidity_card(results_humidity)
                         st.markdown("---")
                     
                     if results_cloudiness:
                         st.markdown("#### ☁️ Nubosidad")
+                        render_source('nubosidad')
                         render_cloudiness_card(results_cloudiness)
                         st.markdown("---")
                     
@@ -443,7 +519,10 @@ with tab1:
                     col_a, col_b, col_c = st.columns(3)
                     
                     with col_a:
-                        st.metric("🏙️ Ciudad NASA", city_name)
+                        if any_interpolated:
+                            st.metric("📐 Ciudades NASA", "Interpolado")
+                        else:
+                            st.metric("🏙️ Ciudad NASA", city_name if single_source else "Varias")
                     with col_b:
                         st.metric("📅 Mes", fecha.strftime("%B"))
                     with col_c:
@@ -12,10 +12,21 @@ from config.settings import CIUDADES_NASA, COLORS
 from data.destination_finder_enhanced import DestinationFinderEnhanced
 
 
+@st.cache_resource
+def get_grid_field_provider():
+    """
+    Campos en malla (se regridean una sola vez por proceso): climatologías
+    mensuales de data/cache/climatology si existen, si no los mapas de data/raw
+    """
+    from data.grid_climatology import default_field_provider
+    return default_field_provider()
+
+
 def render_destination_map_enhanced(results, condition_info):
     """Renderiza mapa interactivo con destinos encontrados"""
     import folium
     from streamlit_folium import st_folium
+    from components.mapa import add_climate_tile_layers
     
     # Centro de México
     center_lat = 23.6345
@@ -103,7 +114,7 @@ def render_destination_map_enhanced(results, condition_info):
                     font-size: 0.85rem;
                     color: rgba(255,255,255,0.9);
                 ">
-                    Probabilidad de {condition_info['nombre']}
+                    {result.get('score_label', 'Probabilidad')} de {condition_info['nombre']}
                 </p>
             </div>
             
@@ -164,6 +175,10 @@ def render_destination_map_enhanced(results, condition_info):
     """
     m.get_root().html.add_child(folium.Element(legend_html))
     
+    # Capa climática de la primera variable de la condición buscada
+    main_variable = next(iter(condition_info.get('conditions', {})), None)
+    add_climate_tile_layers(m, show=main_variable)
+    
     # Renderizar mapa
     st_folium(m, width=None, height=500, key="destination_map_enhanced")
 
@@ -201,6 +216,9 @@ def render_result_cards_enhanced(results, condition_info, show_details=True, max
             badge_text = 'BAJA'
             badge_color = '#EF4444'
         
+        # Resultados de malla: índice heurístico, no frecuencia histórica
+        score_label = result.get('score_label', 'Probabilidad')
+        
         # ✅ SOLUCIÓN: Construir HTML de bonus por separado
         bonus_html = ""
         if result.get('seasonal_bonus', False):
@@ -266,7 +284,7 @@ def render_result_cards_enhanced(results, condition_info, show_details=True, max
                 font-size: 0.85rem;
                 margin-top: 5px;
             ">
-                {badge_text}
+                {badge_text}<br>{score_label}
             </div>
         </div>
     </div>
@@ -314,7 +332,7 @@ def render_result_cards_enhanced(results, condition_info, show_details=True, max
                                 {avg_val}{unit}
                             </div>
                             <div style="color: rgba(255,255,255,0.7); font-size: 0.85rem; margin-top: 5px;">
-                                {var_prob}% probabilidad
+                                {var_prob}% {score_label.lower()}
                             </div>
                         </div>
                         """, unsafe_allow_html=True)
@@ -395,7 +413,7 @@ def render_climate_finder_enhanced(processor=None):
         st.markdown("❄️ **Tipo de clima que buscas:**")
         
         # Obtener condiciones del finder mejorado
-        finder = DestinationFinderEnhanced(processor)
+        finder = DestinationFinderEnhanced(processor, field_provider=get_grid_field_provider())
         all_conditions = finder.get_all_conditions()
         climate_options = {key: info['nombre'] for key, info in all_conditions.items()}
         
@@ -457,6 +475,34 @@ def render_climate_finder_enhanced(processor=None):
             show_map = st.checkbox("🗺️ Mostrar mapa interactivo", value=True, key="finder_show_map")
         with col_details:
             show_details = st.checkbox("📊 Mostrar detalles climáticos", value=True, key="finder_show_details")
+        
+        col_grid, col_cluster = st.columns(2)
+        with col_grid:
+            grid_mode = st.checkbox(
+                "🛰️ Buscar en toda la malla de México",
+                value=False,
+                help="Evalúa cada celda de los mapas NASA, no solo las 5 ciudades",
+                key="finder_grid_mode"
+            )
+        with col_cluster:
+            cluster_cells = st.checkbox(
+                "🧩 Agrupar celdas vecinas",
+                value=True,
+                disabled=not grid_mode,
+                help="Un resultado por zona en lugar de celdas contiguas repetidas",
+                key="finder_cluster_cells"
+            )
+        
+        # Tolerancia en grados → nivel de pirámide (celdas más grandes = búsqueda más rápida)
+        grid_resolutions = {None: "Nativa", 1.5: "Media (~1.25°)", 3.0: "Gruesa (~2.5°)", 6.0: "Muy gruesa (~5°)"}
+        grid_tolerance = st.select_slider(
+            "📐 Resolución de la malla",
+            options=list(grid_resolutions.keys()),
+            format_func=lambda x: grid_resolutions[x],
+            disabled=not grid_mode,
+            help="Celdas más grandes recorren una fracción de la malla completa",
+            key="finder_grid_tolerance"
+        )
     
     # ============================================
     # BOTÓN DE BÚSQUEDA
@@ -473,11 +519,25 @@ def render_climate_finder_enhanced(processor=None):
     if search_button:
         with st.spinner('🛰️ Analizando 35 años de datos NASA GIOVANNI...'):
             # Buscar destinos
-            results = finder.find_destinations(
-                target_date=target_date,
-                climate_condition=selected_climate,
-                min_probability=min_probability
-            )
+            if grid_mode:
+                try:
+                    results = finder.find_grid_destinations(
+                        target_date=target_date,
+                        climate_condition=selected_climate,
+                        min_probability=min_probability,
+                        top_k=max_results,
+                        cluster=cluster_cells,
+                        tolerance=grid_tolerance
+                    )
+                except ImportError as e:
+                    st.error(f"❌ Búsqueda en malla no disponible: {e}")
+                    results = []
+            else:
+                results = finder.find_destinations(
+                    target_date=target_date,
+                    climate_condition=selected_climate,
+                    min_probability=min_probability
+                )
             
             # GUARDAR EN SESSION STATE
             st.session_state.search_results = results
@@ -539,6 +599,19 @@ def render_climate_finder_enhanced(processor=None):
         else:
             st.success(f"🎯 Se encontraron **{len(results)} destinos** que cumplen tus criterios")
             
+            # Búsqueda en malla: aclarar qué significa el puntaje
+            score_label = results[0].get('score_label', 'Probabilidad')
+            if 'score_label' in results[0]:
+                if score_label == 'Índice anual':
+                    st.info("ℹ️ Búsqueda en malla: el puntaje es un índice heurístico sobre el "
+                            "promedio de todo el periodo de cada celda (no cambia con el mes). "
+                            "No es comparable con la probabilidad por mes de las 5 ciudades.")
+                else:
+                    st.info("ℹ️ Búsqueda en malla: el puntaje es un índice heurístico sobre la "
+                            "climatología del mes de cada celda, no una frecuencia histórica.")
+                for var_key, note in results[0].get('score_notes', {}).items():
+                    st.caption(f"⚠️ {var_key.capitalize()}: {note}")
+            
             # Mapa interactivo
             if show_map:
                 st.markdown("### 🗺️ Mapa de Destinos")
@@ -562,7 +635,7 @@ def render_climate_finder_enhanced(processor=None):
                 st.metric("Destinos encontrados", len(results))
             with col2:
                 avg_prob = np.mean([r['overall_probability'] for r in results])
-                st.metric("Probabilidad promedio", f"{avg_prob:.1f}%")
+                st.metric(f"{score_label} promedio", f"{avg_prob:.1f}%")
             with col3:
                 best_prob = results[0]['overall_probability'] if results else 0
                 st.metric("Mejor opción", f"{best_prob:.1f}%")
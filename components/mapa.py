@@ -2,9 +2,46 @@
 import folium
 from streamlit_folium import st_folium, folium_static
 from folium import plugins
-from config.settings import MAP_CONFIG, CIUDADES_NASA
+from config.settings import MAP_CONFIG, CIUDADES_NASA, TILE_CONFIG, VARIABLES
+from data.tile_pyramid import read_tiles_index
 import streamlit as st
 
+
+@st.cache_data(ttl=300)
+def _tile_layers():
+    """Índice de capas pre-renderizadas (tiles.json)"""
+    return read_tiles_index(TILE_CONFIG['folder'])
+
+
+def add_climate_tile_layers(m, show=None):
+    """
+    Agrega cada variable climática como TileLayer (teselas z/x/y en disco)
+    
+    Las capas salen apagadas salvo 'show'; el usuario las prende desde el
+    control de capas. Si no se generaron (python -m data.tile_pyramid),
+    el mapa queda igual que antes.
+    """
+    layers = _tile_layers()
+    
+    for variable, layer in layers.items():
+        west, south, east, north = layer['bounds']
+        folium.TileLayer(
+            tiles=layer['url'],
+            attr='NASA GIOVANNI',
+            name=VARIABLES.get(variable, {}).get('nombre', variable),
+            overlay=True,
+            control=True,
+            show=(variable == show),
+            opacity=TILE_CONFIG['opacity'],
+            max_native_zoom=layer['max_zoom'],
+            bounds=[[south, west], [north, east]]
+        ).add_to(m)
+    
+    if layers:
+        folium.LayerControl(position='topleft', collapsed=True).add_to(m)
+    
+    return layers
+
 def render_map(lat, lon, location_name):
     """
     Renderiza mapa principal con diseño mejorado
@@ -49,6 +86,9 @@ def render_map(lat, lon, location_name):
         weight=2
     ).add_to(m)
     
+    # Capas climáticas pre-renderizadas
+    add_climate_tile_layers(m)
+    
     # Controles
     plugins.Fullscreen(
         position='topright',
@@ -258,6 +298,9 @@ def render_interactive_cities_map(selected_city_key=None):
     """
     m.get_root().html.add_child(folium.Element(legend_html))
     
+    # Capas climáticas pre-renderizadas
+    add_climate_tile_layers(m)
+    
     # Agregar control de pantalla completa
     plugins.Fullscreen(
         position='topright',
@@ -374,6 +417,7 @@ def render_climate_zone_map(cities_data, highlight_city=None):
             weight=2
         ).add_to(m)
     
+    add_climate_tile_layers(m)
     plugins.Fullscreen().add_to(m)
     
     folium_static(m, width=None, height=500)
\ No newline at end of file
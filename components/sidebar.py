@@ -1,7 +1,29 @@
 # components/sidebar.py
 import streamlit as st
 from datetime import datetime
-from config.settings import MAP_CONFIG, VARIABLES, COLORS, CIUDADES_NASA
+from config.settings import MAP_CONFIG, VARIABLES, COLORS, CIUDADES_NASA, DATA_CONFIG
+from data.place_index import build_place_index
+
+@st.cache_resource
+def get_place_index():
+    """Índice de lugares (settings + nomenclátor), uno por proceso"""
+    return build_place_index(DATA_CONFIG['gazetteer_path'])
+
+def _place_card_data(place):
+    """Lugar del buscador → mismos campos que CIUDADES_NASA para la tarjeta"""
+    description = place.get('description') or 'Localidad del nomenclátor'
+    if place.get('alt'):
+        description = f"{description} · {place['alt']:.0f} m"
+    return {
+        'name': place['name'],
+        'display_name': f"{place.get('icon') or '📌'} {place['name']}",
+        'lat': place['lat'],
+        'lon': place['lon'],
+        'state': place.get('state') or '',
+        'icon': place.get('icon') or '📌',
+        'color': place.get('color') or '#6366f1',
+        'description': description
+    }
 
 def render_sidebar():
     """
@@ -71,8 +93,33 @@ def render_sidebar():
         st.session_state.selected_city_key = selected_city
         st.rerun()
     
-    # Obtener datos de la ciudad actual
-    city_data = CIUDADES_NASA[st.session_state.selected_city_key]
+    # 🔎 BUSCADOR DE LUGARES (autocompletar sin acentos, por prefijo)
+    query = st.sidebar.text_input(
+        "🔎 Buscar otro lugar",
+        key='place_query',
+        placeholder="Ej: Nevado de Toluca, Creel, Arteaga...",
+        help="Busca entre todas las ciudades y zonas climáticas conocidas"
+    )
+    
+    selected_place = None
+    if query:
+        matches = get_place_index().search(query, limit=8)
+        if matches:
+            choice = st.sidebar.selectbox(
+                "Resultados",
+                options=range(len(matches)),
+                format_func=lambda i: f"{matches[i].get('icon') or '📌'} {matches[i]['name']} ({matches[i]['state']})",
+                key='place_choice'
+            )
+            selected_place = matches[choice]
+        else:
+            st.sidebar.caption("Sin coincidencias")
+    
+    # Obtener datos de la ciudad actual (o del lugar buscado)
+    if selected_place is not None:
+        city_data = _place_card_data(selected_place)
+    else:
+        city_data = CIUDADES_NASA[st.session_state.selected_city_key]
     location_name = city_data['name']
     lat = city_data['lat']
     lon = city_data['lon']
@@ -284,5 +331,6 @@ def render_sidebar():
         'variables': selected_vars,
         'consultar': consultar,
         'city_key': st.session_state.selected_city_key,
-        'city_data': city_data
+        'city_data': city_data,
+        'place': selected_place
     }
\ No newline at end of file
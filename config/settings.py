@@ -1,4 +1,5 @@
 # config/settings.py
+import os
 
 PAGE_CONFIG = {
     'page_title': 'NASA Climate Intelligence Platform',
@@ -25,6 +26,24 @@ COLORS = {
     'gradient_end': '#7c3aed'    # Gradiente fin
 }
 
+# Almacenamiento de datos
+DATA_CONFIG = {
+    # Carpeta donde las réplicas de Streamlit comparten el cubo climático
+    # (mapeado en memoria). None = cada proceso carga sus propios datos.
+    'shared_store': os.environ.get('NASA_SHARED_STORE'),
+    # Snapshot del procesador + analizadores listo para servir
+    # (se genera con: python -m data.snapshot)
+    'snapshot_path': 'data/cache/snapshot.pkl',
+    # Reporte de consistencia CSV ↔ malla (python -m data.consistency_check)
+    'consistency_report': 'data/cache/consistency.json',
+    # Datos de un punto: None = ciudad más cercana; 'idw' o 'gaussian' =
+    # mezcla de las ciudades más cercanas ponderada por distancia
+    'interpolation': os.environ.get('NASA_INTERPOLATION') or None,
+    # Nomenclátor opcional para el buscador de lugares del sidebar
+    # (CSV/TSV: nombre, estado, lat, lon[, alt]; ej: localidades INEGI)
+    'gazetteer_path': os.environ.get('NASA_GAZETTEER', 'data/gazetteer.csv')
+}
+
 MAP_CONFIG = {
     'default_location': 'Ciudad de México',
     'default_lat': 19.4326,
@@ -32,6 +51,25 @@ MAP_CONFIG = {
     'default_zoom': 6
 }
 
+# Capas climáticas pre-renderizadas (z/x/y PNG)
+# Se generan con: python -m data.tile_pyramid
+# Streamlit las sirve desde static/ (enableStaticServing en .streamlit/config.toml)
+TILE_CONFIG = {
+    'folder': 'static/tiles',
+    'url': '/app/static/tiles',
+    'min_zoom': 3,
+    'max_zoom': 8,
+    'opacity': 0.6,
+    # Paleta FIJA por variable (mismas unidades que la app: °C, mm/mes, km/h, kg/kg, %)
+    'colormaps': {
+        'temperatura': {'vmin': 0, 'vmax': 35, 'colors': ['#3B82F6', '#22D3EE', '#FDE047', '#F97316', '#DC2626']},
+        'precipitacion': {'vmin': 0, 'vmax': 250, 'colors': ['#FEF3C7', '#A7F3D0', '#34D399', '#3B82F6', '#1E3A8A']},
+        'viento': {'vmin': 0, 'vmax': 40, 'colors': ['#E0F2FE', '#67E8F9', '#06B6D4', '#0E7490', '#164E63']},
+        'humedad': {'vmin': 0, 'vmax': 0.02, 'colors': ['#FDE68A', '#C4B5FD', '#8B5CF6', '#6D28D9', '#3B0764']},
+        'nubosidad': {'vmin': 0, 'vmax': 100, 'colors': ['#0F172A', '#334155', '#64748B', '#CBD5E1', '#F8FAFC']}
+    }
+}
+
 # Ciudades con datos de NASA GIOVANNI
 CIUDADES_NASA = {
     'veracruz': {
@@ -0,0 +1,187 @@
+# data/area_average.py
+"""
+Promedio por Área (equivalente local de GIOVANNI areaAvg)
+=========================================================
+Calcula promedios ponderados por cos(latitud) sobre cajas lat/lon o máscaras
+a partir de una malla, para MUCHAS cajas a la vez.
+
+POR QUÉ EXISTE:
+- Los CSV de data/csv son series "Area-Averaged" de GIOVANNI sobre la caja
+  que viene en el encabezado (Data Bounding Box)
+- Con este motor se pueden armar series para ciudades nuevas sin volver a
+  GIOVANNI y verificar los CSV contra las mallas .nc
+
+CÓMO SE SELECCIONAN LAS CELDAS:
+- Igual que GIOVANNI: entran las celdas cuyo CENTRO cae dentro de la caja.
+  El "Data Bounding Box" de los CSV son justamente los centros extremos
+- Una caja degenerada (un punto, ej: "-99.375,19.5,-99.375,19.5") o sin
+  centros adentro usa la celda que contiene su centro
+- Las celdas sin dato (NaN) no cuentan ni en el numerador ni en el peso
+
+VECTORIZACIÓN:
+- Cada caja se describe con dos vectores de pesos (uno por eje), así que
+  el promedio de B cajas es un par de einsum, sin ciclos por celda
+"""
+
+import numpy as np
+
+# Tolerancia para comparar centros con los bordes de la caja (grados)
+EDGE_TOLERANCE = 1e-6
+
+
+def latitude_weights(lat):
+    """Peso de área de cada fila: cos(latitud)"""
+    return np.cos(np.deg2rad(np.asarray(lat, dtype=np.float64)))
+
+
+def _axis_selectors(centers, low, high):
+    """
+    Matriz [cajas, celdas] con 1 donde el centro cae en [low, high]
+
+    Si una caja no tiene ningún centro adentro, se elige la celda más
+    cercana a su punto medio.
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)[:, None]
+    high = np.asarray(high, dtype=np.float64)[:, None]
+
+    inside = (centers >= low - EDGE_TOLERANCE) & (centers <= high + EDGE_TOLERANCE)
+
+    empty = ~inside.any(axis=1)
+    if empty.any():
+        middle = (low[empty, 0] + high[empty, 0]) / 2
+        nearest = np.abs(centers[None, :] - middle[:, None]).argmin(axis=1)
+        inside[np.nonzero(empty)[0], nearest] = True
+
+    return inside.astype(np.float64)
+
+
+def box_weights(lat, lon, boxes):
+    """
+    Pesos separables por eje para cada caja
+
+    Args:
+        lat, lon: ejes de la malla
+        boxes: arreglo [B, 4] de (oeste, sur, este, norte), el mismo orden que
+               'Data Bounding Box' en los encabezados GIOVANNI
+
+    Returns:
+        (lat_w [B, nlat], lon_w [B, nlon]); el peso de la celda (i, j) para
+        la caja b es lat_w[b, i] * lon_w[b, j]
+    """
+    boxes = np.atleast_2d(np.asarray(boxes, dtype=np.float64))
+    west, south, east, north = boxes.T
+
+    lat_w = _axis_selectors(lat, south, north) * latitude_weights(lat)[None, :]
+    lon_w = _axis_selectors(lon, west, east)
+    return lat_w, lon_w
+
+
+def area_average(field, lat, lon, boxes):
+    """
+    Promedio ponderado por área de una malla sobre varias cajas
+
+    Args:
+        field: ndarray [lat, lon] o [tiempo, lat, lon] con NaN sin dato
+        lat, lon: ejes de la malla
+        boxes: [B, 4] (oeste, sur, este, norte) o una sola caja
+
+    Returns:
+        ndarray [B] (o [B, tiempo]); NaN si la caja no tiene celdas con dato
+    """
+    field = np.asarray(field, dtype=np.float64)
+    lat_w, lon_w = box_weights(lat, lon, boxes)
+
+    valid = ~np.isnan(field)
+    filled = np.where(valid, field, 0.0)
+
+    if field.ndim == 2:
+        numerator = np.einsum('bi,ij,bj->b', lat_w, filled, lon_w)
+        weight = np.einsum('bi,ij,bj->b', lat_w, valid.astype(np.float64), lon_w)
+    elif field.ndim == 3:
+        numerator = np.einsum('bi,tij,bj->bt', lat_w, filled, lon_w)
+        weight = np.einsum('bi,tij,bj->bt', lat_w, valid.astype(np.float64), lon_w)
+    else:
+        raise ValueError("field debe ser [lat, lon] o [tiempo, lat, lon]")
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = numerator / weight
+    result[weight == 0] = np.nan
+    return result
+
+
+def mask_average(field, lat, masks):
+    """
+    Promedio ponderado por área sobre máscaras arbitrarias
+
+    Args:
+        field: ndarray [lat, lon] con NaN sin dato
+        lat: eje de latitudes
+        masks: [M, lat, lon] booleano o pesos fraccionales (ej: cobertura
+               de un polígono por celda)
+
+    Returns:
+        ndarray [M]
+    """
+    field = np.asarray(field, dtype=np.float64)
+    masks = np.asarray(masks, dtype=np.float64)
+    if masks.ndim == 2:
+        masks = masks[None]
+
+    weights = masks * latitude_weights(lat)[None, :, None]
+    valid = ~np.isnan(field)
+
+    numerator = np.einsum('mij,ij->m', weights, np.where(valid, field, 0.0))
+    weight = np.einsum('mij,ij->m', weights, valid.astype(np.float64))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = numerator / weight
+    result[weight == 0] = np.nan
+    return result
+
+
+def grid_box_averages(grid, boxes):
+    """
+    Promedios de un GridDataset sobre varias cajas (lee la malla una vez)
+
+    Args:
+        grid: GridDataset de data.grid_reader
+        boxes: [B, 4] (oeste, sur, este, norte)
+    """
+    grid.open()
+    return area_average(grid.read_all(), grid.lat, grid.lon, boxes)
+
+
+# PRUEBA: comparar los CSV contra las mallas
+if __name__ == "__main__":
+    from data.csv_catalog import build_catalog
+    from data.csv_processor_optimized import CSVProcessorOptimized
+    from data.grid_reader import open_grids
+
+    print("\n🧪 PROBANDO PROMEDIO POR ÁREA")
+    print("=" * 70)
+
+    catalog = build_catalog('data/csv')
+    grids = open_grids()
+
+    for variable, grid in grids.items():
+        pairs = [
+            (city_key, entry['path'], entry['metadata']['data_bbox'])
+            for (var, city_key), entry in sorted(catalog.items())
+            if var == variable and entry['metadata'] and entry['metadata'].get('data_bbox')
+        ]
+        if not pairs:
+            continue
+
+        grid.open()
+        first_year = int(grid.start_date[:4])
+        last_year = int(grid.end_date[:4])
+        averages = grid_box_averages(grid, [bbox for _, _, bbox in pairs])
+
+        print(f"\n🗺️ {variable} ({first_year}-{last_year})")
+        for (city_key, path, bbox), grid_value in zip(pairs, averages):
+            parsed = CSVProcessorOptimized._parse_csv(path, variable)
+            values = parsed['values']
+            in_period = (parsed['year'] >= first_year) & (parsed['year'] <= last_year)
+            csv_value = np.nanmean(values[in_period]) if in_period.any() else np.nan
+            print(f"   {city_key:<10} CSV {csv_value:10.4f} | malla {grid_value:10.4f}")
@@ -0,0 +1,394 @@
+# data/bbox_index.py
+"""
+Índice de Cajas GIOVANNI (R-tree empaquetado STR)
+=================================================
+Cada CSV de data/csv trae en su encabezado la caja exacta que GIOVANNI
+promedió ("Data Bounding Box"). Este índice responde:
+
+- ¿Qué series cubren este punto?            query_point()
+- Si ninguna lo cubre, ¿cuál queda más cerca? nearest()
+- Las dos cosas juntas                       locate()
+- ¿Qué archivo corresponde a cada ciudad?     resolve_box_cities()
+
+POR QUÉ EXISTE:
+- El código usaba las coordenadas tecleadas a mano de city_coords e
+  ignoraba la caja real de cada serie (que además puede ser de otra ciudad,
+  ver data/consistency_check.py)
+- Con cientos de series de área, recorrer todas las cajas por consulta ya
+  no es barato; el R-tree descarta ramas enteras: O(log n)
+
+CONSTRUCCIÓN (Sort-Tile-Recursive):
+- Las cajas se ordenan por el centro en longitud, se cortan en √(n/M)
+  franjas, cada franja se ordena por latitud y se empaca en nodos de M
+- Se repite con los nodos hasta llegar a la raíz; como el empaque es
+  contiguo, los hijos de cada nodo son un rango del nivel de abajo
+
+CAJAS:
+- El Data Bounding Box son los CENTROS extremos de las celdas; la zona
+  cubierta llega media celda más allá. La celda se lee del título
+  ("0.5 x 0.625 deg") o se usa DEFAULT_CELL_DEG
+- Una caja degenerada (un punto o una línea, ej: "-99.375,19.5,-99.375,19.5")
+  se expande igual, así que cubre su celda
+"""
+
+import heapq
+import math
+import re
+
+import numpy as np
+
+from data.spatial_index import haversine_km
+
+# Cajas (o nodos) por nodo del árbol
+NODE_CAPACITY = 16
+
+# Celda supuesta si el título no trae la resolución (GPM IMERG: 0.1°)
+DEFAULT_CELL_DEG = (0.1, 0.1)
+
+_RESOLUTION_IN_TITLE = re.compile(r'(\d+(?:\.\d+)?)\s*x\s*(\d+(?:\.\d+)?)\s*deg', re.IGNORECASE)
+
+
+def cell_size_from_title(title):
+    """'... 0.5 x 0.625 deg. ...' → (0.5, 0.625) (lat, lon); None si no aparece"""
+    match = _RESOLUTION_IN_TITLE.search(title or '')
+    if not match:
+        return None
+    return float(match.group(1)), float(match.group(2))
+
+
+def coverage_box(bbox, cell_size=None):
+    """
+    Caja de centros (oeste, sur, este, norte) → zona cubierta por las celdas
+
+    Args:
+        bbox: Data Bounding Box de GIOVANNI
+        cell_size: (lat, lon) en grados; por defecto DEFAULT_CELL_DEG
+    """
+    d_lat, d_lon = cell_size or DEFAULT_CELL_DEG
+    west, south, east, north = bbox
+    west, east = min(west, east), max(west, east)
+    south, north = min(south, north), max(south, north)
+    return (west - d_lon / 2, south - d_lat / 2, east + d_lon / 2, north + d_lat / 2)
+
+
+def _point_box_km(lat, lon, boxes):
+    """Distancia (km) de un punto al borde más cercano de cada caja (0 si está dentro)"""
+    clamped_lat = np.clip(lat, boxes[:, 1], boxes[:, 3])
+    clamped_lon = np.clip(lon, boxes[:, 0], boxes[:, 2])
+    return haversine_km(lat, lon, clamped_lat, clamped_lon)
+
+
+class BoxRTree:
+    """R-tree estático de cajas (oeste, sur, este, norte) con claves"""
+
+    def __init__(self, boxes, keys=None, node_capacity=NODE_CAPACITY):
+        """
+        Args:
+            boxes: secuencia [n, 4] de (oeste, sur, este, norte)
+            keys: clave de cada caja (por defecto su posición)
+            node_capacity: hijos por nodo (M)
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.keys = list(keys) if keys is not None else list(range(len(boxes)))
+        self.node_capacity = max(2, int(node_capacity))
+
+        if len(self.keys) != len(boxes):
+            raise ValueError("boxes y keys deben tener el mismo largo")
+
+        # Cajas normalizadas (oeste <= este, sur <= norte)
+        self.boxes = np.column_stack([
+            np.minimum(boxes[:, 0], boxes[:, 2]), np.minimum(boxes[:, 1], boxes[:, 3]),
+            np.maximum(boxes[:, 0], boxes[:, 2]), np.maximum(boxes[:, 1], boxes[:, 3])
+        ]) if len(boxes) else boxes
+        self.areas = (self.boxes[:, 2] - self.boxes[:, 0]) * (self.boxes[:, 3] - self.boxes[:, 1])
+
+        # levels[0] = hojas (cajas en orden STR); levels[-1] = raíz
+        # Cada nivel: (cajas [m, 4], inicio de hijos [m], fin de hijos [m]);
+        # las hojas no tienen hijos (None)
+        self.order = self._str_order(self.boxes) if len(self.boxes) else np.arange(0)
+        self.levels = []
+        if len(self.boxes):
+            self._build()
+
+    # ------------------------------------------------------------------
+    # Construcción STR
+    # ------------------------------------------------------------------
+    def _str_order(self, boxes):
+        """Orden Sort-Tile-Recursive de un conjunto de cajas"""
+        n = len(boxes)
+        capacity = self.node_capacity
+        centers_x = (boxes[:, 0] + boxes[:, 2]) / 2
+        centers_y = (boxes[:, 1] + boxes[:, 3]) / 2
+
+        n_nodes = math.ceil(n / capacity)
+        n_slices = max(1, math.ceil(math.sqrt(n_nodes)))
+        slice_size = n_slices * capacity
+
+        by_x = np.argsort(centers_x, kind='stable')
+        order = []
+        for start in range(0, n, slice_size):
+            block = by_x[start:start + slice_size]
+            order.append(block[np.argsort(centers_y[block], kind='stable')])
+        return np.concatenate(order)
+
+    def _build(self):
+        capacity = self.node_capacity
+        boxes = self.boxes[self.order]
+        self.levels.append((boxes, None, None))
+
+        while len(boxes) > 1:
+            # Los nodos internos también se ordenan con STR (cada uno se
+            # lleva su rango de hijos, así que el nivel de abajo no cambia)
+            if len(self.levels) > 1:
+                order = self._str_order(boxes)
+                _, starts, ends = self.levels[-1]
+                self.levels[-1] = (boxes[order], starts[order], ends[order])
+                boxes = self.levels[-1][0]
+
+            starts = np.arange(0, len(boxes), capacity)
+            ends = np.minimum(starts + capacity, len(boxes))
+            parents = np.column_stack([
+                np.minimum.reduceat(boxes[:, 0], starts), np.minimum.reduceat(boxes[:, 1], starts),
+                np.maximum.reduceat(boxes[:, 2], starts), np.maximum.reduceat(boxes[:, 3], starts)
+            ])
+            self.levels.append((parents, starts, ends))
+            boxes = parents
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def _children(self, level, node):
+        """(nivel hijo, índices de hijos) de un nodo"""
+        _, starts, ends = self.levels[level]
+        return level - 1, np.arange(starts[node], ends[node])
+
+    def query_point(self, lat, lon):
+        """
+        Claves de las cajas que contienen el punto (la más pequeña primero)
+
+        Solo se bajan las ramas cuya caja contiene al punto.
+        """
+        if not self.levels:
+            return []
+
+        found = []
+        top = len(self.levels) - 1
+        stack = [(top, node) for node in range(len(self.levels[top][0]))]
+
+        while stack:
+            level, node = stack.pop()
+            box = self.levels[level][0][node]
+            if not (box[0] <= lon <= box[2] and box[1] <= lat <= box[3]):
+                continue
+            if level == 0:
+                found.append(int(self.order[node]))
+                continue
+            child_level, children = self._children(level, node)
+            child_boxes = self.levels[child_level][0][children]
+            inside = (
+                (child_boxes[:, 0] <= lon) & (lon <= child_boxes[:, 2])
+                & (child_boxes[:, 1] <= lat) & (lat <= child_boxes[:, 3])
+            )
+            stack.extend((child_level, int(c)) for c in children[inside])
+
+        found.sort(key=lambda i: (self.areas[i], i))
+        return [self.keys[i] for i in found]
+
+    def nearest(self, lat, lon, k=1):
+        """
+        Las k cajas más cercanas al punto (distancia al borde en km)
+
+        Búsqueda best-first: se abre siempre el nodo con menor distancia
+        mínima posible, así que se detiene en cuanto hay k cajas más
+        cercanas que cualquier nodo pendiente.
+
+        Returns:
+            lista de (clave, km)
+        """
+        if not self.levels:
+            return []
+
+        top = len(self.levels) - 1
+        root_boxes = self.levels[top][0]
+        heap = [
+            (float(d), top, node)
+            for node, d in enumerate(_point_box_km(lat, lon, root_boxes))
+        ]
+        heapq.heapify(heap)
+
+        results = []
+        while heap and len(results) < k:
+            distance, level, node = heapq.heappop(heap)
+            if level == 0:
+                results.append((self.keys[int(self.order[node])], distance))
+                continue
+            child_level, children = self._children(level, node)
+            distances = _point_box_km(lat, lon, self.levels[child_level][0][children])
+            for child, d in zip(children, distances):
+                heapq.heappush(heap, (float(d), child_level, int(child)))
+
+        return results
+
+    def locate(self, lat, lon):
+        """
+        Serie que cubre el punto o, si ninguna, la caja más cercana
+
+        Returns:
+            (clave, km al borde, True si la caja contiene el punto) o
+            (None, inf, False) si el índice está vacío
+        """
+        covering = self.query_point(lat, lon)
+        if covering:
+            return covering[0], 0.0, True
+
+        nearest = self.nearest(lat, lon, k=1)
+        if not nearest:
+            return None, float('inf'), False
+        return nearest[0][0], nearest[0][1], False
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def _place_km(places, city_key, other_key):
+    """km entre dos ciudades de places (inf si la segunda no está)"""
+    if other_key not in places:
+        return float('inf')
+    a, b = places[city_key], places[other_key]
+    return float(haversine_km(a['lat'], a['lon'], b['lat'], b['lon']))
+
+
+def resolve_box_cities(catalog, places):
+    """
+    Reasigna cada (variable, ciudad) al archivo cuya caja CUBRE a la ciudad
+
+    El nombre del archivo no es confiable: en data/csv la precipitación de
+    "cancun" es la caja de CDMX, la de "monterrey" la de Cancún y la de
+    "tijuana" la de Monterrey. Si varias cajas cubren a la ciudad gana el
+    archivo cuya ciudad de nombre está más cerca (no el orden del catálogo).
+
+    - Series sin caja en el encabezado: se quedan con la ciudad del nombre
+    - Ciudad sin caja que la cubra: conserva su archivo solo si la caja de
+      ese archivo no cubre a NINGUNA ciudad (caja corrida, no de otra
+      ciudad); si no, queda sin archivo (par faltante)
+    - Ciudades del catálogo que no están en places: sin cambios
+
+    Args:
+        catalog: dict de build_catalog()
+        places: dict {city_key: {'lat', 'lon', ...}}
+
+    Returns:
+        dict {(variable, city_key): entrada}; las entradas reasignadas
+        llevan 'file_city' (ciudad según el nombre del archivo)
+    """
+    index = build_box_index(catalog)
+    resolved = {}
+
+    for (var, file_city), entry in catalog.items():
+        has_box = bool((entry.get('metadata') or {}).get('data_bbox'))
+        if file_city not in places or not has_box:
+            resolved[(var, file_city)] = entry
+
+    for var, tree in index.items():
+        coverage = {
+            city_key: tree.query_point(info['lat'], info['lon'])
+            for city_key, info in places.items()
+        }
+        covers_a_place = {key for covering in coverage.values() for key in covering}
+
+        for city_key in places:
+            covering = coverage[city_key]
+            if not covering:
+                if (var, city_key) in catalog and city_key not in covers_a_place:
+                    resolved[(var, city_key)] = catalog[(var, city_key)]
+                continue
+
+            file_city = min(covering, key=lambda key: (_place_km(places, city_key, key), key))
+            entry = catalog[(var, file_city)]
+            resolved[(var, city_key)] = entry if file_city == city_key else dict(entry, file_city=file_city)
+
+    return resolved
+
+
+def build_box_index(catalog, node_capacity=NODE_CAPACITY):
+    """
+    Un BoxRTree por variable con las cajas de un catálogo (build_catalog)
+
+    Returns:
+        dict {variable: BoxRTree con claves city_key}
+    """
+    per_variable = {}
+    for (var, city_key), entry in sorted(catalog.items()):
+        metadata = entry.get('metadata') or {}
+        bbox = metadata.get('data_bbox')
+        if not bbox:
+            continue
+        box = coverage_box(bbox, cell_size_from_title(metadata.get('title')))
+        per_variable.setdefault(var, ([], []))
+        per_variable[var][0].append(box)
+        per_variable[var][1].append(city_key)
+
+    return {
+        var: BoxRTree(boxes, keys, node_capacity=node_capacity)
+        for var, (boxes, keys) in per_variable.items()
+    }
+
+
+# ============================================
+# PRUEBA Y BENCHMARK
+# ============================================
+if __name__ == "__main__":
+    import time
+
+    from config.settings import CIUDADES_NASA
+    from data.csv_catalog import build_catalog
+
+    print("\n📦 PROBANDO ÍNDICE DE CAJAS GIOVANNI")
+    print("=" * 70)
+
+    catalog = resolve_box_cities(build_catalog('data/csv'), CIUDADES_NASA)
+    for (var, city_key), entry in sorted(catalog.items()):
+        if 'file_city' in entry:
+            print(f"🔀 {var}/{city_key} ← {entry['filename']} (su caja cubre {city_key})")
+
+    index = build_box_index(catalog)
+    for var, tree in index.items():
+        print(f"\n🗺️ {var}")
+        for name, (lat, lon) in {'CDMX': (19.43, -99.13), 'Cancún': (21.16, -86.85),
+                                 'Oaxaca': (17.06, -96.72)}.items():
+            key, distance, inside = tree.locate(lat, lon)
+            where = "dentro" if inside else f"a {distance:.0f} km"
+            print(f"   {name:<8} → {key} ({where}) | cubren: {tree.query_point(lat, lon)}")
+
+    # Validar contra fuerza bruta con muchas cajas aleatorias
+    rng = np.random.default_rng(7)
+    n = 5000
+    west = rng.uniform(-118, -87, n)
+    south = rng.uniform(14.5, 32.5, n)
+    sizes = rng.uniform(0, 1.0, (n, 2)) * (rng.random((n, 1)) > 0.1)  # 10% degeneradas
+    boxes = np.column_stack([west, south, west + sizes[:, 0], south + sizes[:, 1]])
+    coverage_box_array = np.array([coverage_box(b) for b in boxes])
+    tree = BoxRTree(coverage_box_array)
+
+    points = np.column_stack([rng.uniform(14.5, 32.5, 500), rng.uniform(-118, -87, 500)])
+    errors = 0
+    started = time.perf_counter()
+    hits = [set(tree.query_point(lat, lon)) for lat, lon in points]
+    per_query = (time.perf_counter() - started) / len(points) * 1000
+
+    for (lat, lon), found in zip(points, hits):
+        brute = set(np.nonzero(
+            (coverage_box_array[:, 0] <= lon) & (lon <= coverage_box_array[:, 2])
+            & (coverage_box_array[:, 1] <= lat) & (lat <= coverage_box_array[:, 3])
+        )[0].tolist())
+        errors += found != brute
+
+    nearest_errors = 0
+    for lat, lon in points[:100]:
+        (key, distance), = tree.nearest(lat, lon)
+        nearest_errors += not np.isclose(distance, _point_box_km(lat, lon, coverage_box_array).min())
+
+    print(f"\n✅ {n} cajas: punto-en-caja {len(points) - errors}/{len(points)} correctas, "
+          f"más cercana {100 - nearest_errors}/100 correctas")
+    print(f"⚡ Consulta punto-en-caja: {per_query:.3f} ms")
+    print("=" * 70)
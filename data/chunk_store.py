@@ -0,0 +1,457 @@
+# data/chunk_store.py
+"""
+Almacén de Arreglos por Chunks
+==============================
+Convierte los .nc de data/raw (y a futuro pilas mensuales) a un formato
+propio estilo Zarr: una carpeta por arreglo con metadatos JSON y un
+archivo comprimido (zlib) por chunk.
+
+    data/store/<variable>/meta.json
+    data/store/<variable>/lat.npy, lon.npy, lat_bnds.npy, lon_bnds.npy
+    data/store/<variable>/<arreglo>/<i>.<j>[.<k>].z
+
+POR QUÉ EXISTE:
+- El tiempo de una lectura puntual depende de cómo GIOVANNI partió el .nc
+  (hoy: UN chunk con la malla entera, o sea, descomprimir todo por un punto)
+- Aquí los chunks se eligen para el uso de la app:
+  * mapas 2-D: bloques de 32x32 celdas (ventanas chicas)
+  * pilas 3-D (tiempo, lat, lon): todo el tiempo de un bloque de 8x8 celdas
+    en un chunk, así la serie de un punto es UNA lectura
+- Leer una ventana descomprime solo los chunks que la tocan (vía TileCache)
+
+FORMATO DE UN CHUNK:
+- Bytes crudos little-endian del dtype en meta.json, comprimidos con zlib
+- Los valores de relleno se guardan como NaN; un chunk sin archivo = todo NaN
+
+USO:
+    python -m data.chunk_store        # convierte data/raw → data/store
+"""
+
+import itertools
+import json
+import os
+import zlib
+
+import numpy as np
+
+from data.grid_reader import GridDataset, find_grid_files
+from data.tile_cache import DEFAULT_TILE_CACHE
+
+try:
+    import netCDF4
+except ImportError:  # Solo se necesita para convertir
+    netCDF4 = None
+
+# Subir este número si cambia el formato
+STORE_VERSION = 1
+
+CHUNKS_2D = (32, 32)
+CHUNKS_3D_SPACE = (8, 8)
+MAX_TIME_CHUNK = 600   # 50 años de meses
+COMPRESSION_LEVEL = 6
+
+
+def default_chunks(shape):
+    """Forma de chunk según las dimensiones del arreglo"""
+    if len(shape) == 2:
+        return tuple(min(c, s) for c, s in zip(CHUNKS_2D, shape))
+    if len(shape) == 3:
+        return (min(shape[0], MAX_TIME_CHUNK),) + tuple(
+            min(c, s) for c, s in zip(CHUNKS_3D_SPACE, shape[1:])
+        )
+    return tuple(shape)
+
+
+def _chunk_ranges(shape, chunks):
+    """Todos los índices de chunk de un arreglo"""
+    return itertools.product(*[range(-(-s // c)) for s, c in zip(shape, chunks)])
+
+
+def _chunk_slices(index, chunks, shape):
+    return tuple(
+        slice(i * c, min((i + 1) * c, s)) for i, c, s in zip(index, chunks, shape)
+    )
+
+
+# ============================================
+# ESCRITURA
+# ============================================
+def write_array(folder, name, source, chunks=None, dtype=np.float32, fill_values=()):
+    """
+    Escribe un arreglo chunk por chunk
+
+    Args:
+        folder: carpeta del almacén de la variable
+        name: nombre del arreglo (subcarpeta)
+        source: cualquier objeto con .shape que acepte slices (ndarray o
+                variable de netCDF4: se lee un chunk a la vez, memoria acotada)
+        chunks: forma de chunk (por defecto default_chunks)
+        fill_values: valores que se guardan como NaN
+
+    Returns:
+        dict de metadatos del arreglo
+    """
+    shape = tuple(source.shape)
+    chunks = tuple(chunks or default_chunks(shape))
+    array_dir = os.path.join(folder, name)
+    os.makedirs(array_dir, exist_ok=True)
+
+    stored_bytes = 0
+    for index in _chunk_ranges(shape, chunks):
+        block = np.array(source[_chunk_slices(index, chunks, shape)], dtype=np.float64)
+        for fill in fill_values:
+            block[block == fill] = np.nan
+
+        path = os.path.join(array_dir, '.'.join(map(str, index)) + '.z')
+        if np.isnan(block).all():
+            # Chunk vacío: no se escribe (se lee como NaN)
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+
+        payload = zlib.compress(block.astype(np.dtype(dtype).newbyteorder('<')).tobytes(), COMPRESSION_LEVEL)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(payload)
+        os.replace(path + '.tmp', path)
+        stored_bytes += len(payload)
+
+    return {
+        'shape': list(shape),
+        'chunks': list(chunks),
+        'dtype': np.dtype(dtype).str,
+        'compressor': 'zlib',
+        'stored_bytes': stored_bytes
+    }
+
+
+def convert_netcdf(path, store_folder='data/store', variable=None, chunks=None):
+    """
+    Convierte un timeAvgMap (o una pila mensual con eje time) al almacén
+
+    Args:
+        path: archivo .nc
+        store_folder: carpeta raíz del almacén
+        variable: nombre de la variable de la app (carpeta de salida)
+        chunks: forma de chunk del campo (por defecto según dimensiones)
+
+    Returns:
+        ruta de la carpeta de la variable
+    """
+    if netCDF4 is None:
+        raise ImportError("Se requiere netCDF4 para convertir .nc: pip install netCDF4")
+
+    variable = variable or os.path.splitext(os.path.basename(path))[0].rsplit('-', 1)[-1]
+    folder = os.path.join(store_folder, variable)
+    os.makedirs(folder, exist_ok=True)
+
+    with netCDF4.Dataset(path, 'r') as nc:
+        field_name = GridDataset._find_field(nc)
+        var = nc.variables[field_name]
+        var.set_auto_maskandscale(False)
+        fill_values = tuple(
+            float(getattr(var, attr)) for attr in ('_FillValue', 'missing_value')
+            if attr in var.ncattrs()
+        )
+
+        arrays = {field_name: write_array(folder, field_name, var, chunks, fill_values=fill_values)}
+
+        if 'shape_mask' in nc.variables:
+            shape_mask = nc.variables['shape_mask']
+            shape_mask.set_auto_maskandscale(False)
+            arrays['shape_mask'] = write_array(folder, 'shape_mask', shape_mask, dtype=np.uint8)
+
+        for axis in ('lat', 'lon', 'lat_bnds', 'lon_bnds', 'time'):
+            if axis in nc.variables:
+                np.save(os.path.join(folder, f'{axis}.npy'), np.asarray(nc.variables[axis][:]))
+
+        stat = os.stat(path)
+        meta = {
+            'version': STORE_VERSION,
+            'variable': variable,
+            'field': field_name,
+            'dimensions': list(var.dimensions),
+            'units': getattr(var, 'units', None),
+            'start_date': getattr(nc, 'userstartdate', getattr(nc, 'start_time', None)),
+            'end_date': getattr(nc, 'userenddate', getattr(nc, 'end_time', None)),
+            'source': os.path.basename(path),
+            'source_signature': [stat.st_size, stat.st_mtime_ns],
+            'arrays': arrays
+        }
+
+    meta_path = os.path.join(folder, 'meta.json')
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(meta_path + '.tmp', meta_path)
+
+    return folder
+
+
+def convert_raw_folder(raw_folder='data/raw', store_folder='data/store', force=False):
+    """
+    Convierte todos los timeAvgMap; salta los que no cambiaron
+
+    Returns:
+        dict {variable: carpeta}
+    """
+    converted = {}
+    for variable, path in find_grid_files(raw_folder).items():
+        meta = read_meta(os.path.join(store_folder, variable))
+        stat = os.stat(path)
+        if not force and meta and meta.get('source_signature') == [stat.st_size, stat.st_mtime_ns]:
+            converted[variable] = os.path.join(store_folder, variable)
+            continue
+        converted[variable] = convert_netcdf(path, store_folder, variable)
+    return converted
+
+
+# ============================================
+# LECTURA
+# ============================================
+def read_meta(folder):
+    """meta.json de una variable, o None si falta o es de otra versión"""
+    meta_path = os.path.join(folder, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != STORE_VERSION:
+        return None
+    return meta
+
+
+class StoredArray:
+    """Un arreglo del almacén; solo se descomprimen los chunks pedidos"""
+
+    def __init__(self, folder, name, meta, tile_cache=None):
+        self.folder = folder
+        self.name = name
+        self.shape = tuple(meta['shape'])
+        self.chunks = tuple(meta['chunks'])
+        self.dtype = np.dtype(meta['dtype'])
+        self.ndim = len(self.shape)
+        self.tile_cache = tile_cache if tile_cache is not None else DEFAULT_TILE_CACHE
+
+    def _chunk_path(self, index):
+        return os.path.join(self.folder, self.name, '.'.join(map(str, index)) + '.z')
+
+    def read_chunk(self, index):
+        """Un chunk como float64 (NaN si no existe el archivo)"""
+        index = tuple(int(i) for i in index)
+
+        def load():
+            shape = tuple(
+                min(c, s - i * c) for i, c, s in zip(index, self.chunks, self.shape)
+            )
+            path = self._chunk_path(index)
+            if not os.path.exists(path):
+                return np.full(shape, np.nan)
+            with open(path, 'rb') as f:
+                raw = zlib.decompress(f.read())
+            return np.frombuffer(raw, dtype=self.dtype).reshape(shape).astype(np.float64)
+
+        return self.tile_cache.get((self.folder, self.name, index), load)
+
+    def __getitem__(self, key):
+        """Lectura con slices (un slice por dimensión; sin pasos)"""
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (self.ndim - len(key))
+
+        bounds = []
+        for k, size in zip(key, self.shape):
+            if isinstance(k, (int, np.integer)):
+                k = int(k) + size if k < 0 else int(k)
+                if not 0 <= k < size:
+                    raise IndexError(f"índice fuera de 0-{size - 1}")
+                k = slice(k, k + 1)
+            start, stop, _ = k.indices(size)
+            bounds.append((start, max(stop, start)))
+
+        out = np.empty([stop - start for start, stop in bounds], dtype=np.float64)
+        if out.size == 0:
+            return out
+
+        ranges = [
+            range(start // c, (stop - 1) // c + 1) for (start, stop), c in zip(bounds, self.chunks)
+        ]
+        for index in itertools.product(*ranges):
+            tile = self.read_chunk(index)
+            src, dst = [], []
+            for (start, stop), i, c in zip(bounds, index, self.chunks):
+                lo, hi = max(start, i * c), min(stop, (i + 1) * c)
+                src.append(slice(lo - i * c, hi - i * c))
+                dst.append(slice(lo - start, hi - start))
+            out[tuple(dst)] = tile[tuple(src)]
+
+        # Los índices enteros quitan su dimensión, como en NumPy
+        squeeze = tuple(d for d, k in enumerate(key) if isinstance(k, (int, np.integer)))
+        return out.squeeze(axis=squeeze) if squeeze else out
+
+
+def field_ndim(meta):
+    """Dimensiones del campo principal de un meta.json (2 = mapa, 3 = pila)"""
+    return len(meta['arrays'][meta['field']]['shape'])
+
+
+class StoreGridDataset(GridDataset):
+    """
+    GridDataset que lee del almacén por chunks en vez del .nc
+
+    Misma API (window, sample, mask, value_at...); solo cambia de dónde
+    salen los chunks. Una pila 3-D (tiempo, lat, lon) se abre como el mapa
+    de UN paso de tiempo: StoreGridDataset(carpeta, time_index=t).
+    """
+
+    def __init__(self, folder, variable=None, convert_units=True, tile_cache=None, time_index=None):
+        """
+        Args:
+            time_index: paso de tiempo a leer si el campo es una pila 3-D
+                        (obligatorio en ese caso; se ignora en mapas 2-D)
+        """
+        super().__init__(folder, variable=variable, convert_units=convert_units, tile_cache=tile_cache)
+        self.time_index = time_index
+        self.time = None
+
+    def open(self):
+        if self._nc is not None:
+            return self
+
+        with self._lock:
+            if self._nc is not None:
+                return self
+
+            meta = read_meta(self.path)
+            if meta is None:
+                raise FileNotFoundError(f"No hay almacén válido en {self.path} (python -m data.chunk_store)")
+
+            arrays = {
+                name: StoredArray(self.path, name, info, self.tile_cache)
+                for name, info in meta['arrays'].items()
+            }
+            field = arrays[meta['field']]
+
+            if field.ndim == 3:
+                if self.time_index is None:
+                    raise ValueError(
+                        f"{self.path} es una pila (tiempo, lat, lon) de {field.shape[0]} pasos: "
+                        "indique time_index"
+                    )
+                if not -field.shape[0] <= self.time_index < field.shape[0]:
+                    raise IndexError(f"time_index {self.time_index} fuera de 0-{field.shape[0] - 1}")
+                # Índices negativos (-1 = último paso) se normalizan aquí
+                self.time_index = int(self.time_index) % field.shape[0]
+            elif field.ndim != 2:
+                raise ValueError(f"{self.path}: campo de {field.ndim} dimensiones no soportado")
+
+            time_path = os.path.join(self.path, 'time.npy')
+            if field.ndim == 3 and os.path.exists(time_path):
+                self.time = np.load(time_path)
+
+            self.field_name = meta['field']
+            self.lat = np.load(os.path.join(self.path, 'lat.npy')).astype(np.float64)
+            self.lon = np.load(os.path.join(self.path, 'lon.npy')).astype(np.float64)
+            self.lat_bounds = self._load_bounds('lat_bnds', self.lat)
+            self.lon_bounds = self._load_bounds('lon_bnds', self.lon)
+            self.fill_values = ()  # el relleno ya se guardó como NaN
+            self.units = meta.get('units')
+            # La malla que se expone es siempre 2-D (lat, lon)
+            self.shape = field.shape[-2:]
+            self.dtype = field.dtype
+            self.chunks = field.chunks[-2:]
+            self.start_date = meta.get('start_date')
+            self.end_date = meta.get('end_date')
+
+            self._nc = arrays
+
+        return self
+
+    def _load_bounds(self, name, centers):
+        path = os.path.join(self.path, f'{name}.npy')
+        if os.path.exists(path):
+            return np.load(path).astype(np.float64)
+        return self._bounds_from_centers(centers)
+
+    def close(self):
+        with self._lock:
+            self._nc = None
+
+    def _has_variable(self, name):
+        return name in self._nc
+
+    def _chunk_shape(self, name):
+        return self._nc[name].chunks[-2:]
+
+    def _read_tiled(self, name, i0, i1, j0, j1):
+        # StoredArray ya arma la ventana con los chunks de la caché; en una
+        # pila se lee solo el paso time_index (shape_mask sigue siendo 2-D)
+        array = self._nc[name]
+        if array.ndim == 3:
+            return array[self.time_index, i0:i1, j0:j1]
+        return array[i0:i1, j0:j1]
+
+
+def open_store_grids(store_folder='data/store', convert_units=True, tile_cache=None):
+    """
+    StoreGridDataset por variable (misma forma que open_grids)
+
+    Solo mapas 2-D: las pilas 3-D no son un mapa promedio y se omiten
+    (se abren con StoreGridDataset(carpeta, time_index=t)).
+
+    Returns:
+        dict {variable: StoreGridDataset}
+    """
+    grids = {}
+    if not os.path.isdir(store_folder):
+        return grids
+
+    for variable in sorted(os.listdir(store_folder)):
+        folder = os.path.join(store_folder, variable)
+        meta = read_meta(folder)
+        if meta is None or field_ndim(meta) != 2:
+            continue
+        grids[variable] = StoreGridDataset(folder, variable=variable,
+                                           convert_units=convert_units, tile_cache=tile_cache)
+    return grids
+
+
+# ============================================
+# COMANDO: convertir data/raw
+# ============================================
+if __name__ == "__main__":
+    import time
+
+    from data.grid_reader import open_grids
+    from data.tile_cache import TileCache
+
+    print("\n🗜️ CONVIRTIENDO data/raw → data/store")
+    print("=" * 70)
+
+    started = time.perf_counter()
+    folders = convert_raw_folder(force=True)
+    print(f"✅ {len(folders)} variables en {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    rng = np.random.default_rng(0)
+    for variable, folder in folders.items():
+        meta = read_meta(folder)
+        field = meta['arrays'][meta['field']]
+
+        # Lecturas puntuales en frío (caché nueva) en ambos formatos
+        nc_grid = open_grids(tile_cache=TileCache())[variable].open()
+        store_grid = StoreGridDataset(folder, variable=variable, tile_cache=TileCache()).open()
+        lats = rng.uniform(nc_grid.lat[0], nc_grid.lat[-1], 20)
+        lons = rng.uniform(nc_grid.lon[0], nc_grid.lon[-1], 20)
+
+        timings = {}
+        for label, grid in (('nc', nc_grid), ('store', store_grid)):
+            t0 = time.perf_counter()
+            values = [grid.value_at(la, lo) for la, lo in zip(lats, lons)]
+            timings[label] = (time.perf_counter() - t0) * 1000
+            timings[label + '_values'] = np.array(values)
+
+        same = np.allclose(timings['nc_values'], timings['store_values'], equal_nan=True, rtol=1e-6)
+        print(f"🗺️ {variable}: chunks {tuple(field['chunks'])}, {field['stored_bytes'] / 1024:.1f} KB | "
+              f"20 puntos en frío: nc {timings['nc']:.1f} ms, store {timings['store']:.1f} ms "
+              f"{'✅' if same else '❌'}")
@@ -0,0 +1,251 @@
+# data/climate_cube.py
+"""
+Cubo Climático
+==============
+Almacena TODAS las series mensuales en un solo arreglo NumPy contiguo:
+
+    values[ciudad, variable, año, mes]   (NaN donde no hay dato)
+
+POR QUÉ EXISTE:
+- El almacenamiento por diccionarios (self.data[ciudad][var]['by_month'][mes])
+  obliga a varios saltos de dict y arreglos de distinto largo por consulta
+- En el cubo, una consulta es un slice y los cálculos entre ciudades o entre
+  variables son una sola operación vectorizada
+- Como los años están alineados, variables que se combinan (ej: humedad +
+  temperatura) siempre corresponden al mismo año
+
+CONCURRENCIA:
+- values y first_year se guardan juntos en UNA tupla (layout) que
+  ensure_years reemplaza de un solo golpe; quien necesite ambos (índice de
+  año → posición) debe leer layout() una vez en lugar de values y
+  first_year por separado, o puede mezclar el arreglo nuevo con el año
+  inicial viejo
+- Las escrituras (ensure_years, set_series, clear_series) las serializa
+  quien usa el cubo (CSVProcessorOptimized._store_lock)
+"""
+
+import numpy as np
+
+
+class ClimateCube:
+    """Arreglo denso [ciudad, variable, año, mes] con índices por clave"""
+
+    def __init__(self, city_keys, variables, first_year, last_year, dtype=np.float64):
+        """
+        Args:
+            city_keys: lista de claves de ciudad (ej: ['veracruz', 'cdmx', ...])
+            variables: lista de variables (ej: ['temperatura', 'precipitacion', ...])
+            first_year, last_year: rango de años (inclusive); None si todavía
+                no hay datos (el eje de años queda vacío hasta el primer
+                ensure_years)
+            dtype: tipo de dato de los valores
+        """
+        self.city_keys = list(city_keys)
+        self.variables = list(variables)
+
+        # Mapas clave → posición
+        self.city_index = {key: i for i, key in enumerate(self.city_keys)}
+        self.var_index = {var: i for i, var in enumerate(self.variables)}
+
+        n_years = 0 if first_year is None else int(last_year) - int(first_year) + 1
+        values = np.full(
+            (len(self.city_keys), len(self.variables), n_years, 12),
+            np.nan,
+            dtype=dtype
+        )
+        self._layout = (values, None if first_year is None else int(first_year))
+
+    @classmethod
+    def from_series(cls, series, city_keys, variables, dtype=np.float64):
+        """
+        Construye el cubo a partir de series ya convertidas
+
+        Args:
+            series: dict {(city_key, var): {'values', 'year', 'month'}}
+            city_keys, variables: orden de los ejes
+
+        Returns:
+            ClimateCube
+        """
+        years = [arrays['year'] for arrays in series.values() if len(arrays['year']) > 0]
+
+        if years:
+            first_year = min(int(y.min()) for y in years)
+            last_year = max(int(y.max()) for y in years)
+        else:
+            # Sin series: el rango se fija con la primera serie que llegue
+            # (con 0 aquí, ensure_years(2025) reservaría ~2,025 años)
+            first_year = last_year = None
+
+        cube = cls(city_keys, variables, first_year, last_year, dtype=dtype)
+
+        for (city_key, var), arrays in series.items():
+            cube.set_series(city_key, var, arrays['year'], arrays['month'], arrays['values'])
+
+        return cube
+
+    @classmethod
+    def from_array(cls, values, city_keys, variables, first_year):
+        """
+        Envuelve un arreglo ya existente (ej: mapeado en memoria) sin copiarlo
+
+        Args:
+            values: ndarray [ciudad, variable, año, mes]
+            city_keys, variables: orden de los ejes
+            first_year: año del índice 0 (None con el eje de años vacío)
+        """
+        cube = cls.__new__(cls)
+        cube.city_keys = list(city_keys)
+        cube.variables = list(variables)
+        cube.city_index = {key: i for i, key in enumerate(cube.city_keys)}
+        cube.var_index = {var: i for i, var in enumerate(cube.variables)}
+        if first_year is None or values.shape[2] == 0:
+            cube._layout = (values, None)
+        else:
+            cube._layout = (values, int(first_year))
+        return cube
+
+    def layout(self):
+        """(values, first_year) consistentes entre sí (ver CONCURRENCIA)"""
+        return self._layout
+
+    @property
+    def values(self):
+        """Arreglo [ciudad, variable, año, mes]"""
+        return self._layout[0]
+
+    @property
+    def first_year(self):
+        """Año del índice 0 (None con el eje de años vacío)"""
+        return self._layout[1]
+
+    @property
+    def last_year(self):
+        values, first_year = self._layout
+        return None if first_year is None else first_year + values.shape[2] - 1
+
+    @property
+    def years(self):
+        """Eje de años del cubo"""
+        values, first_year = self._layout
+        if first_year is None:
+            return np.arange(0)
+        return np.arange(first_year, first_year + values.shape[2])
+
+    def ensure_years(self, first_year, last_year):
+        """
+        Amplía el eje de años si una serie nueva cae fuera del rango actual
+
+        Solo reasigna memoria cuando el rango realmente crece. Un cubo sin
+        años toma exactamente el rango pedido. El arreglo nuevo y su año
+        inicial se publican juntos (una sola asignación de _layout).
+        """
+        old_values, old_first = self._layout
+
+        if old_first is None:
+            values = np.full(
+                old_values.shape[:2] + (last_year - first_year + 1, 12),
+                np.nan,
+                dtype=old_values.dtype
+            )
+            self._layout = (values, int(first_year))
+            return
+
+        old_last = old_first + old_values.shape[2] - 1
+        if first_year >= old_first and last_year <= old_last:
+            return
+
+        new_first = min(int(first_year), old_first)
+        new_last = max(int(last_year), old_last)
+
+        values = np.full(
+            old_values.shape[:2] + (new_last - new_first + 1, 12),
+            np.nan,
+            dtype=old_values.dtype
+        )
+        offset = old_first - new_first
+        values[:, :, offset:offset + old_values.shape[2]] = old_values
+
+        self._layout = (values, new_first)
+
+    def set_series(self, city_key, var, years, months, values):
+        """Escribe una serie completa (asignación vectorizada por índice)"""
+        if len(years) == 0:
+            return
+        if self.first_year is None:
+            self.ensure_years(int(np.min(years)), int(np.max(years)))
+
+        ci = self.city_index[city_key]
+        vi = self.var_index[var]
+        cube_values, first_year = self._layout
+
+        year_pos = np.asarray(years, dtype=np.int64) - first_year
+        month_pos = np.asarray(months, dtype=np.int64) - 1
+
+        cube_values[ci, vi, year_pos, month_pos] = values
+
+    def clear_series(self, city_key, var):
+        """Borra (NaN) todos los datos de una ciudad/variable"""
+        self.values[self.city_index[city_key], self.var_index[var]] = np.nan
+
+    def series_arrays(self, city_key, var):
+        """
+        Reconstruye la serie de una ciudad/variable en orden cronológico
+
+        Returns:
+            dict con 'year', 'month' y 'values' (solo meses con dato)
+        """
+        values, first_year = self._layout
+        block = values[self.city_index[city_key], self.var_index[var]]
+        year_pos, month_pos = np.nonzero(~np.isnan(block))
+
+        return {
+            'year': (year_pos + (first_year or 0)).astype(np.int16),
+            'month': (month_pos + 1).astype(np.int8),
+            'values': block[year_pos, month_pos].astype(np.float64)
+        }
+
+    def has(self, city_key, var):
+        """True si la ciudad/variable tiene al menos un dato"""
+        if city_key not in self.city_index or var not in self.var_index:
+            return False
+        return bool(np.any(~np.isnan(self.values[self.city_index[city_key], self.var_index[var]])))
+
+    def month_slice(self, month):
+        """Todos los datos de un mes: vista [ciudad, variable, año]"""
+        return self.values[:, :, :, month - 1]
+
+    def series_month(self, city_key, var, month):
+        """Vista [año] de una ciudad/variable en un mes (con NaN)"""
+        return self.values[self.city_index[city_key], self.var_index[var], :, month - 1]
+
+    def month_values(self, city_key, var, month):
+        """
+        Valores históricos válidos de un mes (mismo formato que by_month)
+
+        Returns:
+            ndarray 1-D sin NaN, o None si la ciudad/variable no existe
+        """
+        if city_key not in self.city_index or var not in self.var_index:
+            return None
+
+        values = self.series_month(city_key, var, month)
+        return values[~np.isnan(values)]
+
+    def aligned_month_values(self, city_key, variables, month):
+        """
+        Valores de varias variables en los MISMOS años (solo años completos)
+
+        Returns:
+            ndarray [variable, año] sin NaN
+        """
+        ci = self.city_index[city_key]
+        vis = [self.var_index[var] for var in variables]
+
+        block = self.values[ci, vis, :, month - 1]
+        complete = ~np.isnan(block).any(axis=0)
+        return block[:, complete]
+
+    def nbytes(self):
+        """Bytes ocupados por el arreglo de valores"""
+        return self.values.nbytes
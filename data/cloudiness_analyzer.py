@@ -8,6 +8,8 @@ Convierte fracción de nubes MODIS (0-1) a porcentaje (0-100%).
 import numpy as np
 from datetime import datetime
 
+from data.station_interpolation import point_stations
+
 class CloudinessAnalyzer:
     """Analiza cobertura de nubes"""
     
@@ -108,16 +110,18 @@ class CloudinessAnalyzer:
         return message
 
 
-def integrate_cloudiness_with_processor(processor, cloudiness_analyzer, lat, lon, month, day):
-    """Integra analizador de nubosidad con procesador"""
+def integrate_cloudiness_with_processor(processor, cloudiness_analyzer, lat, lon, month, day, interpolation=None):
+    """Integra analizador de nubosidad con procesador (interpolation: ver integrate_wind_with_processor)"""
+    options = {} if interpolation is None else {'interpolation': interpolation}
     cloud_values, city_name = processor.get_historical_data(
-        lat, lon, 'nubosidad', month, day
+        lat, lon, 'nubosidad', month, day, **options
     )
     
     if cloud_values is None:
         return None
     
-    city_key = processor.find_nearest_city(lat, lon)[0]
+    city_weights = point_stations(processor, lat, lon, ['nubosidad'], interpolation)
+    city_key = next(iter(city_weights), None)
     date = datetime(2024, month, day)
     
     analysis = cloudiness_analyzer.analyze_monthly_data(
@@ -127,5 +131,6 @@ def integrate_cloudiness_with_processor(processor, cloudiness_analyzer, lat, lon
     if analysis:
         analysis['message'] = cloudiness_analyzer.get_cloudiness_message(analysis, date)
         analysis['city_name'] = city_name
+        analysis['interpolated'] = len(city_weights) > 1
     
     return analysis
\ No newline at end of file
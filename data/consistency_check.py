@@ -0,0 +1,435 @@
+# data/consistency_check.py
+"""
+Verificación de Consistencia CSV ↔ Malla
+========================================
+Compara cada serie de data/csv con el promedio por área de la malla .nc de
+la MISMA variable sobre la caja del CSV (Data Bounding Box), en el mismo
+periodo, para todas las ciudades y variables en una pasada vectorizada.
+
+POR QUÉ EXISTE:
+- diagnostico_nubosidad.py revisaba min/max/promedio de UNA variable para
+  adivinar sus unidades
+- Un CSV en otras unidades, con un factor de escala olvidado, de otro
+  producto o descargado con la caja de otra ciudad da resultados creíbles
+  pero falsos; contra la malla se nota de inmediato
+
+QUÉ REPORTA (por ciudad y variable):
+- 'escala': el cociente CSV/malla coincide con un factor conocido (x100, x3.6...)
+- 'unidades': diferencia de ~273.15 en temperatura (Kelvin vs °C)
+- 'diferencia': el promedio no coincide y no hay factor que lo explique
+- 'caja': la caja del CSV no contiene a la ciudad (se indica a quién corresponde)
+- 'producto': la variable del CSV no es la misma que la de la malla
+- 'rango': valores fuera del rango físico de la variable
+- 'atipicos': meses con |z| robusto > OUTLIER_Z respecto a su mes (mediana/MAD)
+
+CACHÉ:
+- El reporte se guarda en DATA_CONFIG['consistency_report'] junto con el
+  hash SHA-1 de cada CSV y la firma de cada malla
+- En un arranque en caliente solo se comparan tamaños/mtimes; el hash se
+  recalcula únicamente de los archivos que cambiaron
+- También se invalida si cambia el código de la verificación (CHECK_MODULES)
+
+USO:
+    python -m data.consistency_check
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from config.settings import CIUDADES_NASA, DATA_CONFIG
+from data.area_average import grid_box_averages
+from data.climate_cube import ClimateCube
+from data.csv_cache import CSVCache
+from data.csv_catalog import build_catalog
+from data.csv_processor_optimized import _ingest_file
+from data.snapshot import code_fingerprint
+
+# Subir este número si cambian los criterios del reporte
+CHECK_VERSION = 1
+
+# Módulos cuyo código define el reporte (si cambian, se vuelve a verificar)
+CHECK_MODULES = [
+    'data/consistency_check.py',
+    'data/area_average.py',
+    'data/csv_processor_optimized.py'
+]
+
+# Diferencia relativa aceptada entre el promedio del CSV y el de la malla
+REL_TOLERANCE = 0.2
+
+# Factores de escala típicos entre unidades (CSV = factor × malla)
+KNOWN_FACTORS = {
+    '×100 (fracción → %)': 100.0,
+    '×0.01 (% → fracción)': 0.01,
+    '×3.6 (m/s → km/h)': 3.6,
+    '÷3.6 (km/h → m/s)': 1 / 3.6,
+    '×1000 (kg/kg → g/kg)': 1000.0,
+    '×0.001 (g/kg → kg/kg)': 0.001,
+    '×24 (mm/h → mm/día)': 24.0,
+    '×30 (mm/día → mm/mes)': 30.0,
+    '×720 (mm/h → mm/mes)': 720.0,
+    '×86400 (kg/m²/s → mm/día)': 86400.0
+}
+FACTOR_TOLERANCE = 0.1
+
+KELVIN_OFFSET = 273.15
+
+# Rango físico plausible en unidades de la app
+PHYSICAL_RANGES = {
+    'temperatura': (-40.0, 50.0),   # °C
+    'precipitacion': (0.0, 2000.0),  # mm/mes
+    'viento': (0.0, 200.0),          # km/h
+    'humedad': (0.0, 0.04),          # kg/kg
+    'nubosidad': (0.0, 100.0)        # %
+}
+
+OUTLIER_Z = 5.0
+
+# Escala de MAD → desviación estándar para una normal
+MAD_SCALE = 1.4826
+
+
+# ============================================
+# FIRMAS (CACHÉ POR HASH DE DATOS)
+# ============================================
+def _csv_signatures(catalog, previous):
+    """
+    {archivo: [tamaño, mtime_ns, sha1]}; reutiliza el sha1 anterior si el
+    tamaño y el mtime no cambiaron
+    """
+    signatures = {}
+    for entry in catalog.values():
+        old = previous.get(entry['filename'])
+        if old and old[0] == entry['size'] and old[1] == entry['mtime_ns']:
+            signatures[entry['filename']] = old
+        else:
+            signatures[entry['filename']] = [
+                entry['size'], entry['mtime_ns'], CSVCache._file_hash(entry['path'])
+            ]
+    return signatures
+
+
+def _grid_signatures(grids):
+    signatures = {}
+    for variable, grid in grids.items():
+        stat = os.stat(grid.path)
+        signatures[variable] = [os.path.basename(grid.path), stat.st_size, stat.st_mtime_ns]
+    return signatures
+
+
+def _read_report(path):
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return report if report.get('version') == CHECK_VERSION else {}
+
+
+def _write_report(path, report):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ============================================
+# CRITERIOS
+# ============================================
+def match_scale_factor(ratio):
+    """Nombre del factor conocido que explica el cociente CSV/malla, o None"""
+    if not np.isfinite(ratio) or ratio <= 0:
+        return None
+    for name, factor in KNOWN_FACTORS.items():
+        if abs(np.log(ratio / factor)) <= FACTOR_TOLERANCE:
+            return name
+    return None
+
+
+def _box_contains(bbox, lat, lon, margin):
+    west, south, east, north = bbox
+    return (west - margin <= lon <= east + margin) and (south - margin <= lat <= north + margin)
+
+
+def city_for_box(bbox, margin):
+    """Ciudad de CIUDADES_NASA que cae dentro de la caja (o la más cercana a su centro)"""
+    inside = [
+        key for key, info in CIUDADES_NASA.items()
+        if _box_contains(bbox, info['lat'], info['lon'], margin)
+    ]
+    if inside:
+        return inside[0]
+
+    center_lat = (bbox[1] + bbox[3]) / 2
+    center_lon = (bbox[0] + bbox[2]) / 2
+    return min(
+        CIUDADES_NASA,
+        key=lambda key: (CIUDADES_NASA[key]['lat'] - center_lat) ** 2 + (CIUDADES_NASA[key]['lon'] - center_lon) ** 2
+    )
+
+
+def robust_zscores(values):
+    """
+    z robusto de cada mes respecto a su mismo mes en los demás años
+
+    Args:
+        values: ndarray [..., año, mes] con NaN sin dato
+
+    Returns:
+        ndarray de la misma forma
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        median = np.nanmedian(values, axis=-2, keepdims=True)
+        mad = np.nanmedian(np.abs(values - median), axis=-2, keepdims=True) * MAD_SCALE
+        return (values - median) / np.where(mad > 0, mad, np.nan)
+
+
+# ============================================
+# VERIFICACIÓN
+# ============================================
+def _load_series(catalog, cache_folder):
+    """{(city_key, var): arrays} usando la caché binaria de los CSV"""
+    series = {}
+    for (var, city_key), entry in catalog.items():
+        report, arrays = _ingest_file((city_key, var, entry['path'], cache_folder))
+        if arrays is not None and len(arrays['values']) > 0:
+            series[(city_key, var)] = arrays
+    return series
+
+
+def _period_mask(cube, start_date, end_date):
+    """Máscara [año, mes] de los meses dentro del periodo de la malla"""
+    first = int(start_date[:4]) * 12 + int(start_date[5:7]) - 1
+    last = int(end_date[:4]) * 12 + int(end_date[5:7]) - 1
+    index = cube.years[:, None] * 12 + np.arange(12)[None, :]
+    return (index >= first) & (index <= last)
+
+
+def _check_variable(var, grid, cube, entries):
+    """Hallazgos de todas las ciudades de UNA variable (una llamada a area_average)"""
+    grid.open()
+    vi = cube.var_index[var]
+    cities = [city_key for city_key, _ in entries]
+    ci = np.array([cube.city_index[city_key] for city_key in cities])
+
+    # [ciudades, año, mes] y promedio del CSV en el periodo de la malla
+    block = cube.values[ci, vi]
+    in_period = _period_mask(cube, grid.start_date, grid.end_date)
+    with np.errstate(invalid='ignore'):
+        csv_means = np.nanmean(np.where(in_period, block, np.nan).reshape(len(cities), -1), axis=1)
+
+    bboxes = [entry['metadata']['data_bbox'] for _, entry in entries]
+    grid_means = grid_box_averages(grid, bboxes)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratios = csv_means / grid_means
+    differences = csv_means - grid_means
+
+    low, high = PHYSICAL_RANGES.get(var, (-np.inf, np.inf))
+    with np.errstate(invalid='ignore'):
+        out_of_range = ((block < low) | (block > high)).reshape(len(cities), -1).sum(axis=1)
+        zscores = np.abs(robust_zscores(block))
+        outliers = (zscores > OUTLIER_Z).reshape(len(cities), -1).sum(axis=1)
+
+    # La caja son los centros extremos: la ciudad puede quedar a media celda
+    margin = max(abs(grid.lat[1] - grid.lat[0]), abs(grid.lon[1] - grid.lon[0])) / 2
+
+    findings = []
+    for k, (city_key, entry) in enumerate(entries):
+        metadata = entry['metadata']
+        issues = []
+
+        finding = {
+            'city': city_key,
+            'variable': var,
+            'file': entry['filename'],
+            'grid_file': os.path.basename(grid.path),
+            'grid_field': grid.field_name,
+            'period': f"{grid.start_date[:7]} - {grid.end_date[:7]}",
+            'csv_mean': float(csv_means[k]),
+            'grid_mean': float(grid_means[k]),
+            'ratio': float(ratios[k]),
+            'scale_factor': None,
+            'scale_factor_value': None,
+            'bbox_city': None,
+            'out_of_range': int(out_of_range[k]),
+            'outliers': int(outliers[k]),
+            'worst_outlier': None,
+            'issues': issues
+        }
+
+        if np.isfinite(ratios[k]) and abs(ratios[k] - 1.0) > REL_TOLERANCE:
+            factor = match_scale_factor(ratios[k])
+            if factor:
+                issues.append('escala')
+                finding['scale_factor'] = factor
+                finding['scale_factor_value'] = KNOWN_FACTORS[factor]
+            elif var == 'temperatura' and abs(abs(differences[k]) - KELVIN_OFFSET) < 10:
+                issues.append('unidades')
+                finding['scale_factor'] = '±273.15 (K ↔ °C)'
+            else:
+                issues.append('diferencia')
+
+        bbox_city = city_for_box(metadata['data_bbox'], margin)
+        if bbox_city != city_key:
+            issues.append('caja')
+            finding['bbox_city'] = bbox_city
+
+        csv_variable = (metadata.get('variable') or '')
+        if csv_variable.startswith('mean_'):
+            csv_variable = csv_variable[len('mean_'):]
+        if csv_variable and grid.field_name and csv_variable != grid.field_name:
+            issues.append('producto')
+            finding['csv_product'] = csv_variable
+            finding['grid_product'] = grid.field_name
+
+        if out_of_range[k]:
+            issues.append('rango')
+
+        if outliers[k]:
+            issues.append('atipicos')
+            with np.errstate(invalid='ignore'):
+                worst = np.nanargmax(np.where(np.isnan(zscores[k]), -np.inf, zscores[k]))
+            year_pos, month_pos = np.unravel_index(worst, zscores[k].shape)
+            finding['worst_outlier'] = {
+                'year': int(cube.first_year + year_pos),
+                'month': int(month_pos + 1),
+                'value': float(block[k, year_pos, month_pos]),
+                'z': float(zscores[k, year_pos, month_pos])
+            }
+
+        findings.append(finding)
+
+    return findings
+
+
+def check_consistency(csv_folder='data/csv', raw_folder='data/raw', cache_folder='data/cache',
+                      report_path=None, force=False):
+    """
+    Verifica todos los CSV contra las mallas (o devuelve el reporte guardado)
+
+    Args:
+        csv_folder, raw_folder: datos de entrada
+        cache_folder: caché binaria de los CSV (None = parsear siempre)
+        report_path: JSON del reporte (por defecto DATA_CONFIG['consistency_report'])
+        force: ignorar el reporte guardado
+
+    Returns:
+        dict con 'data_hash', 'findings' (lista por ciudad/variable) y 'cached'
+    """
+    from data.grid_reader import open_grids
+
+    report_path = report_path or DATA_CONFIG['consistency_report']
+    previous = {} if force else _read_report(report_path)
+
+    catalog = build_catalog(csv_folder)
+    grids = open_grids(raw_folder)
+
+    csv_signatures = _csv_signatures(catalog, previous.get('csv', {}))
+    grid_signatures = _grid_signatures(grids)
+    data_hash = hashlib.sha1(json.dumps(
+        [CHECK_VERSION, code_fingerprint(CHECK_MODULES), sorted(csv_signatures.items()), sorted(grid_signatures.items())]
+    ).encode('utf-8')).hexdigest()
+
+    if previous.get('data_hash') == data_hash:
+        for grid in grids.values():
+            grid.close()
+        return dict(previous, cached=True)
+
+    entries_by_var = {}
+    for (var, city_key), entry in sorted(catalog.items()):
+        if var in grids and entry['metadata'] and entry['metadata'].get('data_bbox'):
+            entries_by_var.setdefault(var, []).append((city_key, entry))
+
+    series = _load_series(catalog, cache_folder)
+    cube = ClimateCube.from_series(
+        series,
+        sorted({city_key for city_key, _ in series}),
+        sorted({var for _, var in series})
+    )
+
+    findings = []
+    for var, entries in entries_by_var.items():
+        entries = [(city_key, entry) for city_key, entry in entries if cube.has(city_key, var)]
+        if entries:
+            findings.extend(_check_variable(var, grids[var], cube, entries))
+
+    for grid in grids.values():
+        grid.close()
+
+    report = {
+        'version': CHECK_VERSION,
+        'data_hash': data_hash,
+        'csv': csv_signatures,
+        'grids': grid_signatures,
+        'findings': findings
+    }
+    _write_report(report_path, report)
+
+    return dict(report, cached=False)
+
+
+def print_report(report, variables=None):
+    """Imprime los hallazgos (solo las variables indicadas si se pasan)"""
+    findings = [
+        f for f in report['findings']
+        if variables is None or f['variable'] in variables
+    ]
+
+    current = None
+    for f in findings:
+        if f['variable'] != current:
+            current = f['variable']
+            # Campo de la malla (los archivos del almacén por chunks no
+            # siguen el patrón de nombres de GIOVANNI)
+            product = f.get('grid_field') or os.path.splitext(f['grid_file'])[0]
+            print(f"\n🗺️ {current} ({product}, {f['period']})")
+
+        status = "✅" if not f['issues'] else "⚠️ "
+        print(f"   {status} {f['city']:<10} CSV {f['csv_mean']:10.4f} | malla {f['grid_mean']:10.4f} "
+              f"| CSV/malla {f['ratio']:.3f}")
+
+        if 'escala' in f['issues'] or 'unidades' in f['issues']:
+            print(f"      🔧 Factor que explica la diferencia: {f['scale_factor']}")
+        if 'diferencia' in f['issues']:
+            print(f"      ❓ Diferencia de {abs(f['ratio'] - 1) * 100:.0f}% sin factor conocido")
+        if 'caja' in f['issues']:
+            print(f"      📦 {f['file']}: la caja del CSV corresponde a {f['bbox_city']}")
+        if 'producto' in f['issues']:
+            print(f"      🛰️ Producto distinto: CSV {f['csv_product']} vs malla {f['grid_product']}")
+        if 'rango' in f['issues']:
+            print(f"      🚫 {f['out_of_range']} valores fuera de rango físico")
+        if 'atipicos' in f['issues']:
+            worst = f['worst_outlier']
+            print(f"      📈 {f['outliers']} meses atípicos (peor: {worst['year']}-{worst['month']:02d} "
+                  f"= {worst['value']:.4f}, z={worst['z']:.1f})")
+
+    with_issues = sum(1 for f in findings if f['issues'])
+    print(f"\n{'✅' if not with_issues else '⚠️ '} {len(findings) - with_issues}/{len(findings)} series consistentes")
+
+
+# ============================================
+# COMANDO: verificar CSV contra mallas
+# ============================================
+if __name__ == "__main__":
+    import sys
+    import time
+
+    print("\n🔎 VERIFICANDO CONSISTENCIA CSV ↔ MALLA")
+    print("=" * 70)
+
+    started = time.perf_counter()
+    report = check_consistency(force='--force' in sys.argv)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    print_report(report)
+    print(f"\n⏱️ {elapsed:.1f} ms ({'reporte en caché' if report['cached'] else 'verificación completa'})")
+    print("=" * 70)
@@ -0,0 +1,140 @@
+# data/csv_cache.py
+"""
+Caché Binaria de CSVs
+=====================
+Guarda en disco (.npz) las series ya convertidas de cada ciudad/variable
+para que un arranque "en caliente" solo lea arreglos NumPy y no vuelva a
+parsear texto con pandas.
+
+POR QUÉ EXISTE:
+- Parsear 25 CSVs de GIOVANNI (read_csv + to_datetime + to_numeric) es lo
+  más lento del arranque de app.py
+- Con la caché, el tiempo de arranque crece con los bytes leídos y no con
+  el costo de parseo de pandas
+
+INVALIDACIÓN:
+- Cada entrada guarda tamaño, mtime y hash SHA-1 del CSV original
+- Si tamaño y mtime coinciden → se usa la caché directamente
+- Si cambiaron pero el hash es el mismo (ej: git checkout) → se usa la caché
+  y se actualiza la firma
+- Si el hash cambió → se descarta y se vuelve a parsear
+"""
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+# Subir este número si cambia el formato o las conversiones de unidades
+CACHE_VERSION = 3
+
+
+class CSVCache:
+    """Caché persistente de series convertidas en archivos .npz"""
+
+    def __init__(self, cache_folder='data/cache'):
+        self.cache_folder = cache_folder
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_folder, f"{key}.npz")
+
+    @staticmethod
+    def _file_hash(filepath):
+        """SHA-1 del archivo fuente (solo se calcula si cambió el mtime/tamaño)"""
+        sha = hashlib.sha1()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def load(self, key, source_path):
+        """
+        Carga los arreglos de una entrada si sigue siendo válida
+
+        Args:
+            key: identificador de la entrada (ej: 'cdmx_temperatura')
+            source_path: ruta del CSV original
+
+        Returns:
+            dict {nombre: ndarray} o None si no hay caché válida
+        """
+        cache_path = self._cache_path(key)
+
+        if not os.path.exists(cache_path):
+            return None
+
+        try:
+            with np.load(cache_path, allow_pickle=False) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+        except Exception:
+            return None
+
+        if int(arrays.pop('cache_version', -1)) != CACHE_VERSION:
+            return None
+
+        stat = os.stat(source_path)
+        source_size = int(arrays.pop('source_size'))
+        source_mtime_ns = int(arrays.pop('source_mtime_ns'))
+        source_hash = str(arrays.pop('source_hash'))
+
+        if source_size == stat.st_size and source_mtime_ns == stat.st_mtime_ns:
+            return arrays
+
+        # mtime/tamaño distintos: comparar contenido antes de descartar
+        if source_size == stat.st_size and source_hash == self._file_hash(source_path):
+            self.save(key, source_path, arrays, source_hash=source_hash,
+                      signature=(stat.st_size, stat.st_mtime_ns))
+            return arrays
+
+        return None
+
+    def save(self, key, source_path, arrays, source_hash=None, signature=None):
+        """
+        Guarda los arreglos de una entrada junto con la firma del CSV fuente
+
+        Args:
+            key: identificador de la entrada
+            source_path: ruta del CSV original
+            arrays: dict {nombre: ndarray} a guardar
+            source_hash: hash ya calculado (opcional)
+            signature: (tamaño, mtime_ns) tomados ANTES de leer el CSV; si el
+                       archivo creció mientras se parseaba, la entrada queda
+                       con la firma vieja y se invalida en la siguiente carga
+                       (por defecto se toma ahora)
+        """
+        os.makedirs(self.cache_folder, exist_ok=True)
+
+        if signature is None:
+            stat = os.stat(source_path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+        if source_hash is None:
+            source_hash = self._file_hash(source_path)
+
+        cache_path = self._cache_path(key)
+        # Temporal propio de cada proceso e hilo (ingesta en paralelo)
+        tmp_path = f"{cache_path[:-4]}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+
+        # Escritura atómica: otro proceso nunca ve un archivo a medias
+        try:
+            np.savez(
+                tmp_path,
+                cache_version=np.int64(CACHE_VERSION),
+                source_size=np.int64(signature[0]),
+                source_mtime_ns=np.int64(signature[1]),
+                source_hash=np.str_(source_hash),
+                **arrays
+            )
+            os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def clear(self):
+        """Elimina todas las entradas de la caché"""
+        if not os.path.isdir(self.cache_folder):
+            return
+
+        for name in os.listdir(self.cache_folder):
+            if name.endswith('.npz'):
+                os.remove(os.path.join(self.cache_folder, name))
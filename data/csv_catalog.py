@@ -0,0 +1,137 @@
+# data/csv_catalog.py
+"""
+Catálogo de Archivos CSV
+========================
+Recorre la carpeta de CSVs UNA sola vez (os.scandir) y arma un índice
+(variable, ciudad) → archivo + metadatos GIOVANNI.
+
+POR QUÉ EXISTE:
+- Antes se armaban nombres como 'QV2M_cdmx.csv' y se probaban con
+  os.path.exists, pero en disco están como 'QV2M_CDMX.csv' o
+  'MODIS_Veracruz.csv': en Linux la humedad y la nubosidad nunca cargaban
+- El viento de Monterrey se llama 'viento_monterret.csv' (typo)
+- Con nombres normalizados (minúsculas, sin acentos) y una tabla de alias
+  no hacen falta pruebas por archivo y se sabe exactamente qué pares faltan
+"""
+
+import os
+import unicodedata
+
+from data.giovanni_reader import read_giovanni_header
+
+# Prefijo del archivo → variable
+VARIABLE_ALIASES = {
+    'temperatura': 'temperatura',
+    'temp': 'temperatura',
+    't2m': 'temperatura',
+    'precipitacion': 'precipitacion',
+    'precip': 'precipitacion',
+    'viento': 'viento',
+    'wind': 'viento',
+    'humedad': 'humedad',
+    'qv2m': 'humedad',
+    'nubosidad': 'nubosidad',
+    'modis': 'nubosidad'
+}
+
+# Nombre de ciudad en el archivo → city_key
+CITY_ALIASES = {
+    'veracruz': 'veracruz',
+    'cdmx': 'cdmx',
+    'ciudad_de_mexico': 'cdmx',
+    'ciudaddemexico': 'cdmx',
+    'cancun': 'cancun',
+    'monterrey': 'monterrey',
+    'monterret': 'monterrey',  # typo en viento_monterret.csv
+    'tijuana': 'tijuana'
+}
+
+
+def normalize_name(text):
+    """'MODIS_Cancún' → 'modis_cancun' (minúsculas, sin acentos, '_' en espacios)"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return text.strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def parse_filename(filename):
+    """
+    Interpreta '<variable>_<ciudad>.csv' usando las tablas de alias
+
+    Returns:
+        (variable, city_key) o None si no se reconoce
+    """
+    stem, ext = os.path.splitext(filename)
+    if ext.lower() != '.csv':
+        return None
+
+    normalized = normalize_name(stem)
+    if '_' not in normalized:
+        return None
+
+    prefix, city = normalized.split('_', 1)
+    variable = VARIABLE_ALIASES.get(prefix)
+    city_key = CITY_ALIASES.get(city, city)
+
+    if variable is None:
+        return None
+
+    return variable, city_key
+
+
+def build_catalog(csv_folder, read_metadata=True):
+    """
+    Recorre la carpeta una vez y arma el catálogo
+
+    Args:
+        csv_folder: carpeta con los CSV de GIOVANNI
+        read_metadata: leer el encabezado GIOVANNI de cada archivo
+
+    Returns:
+        dict {(variable, city_key): {'path', 'filename', 'size', 'mtime_ns', 'metadata'}}
+    """
+    catalog = {}
+
+    if not os.path.isdir(csv_folder):
+        return catalog
+
+    with os.scandir(csv_folder) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+
+            key = parse_filename(entry.name)
+            if key is None:
+                continue
+
+            # Si dos archivos mapean al mismo par, gana el orden alfabético
+            if key in catalog and catalog[key]['filename'] < entry.name:
+                continue
+
+            stat = entry.stat()
+            metadata = None
+            if read_metadata:
+                try:
+                    metadata = read_giovanni_header(entry.path)
+                except (OSError, ValueError, UnicodeDecodeError):
+                    metadata = None
+
+            catalog[key] = {
+                'path': entry.path,
+                'filename': entry.name,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'metadata': metadata
+            }
+
+    return catalog
+
+
+def missing_pairs(catalog, city_keys, variables):
+    """Pares (city_key, variable) esperados que no están en el catálogo"""
+    return [
+        (city_key, var)
+        for city_key in city_keys
+        for var in variables
+        if (var, city_key) not in catalog
+    ]
@@ -8,6 +8,8 @@ import pandas as pd
 import numpy as np
 import os
 
+from data.giovanni_reader import read_giovanni_csv
+
 class CSVProcessor:
     """Procesa archivos CSV con series temporales de NASA"""
     
@@ -56,10 +58,11 @@ class CSVProcessor:
                 filepath = os.path.join(self.csv_folder, temp_file)
                 
                 if os.path.exists(filepath):
-                    df = pd.read_csv(filepath, skiprows=9)
-                    df.columns = ['time', 'temperature']
-                    df['time'] = pd.to_datetime(df['time'])
-                    df['temperature'] = pd.to_numeric(df['temperature'], errors='coerce')
+                    series = read_giovanni_csv(filepath)
+                    df = pd.DataFrame({
+                        'time': series['time'].astype('datetime64[ns]'),
+                        'temperature': series['values']
+                    })
                     self.data[city_key]['temperatura'] = df
                     print(f"📄 {city_key} - temperatura: ✅ {len(df)} registros")
             except Exception as e:
@@ -71,10 +74,11 @@ class CSVProcessor:
                 filepath = os.path.join(self.csv_folder, precip_file)
                 
                 if os.path.exists(filepath):
-                    df = pd.read_csv(filepath, skiprows=9)
-                    df.columns = ['time', 'precipitation']
-                    df['time'] = pd.to_datetime(df['time'])
-                    df['precipitation'] = pd.to_numeric(df['precipitation'], errors='coerce')
+                    series = read_giovanni_csv(filepath)
+                    df = pd.DataFrame({
+                        'time': series['time'].astype('datetime64[ns]'),
+                        'precipitation': series['values']
+                    })
                     self.data[city_key]['precipitacion'] = df
                     print(f"📄 {city_key} - precipitación: ✅ {len(df)} registros")
             except Exception as e:
@@ -8,15 +8,151 @@ Versión mejorada con soporte para 5 variables: temperatura, precipitación, vie
 import pandas as pd
 import numpy as np
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from functools import lru_cache
 
+from data.bbox_index import build_box_index, resolve_box_cities
+from data.climate_cube import ClimateCube
+from data.csv_cache import CSVCache
+from data.csv_catalog import build_catalog, missing_pairs, normalize_name
+from data.giovanni_reader import month_index, parse_giovanni_rows, read_giovanni_csv
+from data.shared_store import attach_cube, publish_cube, read_descriptor
+from data.spatial_index import SphereKDTree, haversine_km
+from data.station_interpolation import INTERPOLATION_METHODS, StationInterpolator, blend, interpolation_label
+
+def _cache_key(filepath):
+    """Entrada de la caché: por archivo, no por ciudad (ver resolve_box_cities)"""
+    return normalize_name(os.path.splitext(os.path.basename(filepath))[0])
+
+
+def _ingest_file(task):
+    """
+    Carga UN archivo (ciudad, variable) de forma independiente
+    
+    Es una función de módulo para poder usarse desde un pool de hilos o
+    de procesos. Devuelve arreglos ya convertidos; la construcción del
+    DataFrame y la unión en self.data se hacen en el proceso principal.
+    
+    Args:
+        task: (city_key, var, filepath, cache_folder) — filepath es None si
+              el catálogo no tiene archivo para ese par
+    
+    Returns:
+        (report, arrays) — arrays es None si el archivo falta o falló
+    """
+    city_key, var, filepath, cache_folder = task
+    started = time.perf_counter()
+    
+    report = {
+        'city': city_key,
+        'variable': var,
+        'file': filepath,
+        'status': 'ok',
+        'source': None,
+        'records': 0,
+        'years': None,
+        'size': None,
+        'mtime_ns': None,
+        'seconds': 0.0,
+        'error': None
+    }
+    arrays = None
+    
+    try:
+        if filepath is None:
+            report['status'] = 'missing'
+        else:
+            # Firma ANTES de leer: si el archivo crece mientras se lee, el
+            # siguiente refresh() lo detecta
+            stat = os.stat(filepath)
+            report['size'] = stat.st_size
+            report['mtime_ns'] = stat.st_mtime_ns
+            
+            cache = CSVCache(cache_folder) if cache_folder else None
+            cache_key = _cache_key(filepath)
+            arrays = cache.load(cache_key, filepath) if cache else None
+            report['source'] = 'cache' if arrays is not None else 'csv'
+            
+            if arrays is None:
+                arrays = CSVProcessorOptimized._parse_csv(filepath, var)
+                if cache:
+                    cache.save(cache_key, filepath, arrays, signature=(stat.st_size, stat.st_mtime_ns))
+            
+            report['records'] = len(arrays['values'])
+            if report['records'] > 0:
+                report['years'] = f"{arrays['year'].min()}-{arrays['year'].max()}"
+    
+    except Exception as e:
+        report['status'] = 'error'
+        report['error'] = str(e)
+        arrays = None
+    
+    report['seconds'] = time.perf_counter() - started
+    return report, arrays
+
+
 class CSVProcessorOptimized:
     """Procesador optimizado para NASA Space Apps Challenge"""
     
-    def __init__(self, csv_folder='data/csv'):
+    def __init__(self, csv_folder='data/csv', cache_folder='data/cache', use_cache=True,
+                 storage='dataframe', lazy=False, interpolation=None, interpolation_k=3):
+        """
+        Args:
+            csv_folder: carpeta con los CSV de GIOVANNI
+            cache_folder: carpeta de la caché binaria (.npz)
+            use_cache: usar la caché binaria en el arranque
+            storage: 'dataframe' (dict por ciudad/variable), 'cube'
+                     (un solo arreglo [ciudad, variable, año, mes]) o
+                     'compact' (float32 + índice de año int16, sin DataFrame)
+            lazy: cargar cada (ciudad, variable) hasta que se consulte
+            interpolation: None (ciudad más cercana), 'idw' o 'gaussian'
+                           (mezcla de las interpolation_k ciudades más cercanas)
+            interpolation_k: ciudades que se mezclan al interpolar
+        """
+        if storage not in ('dataframe', 'cube', 'compact'):
+            raise ValueError(f"Modo de almacenamiento inválido: {storage}")
+        if interpolation is not None and interpolation not in INTERPOLATION_METHODS:
+            raise ValueError(f"Método de interpolación inválido: {interpolation}")
+        
         self.csv_folder = csv_folder
         self.data = {}
         
+        # Almacenamiento denso (solo en modo 'cube')
+        self.storage = storage
+        self.cube = None
+        
+        # Caché binaria (.npz) de series ya convertidas
+        self.cache_folder = cache_folder if use_cache else None
+        self.cache = CSVCache(cache_folder) if use_cache else None
+        
+        # Reporte de la última carga: un dict por (ciudad, variable)
+        self.load_report = []
+        
+        # Series que no coinciden con las mallas (check_consistency)
+        self.consistency_issues = []
+        
+        # Modo perezoso: pares ya intentados (cargados o faltantes) y locks
+        # por par para que dos sesiones no parseen el mismo archivo
+        self.lazy = lazy
+        self._attempted = set()
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._store_lock = threading.Lock()
+        
+        # Ingesta incremental: posición leída de cada archivo y suscriptores
+        # a los que se avisa qué (ciudad, variable, mes) cambió
+        self._sources = {}
+        self._change_listeners = []
+        
+        # Cubo compartido al que está adjunto (attach_shared): carpeta y
+        # firmas de los CSV con los que se publicó
+        self._shared_folder = None
+        self._shared_sources = None
+        
+        self.variables = ['temperatura', 'precipitacion', 'viento', 'humedad', 'nubosidad']
+        
         self.city_coords = {
             'veracruz': {'lat': 19.20, 'lon': -96.15, 'name': 'Veracruz'},
             'cdmx': {'lat': 19.43, 'lon': -99.13, 'name': 'Ciudad de México'},
@@ -25,108 +161,795 @@ class CSVProcessorOptimized:
             'tijuana': {'lat': 32.52, 'lon': -117.04, 'name': 'Tijuana'}
         }
         
-        # Mapeo de nombres de archivos
-        self.file_mapping = {
-            'temperatura': 'temperatura',
-            'precipitacion': 'precipitacion',
-            'viento': 'viento',
-            'humedad': 'QV2M',
-            'nubosidad': 'MODIS'
+        # Índice espacial de las estaciones (distancias de gran círculo) y
+        # pesos de interpolación por punto
+        self.interpolation = interpolation
+        self.interpolation_k = interpolation_k
+        self.station_index = None
+        self.interpolator = None
+        self.rebuild_station_index()
+        
+        # Catálogo (variable, ciudad) → archivo + metadatos GIOVANNI
+        # (se arma con un solo recorrido de la carpeta) y R-tree de las
+        # cajas "Data Bounding Box" de cada serie, por variable
+        self.catalog = None
+        self.box_index = None
+        
+        # Unidades después de las conversiones
+        self.units = {
+            'temperatura': '°C',
+            'precipitacion': 'mm',
+            'viento': 'km/h',
+            'humedad': 'kg/kg',
+            'nubosidad': '%'
         }
+        
+        for city_key in self.city_coords.keys():
+            self.data[city_key] = {}
+    
+    def __getstate__(self):
+        """Para snapshots (pickle): locks y suscriptores no se serializan"""
+        state = self.__dict__.copy()
+        for name in ('_locks', '_locks_guard', '_store_lock', '_change_listeners'):
+            state.pop(name, None)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._store_lock = threading.Lock()
+        self._change_listeners = []
+    
+    def rebuild_catalog(self):
+        """
+        Vuelve a recorrer la carpeta de CSVs (un solo os.scandir)
+        
+        Cada ciudad recibe el archivo cuya caja GIOVANNI la cubre, no el de
+        su nombre (ver resolve_box_cities en data/bbox_index.py)
+        """
+        catalog = resolve_box_cities(build_catalog(self.csv_folder), self.city_coords)
+        self.box_index = build_box_index(catalog)
+        self.catalog = catalog
+        return self.catalog
+    
+    def _get_catalog(self):
+        if self.catalog is None:
+            with self._locks_guard:
+                if self.catalog is None:
+                    self.rebuild_catalog()
+        return self.catalog
     
-    def load_all_csvs(self):
-        """Carga CSVs y PRE-CALCULA agrupaciones por mes"""
+    def missing_pairs(self):
+        """Pares (ciudad, variable) esperados sin archivo en la carpeta"""
+        return missing_pairs(self._get_catalog(), self.city_coords.keys(), self.variables)
+    
+    def _task_for(self, city_key, var):
+        """Tarea de carga (city_key, var, filepath, cache_folder) de un par"""
+        entry = self._get_catalog().get((var, city_key))
+        filepath = entry['path'] if entry else None
+        return (city_key, var, filepath, self.cache_folder)
+    
+    def load_all_csvs(self, workers=1, use_processes=False, verify=True):
+        """
+        Carga CSVs y PRE-CALCULA agrupaciones por mes
+        
+        Args:
+            workers: número de archivos que se procesan en paralelo (1 = secuencial)
+            use_processes: usar procesos en lugar de hilos (parseo sin GIL)
+            verify: comparar los CSV con las mallas al terminar
+                    (check_consistency; en caché por hash de datos)
+        
+        Los tiempos y errores de cada archivo quedan en self.load_report
+        """
         print("\n🚀 CARGANDO CSVs (MODO OPTIMIZADO)...")
         print("=" * 70)
         
-        variables = ['temperatura', 'precipitacion', 'viento', 'humedad', 'nubosidad']
+        started = time.perf_counter()
+        self.rebuild_catalog()
+        
+        # Tareas en orden fijo: ciudad × variable
+        tasks = [
+            self._task_for(city_key, var)
+            for city_key in self.city_coords.keys()
+            for var in self.variables
+        ]
+        
+        if workers and workers > 1:
+            pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+            with pool_class(max_workers=workers) as pool:
+                results = list(pool.map(_ingest_file, tasks))
+        else:
+            results = [_ingest_file(task) for task in tasks]
+        
+        # Unir resultados en el mismo orden de las tareas; con _store_lock
+        # porque una carga perezosa o un refresh() pueden estar escribiendo
+        # en el cubo al mismo tiempo
+        with self._store_lock:
+            self.load_report = []
+            for city_key in self.city_coords.keys():
+                self.data[city_key] = {}
+            
+            series = {}
+            self._sources = {}
+            for report, arrays in results:
+                if arrays is not None:
+                    series[(report['city'], report['variable'])] = arrays
+                    self._register_source(report, arrays)
+                self.load_report.append(report)
+            
+            self._store_series(series)
+            self._attempted = {(report['city'], report['variable']) for report in self.load_report}
+        
+        self._print_load_report(time.perf_counter() - started)
+        
+        if verify:
+            self.check_consistency()
+        
+        return len(self.data) > 0
+    
+    def check_consistency(self, raw_folder='data/raw', report_path=None):
+        """
+        Compara cada CSV con la malla de su variable (data/consistency_check.py)
+        
+        El reporte se guarda por hash de datos: en un arranque sin cambios
+        solo se comparan firmas. Los problemas de cada archivo se anotan en
+        su renglón de load_report ('consistency') y en
+        self.consistency_issues. Sin mallas (o sin netCDF4) no hay hallazgos.
+        
+        Returns:
+            lista de hallazgos con problemas
+        """
+        from data.consistency_check import check_consistency
+        
+        try:
+            report = check_consistency(self.csv_folder, raw_folder, self.cache_folder, report_path)
+        except Exception as e:
+            print(f"⚠️ Sin verificación CSV ↔ malla: {e}")
+            return self.consistency_issues
+        
+        by_file = {}
+        for finding in report['findings']:
+            if finding['issues']:
+                by_file[finding['file']] = finding
+        
+        # Por par del catálogo (también los que el modo perezoso no ha cargado)
+        issues = []
+        per_pair = {}
+        for (var, city_key), entry in sorted(self._get_catalog().items()):
+            finding = by_file.get(entry['filename'])
+            if finding is None:
+                continue
+            # La caja "de otra ciudad" ya no aplica si el catálogo asignó el
+            # archivo a la ciudad que su caja cubre (resolve_box_cities)
+            pair_issues = [
+                issue for issue in finding['issues']
+                if not (issue == 'caja' and finding['bbox_city'] == city_key)
+            ]
+            if pair_issues:
+                per_pair[(city_key, var)] = pair_issues
+                issues.append(dict(finding, city=city_key, issues=pair_issues))
         
+        for entry in self.load_report:
+            entry['consistency'] = per_pair.get((entry['city'], entry['variable']), [])
+        
+        self.consistency_issues = issues
+        if issues:
+            listed = ', '.join(f"{f['city']}/{f['variable']} ({'+'.join(f['issues'])})" for f in issues)
+            print(f"⚠️ {len(issues)} series no coinciden con la malla: {listed}")
+        return issues
+    
+    def preload(self, workers=1, use_processes=False):
+        """Calentamiento explícito: carga todo aunque el procesador sea perezoso"""
+        return self.load_all_csvs(workers=workers, use_processes=use_processes)
+    
+    def available_pairs(self):
+        """
+        Pares (ciudad, variable) con datos: ya cargados o, en modo perezoso,
+        con archivo en disco pendiente de cargar
+        """
+        pairs = []
         for city_key in self.city_coords.keys():
-            self.data[city_key] = {}
+            for var in self.variables:
+                if var in self.data.get(city_key, {}):
+                    pairs.append((city_key, var))
+                elif self.lazy and (city_key, var) not in self._attempted:
+                    if (var, city_key) in self._get_catalog():
+                        pairs.append((city_key, var))
+        return pairs
+    
+    def publish_shared(self, folder='data/cache/shared'):
+        """
+        Publica el cubo cargado para que otros procesos se adjunten sin copiarlo
+        
+        Requiere storage='cube'. Carga todo primero si el procesador es perezoso.
+        Después de publicar, esta réplica también se adjunta al archivo
+        mapeado y suelta su copia privada del cubo.
+        
+        Returns:
+            dict descriptor (None si otra réplica tenía el candado y no
+            publicó a tiempo; el procesador sigue con su copia)
+        """
+        if self.storage != 'cube':
+            raise ValueError("publish_shared requiere storage='cube'")
+        
+        if self.lazy and len(self._attempted) < len(self.city_coords) * len(self.variables):
+            self.preload()
+        
+        if self.cube is None:
+            raise ValueError("No hay datos cargados para publicar")
+        
+        source_files = [
+            report['file'] for report in self.load_report if report['status'] == 'ok'
+        ]
+        records = {
+            f"{city_key}/{var}": entry['records']
+            for city_key, variables in self.data.items()
+            for var, entry in variables.items()
+        }
+        descriptor = publish_cube(self.cube, source_files, records, folder=folder)
+        if descriptor is not None:
+            self.attach_shared(folder)
+        return descriptor
+    
+    def attach_shared(self, folder='data/cache/shared'):
+        """
+        Se adjunta al cubo publicado por otra réplica (mapeo en memoria, sin copia)
+        
+        Returns:
+            True si se adjuntó; False si no hay publicación vigente
+        """
+        cube, descriptor = attach_cube(folder=folder)
+        if cube is None:
+            return False
+        
+        data = {city_key: {} for city_key in self.city_coords.keys()}
+        for key, count in descriptor['records'].items():
+            city_key, var = key.split('/')
+            data.setdefault(city_key, {})[var] = {'records': count}
+        
+        with self._store_lock:
+            self.storage = 'cube'
+            self.cube = cube
+            self.lazy = False
+            self.data = data
+            self._attempted = {
+                (city_key, var) for city_key in self.city_coords.keys() for var in self.variables
+            }
+            self._shared_folder = folder
+            self._shared_sources = descriptor['sources']
+        return True
+    
+    def _ensure_loaded(self, city_key, var):
+        """
+        Modo perezoso: carga (ciudad, variable) la primera vez que se consulta
+        
+        Cada par tiene su propio lock: las sesiones que piden el mismo archivo
+        esperan a la primera en lugar de parsearlo otra vez, y pares distintos
+        se cargan en paralelo.
+        """
+        if not self.lazy or (city_key, var) in self._attempted:
+            return
+        
+        if city_key not in self.city_coords or var not in self.variables:
+            return
+        
+        with self._locks_guard:
+            lock = self._locks.setdefault((city_key, var), threading.Lock())
+        
+        with lock:
+            if (city_key, var) in self._attempted:
+                return
             
-            for var in variables:
+            report, arrays = _ingest_file(self._task_for(city_key, var))
+            
+            with self._store_lock:
+                if arrays is not None:
+                    try:
+                        self._store_one(city_key, var, arrays)
+                        self._register_source(report, arrays)
+                    except Exception as e:
+                        report['status'] = 'error'
+                        report['error'] = str(e)
+                self.load_report.append(report)
+                self._attempted.add((city_key, var))
+    
+    def _register_source(self, report, arrays):
+        """Recuerda hasta qué byte y qué fecha se leyó un archivo"""
+        times = arrays['time']
+        self._sources[(report['city'], report['variable'])] = {
+            'file': report['file'],
+            'size': report['size'],
+            'mtime_ns': report['mtime_ns'],
+            'offset': int(arrays['end_offset']),
+            'fill_value': float(arrays['fill_value']),
+            'last_time': times[-1] if len(times) > 0 else None
+        }
+    
+    def add_change_listener(self, callback):
+        """
+        Suscribe una función que recibe el set de (ciudad, variable, mes)
+        modificados por refresh(), para invalidar cachés de forma selectiva
+        """
+        self._change_listeners.append(callback)
+    
+    def refresh(self):
+        """
+        Ingesta incremental: detecta CSVs que ganaron renglones y agrega
+        SOLO la cola nueva a los arreglos en memoria
+        
+        - Si el archivo creció, se lee desde el último byte procesado y se
+          descartan renglones con fecha <= a la última ya cargada
+        - Un renglón todavía sin salto de línea no se consume: se vuelve a
+          leer cuando el archivo crezca otra vez
+        - Si el archivo se achicó (fue reescrito), se recarga completo
+        - Un archivo que falla se reporta y se reintenta en la siguiente
+          llamada; no detiene a los demás
+        - Adjunto a un cubo compartido (attach_shared) el cubo es de solo
+          lectura: ver _refresh_shared
+        
+        Returns:
+            set de (city_key, variable, month) que cambiaron
+        """
+        if self._shared_folder is not None:
+            changed = self._refresh_shared()
+        else:
+            changed = self._refresh_sources()
+        
+        if changed:
+            for callback in self._change_listeners:
+                callback(changed)
+        
+        return changed
+    
+    def _refresh_sources(self):
+        """Agrega la cola nueva de cada archivo a la copia privada"""
+        changed = set()
+        
+        with self._store_lock:
+            for (city_key, var), source in list(self._sources.items()):
                 try:
-                    # Obtener nombre de archivo correcto
-                    file_prefix = self.file_mapping[var]
-                    filepath = os.path.join(self.csv_folder, f"{file_prefix}_{city_key}.csv")
-                    
-                    if not os.path.exists(filepath):
-                        continue
-                    
-                    # Leer CSV
-                    df = pd.read_csv(filepath, skiprows=9)
-                    df.columns = ['time', var]
-                    
-                    # Convertir tipos
-                    df['time'] = pd.to_datetime(df['time'])
-                    df[var] = pd.to_numeric(df[var], errors='coerce')
-                    
-                    # CONVERSIONES DE UNIDADES
-                    if var == 'viento':
-                        df[var] = df[var] * 3.6  # m/s → km/h
-                    
-                    elif var == 'nubosidad':
-                        df[var] = df[var] * 100  # fracción → porcentaje
-                    
-                    # humedad se queda en kg/kg (se convierte en humidity_analyzer)
-                    
-                    # Agregar columnas útiles
-                    df['month'] = df['time'].dt.month
-                    df['year'] = df['time'].dt.year
-                    
-                    # Eliminar NaN
-                    df = df.dropna(subset=[var])
-                    
-                    # PRE-AGRUPAR POR MES
-                    df_by_month = {}
-                    for month in range(1, 13):
-                        df_month = df[df['month'] == month]
-                        df_by_month[month] = df_month[var].values
-                    
-                    # Guardar
-                    self.data[city_key][var] = {
-                        'df': df,
-                        'by_month': df_by_month
-                    }
-                    
-                    years_range = f"{df['year'].min()}-{df['year'].max()}"
-                    
-                    # Mostrar unidad
-                    units = {
-                        'temperatura': '°C',
-                        'precipitacion': 'mm',
-                        'viento': 'km/h',
-                        'humedad': 'kg/kg',
-                        'nubosidad': '%'
-                    }
-                    
-                    print(f"✅ {city_key}/{var}: {len(df)} registros ({years_range}) [{units[var]}]")
-                
+                    changed.update(self._refresh_source(city_key, var, source))
                 except Exception as e:
-                    print(f"❌ {city_key}/{var}: {e}")
+                    print(f"⚠️ No se pudo actualizar {source['file']}: {e}")
+        
+        return changed
+    
+    def _refresh_shared(self):
+        """
+        refresh() de una réplica adjunta al cubo compartido
+        
+        - Si la publicación vigente es la misma a la que está adjunta, no
+          hay cambios
+        - Si otra réplica ya publicó los CSV nuevos, se vuelve a adjuntar
+        - Si los CSV cambiaron y nadie ha publicado (read_descriptor ya no
+          es vigente), recarga todo (la caché .npz evita reparsear lo que no
+          cambió) y publica; publish_cube deja escribir a una sola réplica
+          y las demás se adjuntan a lo que esa publicó
+        
+        Como no se sabe qué cambió entre publicaciones, se reportan todos
+        los meses de todas las series.
+        """
+        folder = self._shared_folder
+        descriptor = read_descriptor(folder)
+        
+        if descriptor is not None and descriptor['sources'] == self._shared_sources:
+            return set()
+        
+        if descriptor is None or not self.attach_shared(folder):
+            print(f"🔄 CSVs cambiaron desde la publicación en {folder}: recargando")
+            self.load_all_csvs(verify=False)
+            if self.publish_shared(folder) is None:
+                # Sin publicación a tiempo: sigue con su copia privada y
+                # vuelve a intentar en el siguiente refresh()
+                print("⚠️ No se pudo publicar el cubo compartido; se usa la copia privada")
+        
+        return {
+            (city_key, var, month)
+            for city_key, variables in self.data.items()
+            for var in variables
+            for month in range(1, 13)
+        }
+    
+    def _refresh_source(self, city_key, var, source):
+        """
+        Actualiza una sola serie si su archivo cambió
+        
+        Returns:
+            set de (city_key, variable, month) que cambiaron
+        """
+        try:
+            stat = os.stat(source['file'])
+        except OSError:
+            return set()
+        
+        if stat.st_size == source['size'] and stat.st_mtime_ns == source['mtime_ns']:
+            return set()
+        
+        if stat.st_size < source['offset']:
+            arrays = self._parse_csv(source['file'], var)
+            self._replace_series(city_key, var, arrays)
+            end_offset = int(arrays['end_offset'])
+            new_months = arrays['month']
+            last_time = arrays['time'][-1] if len(arrays['time']) > 0 else None
+        else:
+            tail, end_offset = self._read_tail(source, var)
+            self._append_series(city_key, var, tail)
+            new_months = tail['month']
+            last_time = tail['time'][-1] if len(tail['time']) > 0 else source['last_time']
+        
+        source.update({
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'offset': end_offset,
+            'last_time': last_time
+        })
+        
+        if len(new_months) == 0:
+            return set()
+        
+        self._update_cache(city_key, var, source)
+        return {(city_key, var, int(m)) for m in np.unique(new_months)}
+    
+    def _read_tail(self, source, var):
+        """
+        Lee y convierte solo los renglones agregados después de source['offset']
+        
+        Solo se procesan renglones terminados en salto de línea; lo que quede
+        después (un renglón a medio escribir, aunque ya se pueda parsear como
+        '2025-01-01 00:00:00,') se deja para la siguiente lectura.
+        
+        Returns:
+            (arrays, end_offset)
+        """
+        with open(source['file'], 'rb') as f:
+            f.seek(source['offset'])
+            raw = f.read()
+        
+        fill_value = None if np.isnan(source['fill_value']) else source['fill_value']
+        
+        complete = raw[:raw.rfind(b'\n') + 1]
+        times, values = parse_giovanni_rows(complete.decode('utf-8'), fill_value)
+        end_offset = source['offset'] + len(complete)
+        
+        times = times.astype('datetime64[s]')
+        values = self._convert_units(var, values)
+        
+        keep = ~np.isnan(values)
+        if source['last_time'] is not None:
+            keep &= times > source['last_time']
+        
+        times = times[keep]
+        years, months = month_index(times)
+        
+        arrays = {
+            'time': times,
+            'values': values[keep],
+            'year': years,
+            'month': months
+        }
+        return arrays, end_offset
+    
+    def _append_series(self, city_key, var, arrays):
+        """Agrega renglones nuevos a la serie ya cargada"""
+        if len(arrays['values']) == 0:
+            return
+        
+        if self.storage == 'cube':
+            self.cube.ensure_years(int(arrays['year'].min()), int(arrays['year'].max()))
+            self.cube.set_series(city_key, var, arrays['year'], arrays['month'], arrays['values'])
+            self.data[city_key][var]['records'] += len(arrays['values'])
+            return
+        
+        if self.storage == 'compact':
+            # Reordenar por mes: se reconstruye la serie completa
+            merged = self._series_arrays(city_key, var)
+            for name in ('time', 'values', 'year', 'month'):
+                merged[name] = np.concatenate([merged[name], arrays[name].astype(merged[name].dtype)])
+            self.data[city_key][var] = self._build_compact_entry(merged)
+            return
+        
+        entry = self.data[city_key][var]
+        new_entry = self._build_entry(var, arrays)
+        entry['df'] = pd.concat([entry['df'], new_entry['df']], ignore_index=True)
+        
+        for month in np.unique(arrays['month']):
+            month = int(month)
+            entry['by_month'][month] = np.concatenate(
+                [entry['by_month'][month], new_entry['by_month'][month]]
+            )
+    
+    def _replace_series(self, city_key, var, arrays):
+        """Sustituye por completo la serie de un archivo reescrito"""
+        if self.storage == 'cube':
+            self.cube.clear_series(city_key, var)
+        self._store_one(city_key, var, arrays)
+    
+    def _update_cache(self, city_key, var, source):
+        """Reescribe la entrada de la caché binaria con la serie ya extendida"""
+        if not self.cache:
+            return
+        
+        arrays = self._series_arrays(city_key, var)
+        arrays['values'] = arrays['values'].astype(np.float64)
+        arrays['end_offset'] = np.int64(source['offset'])
+        arrays['fill_value'] = np.float64(source['fill_value'])
+        
+        try:
+            self.cache.save(_cache_key(source['file']), source['file'], arrays,
+                            signature=(source['size'], source['mtime_ns']))
+        except OSError:
+            pass
+    
+    def _print_load_report(self, elapsed):
+        """Imprime el resumen de carga (un renglón por archivo, en orden fijo)"""
+        for report in self.load_report:
+            city_key, var = report['city'], report['variable']
+            
+            if report['status'] == 'ok':
+                origin = " (caché)" if report['source'] == 'cache' else ""
+                entry = (self.catalog or {}).get((var, city_key), {})
+                if 'file_city' in entry:
+                    origin += f" ← {entry['filename']} (por su caja)"
+                print(f"✅ {city_key}/{var}: {report['records']} registros ({report['years']}) "
+                      f"[{self.units[var]}] {report['seconds'] * 1000:.1f} ms{origin}")
+            elif report['status'] == 'error':
+                print(f"❌ {city_key}/{var}: {report['error']}")
+        
+        missing = [
+            f"{report['city']}/{report['variable']}"
+            for report in self.load_report if report['status'] == 'missing'
+        ]
+        if missing:
+            print(f"⚠️ Sin archivo: {', '.join(missing)}")
         
         print("=" * 70)
         total = sum(len(v) for v in self.data.values())
-        print(f"✅ Cargadas {total} variables\n")
+        print(f"✅ Cargadas {total} variables en {elapsed:.2f} s\n")
+    
+    @staticmethod
+    def _parse_csv(filepath, var):
+        """
+        Lee un CSV de GIOVANNI y aplica las conversiones de unidades
         
-        return len(self.data) > 0
+        Returns:
+            dict con 'time' (datetime64[s]), 'values', 'year', 'month',
+            'end_offset' y 'fill_value'
+        """
+        # Leer CSV (encabezado interpretado, sin skiprows fijo)
+        series = read_giovanni_csv(filepath)
+        times = series['time']
+        values = CSVProcessorOptimized._convert_units(var, series['values'])
+        
+        # Eliminar NaN
+        valid = ~np.isnan(values)
+        times = times[valid]
+        values = values[valid]
+        years, months = month_index(times)
+        
+        return {
+            'time': times.astype('datetime64[s]'),
+            'values': values,
+            'year': years,
+            'month': months,
+            # Para la ingesta incremental (refresh)
+            'end_offset': np.int64(series['end_offset']),
+            'fill_value': np.float64(np.nan if series['fill_value'] is None else series['fill_value'])
+        }
+    
+    @staticmethod
+    def _convert_units(var, values):
+        """CONVERSIONES DE UNIDADES"""
+        if var == 'viento':
+            return values * 3.6  # m/s → km/h
+        
+        elif var == 'nubosidad':
+            return values * 100  # fracción → porcentaje
+        
+        # humedad se queda en kg/kg (se convierte en humidity_analyzer)
+        return values
+    
+    def _series_arrays(self, city_key, var):
+        """
+        Reconstruye la serie cronológica de una ciudad/variable desde
+        cualquier modo de almacenamiento
+        
+        Returns:
+            dict con 'time' (datetime64[s]), 'values', 'year' y 'month'
+        """
+        if self.storage == 'cube':
+            arrays = self.cube.series_arrays(city_key, var)
+        elif self.storage == 'compact':
+            entry = self.data[city_key][var]
+            months = np.repeat(np.arange(1, 13, dtype=np.int8), np.diff(entry['offsets']))
+            order = np.lexsort((months, entry['year']))
+            arrays = {
+                'year': entry['year'][order],
+                'month': months[order],
+                'values': entry['values'][order]
+            }
+        else:
+            df = self.data[city_key][var]['df']
+            return {
+                'time': df['time'].values.astype('datetime64[s]'),
+                'values': df[var].values.astype(np.float64),
+                'year': df['year'].values.astype(np.int16),
+                'month': df['month'].values.astype(np.int8)
+            }
+        
+        months_since_epoch = (arrays['year'].astype(np.int64) - 1970) * 12 + arrays['month'] - 1
+        arrays['time'] = months_since_epoch.astype('datetime64[M]').astype('datetime64[s]')
+        return arrays
+    
+    def _store_series(self, series):
+        """
+        Guarda las series cargadas según el modo de almacenamiento
+        
+        - 'dataframe': self.data[ciudad][var] = {'df', 'by_month'}
+        - 'cube': un solo ClimateCube; self.data solo registra qué hay cargado
+        - 'compact': self.data[ciudad][var] = {'values', 'year', 'offsets', 'records'}
+        """
+        if self.storage == 'cube':
+            self.cube = ClimateCube.from_series(series, self.city_coords.keys(), self.variables)
+            for (city_key, var), arrays in series.items():
+                self.data[city_key][var] = {'records': len(arrays['values'])}
+            return
+        
+        self.cube = None
+        for report in self.load_report:
+            key = (report['city'], report['variable'])
+            if key not in series:
+                continue
+            try:
+                self._store_one(key[0], key[1], series[key])
+            except Exception as e:
+                report['status'] = 'error'
+                report['error'] = str(e)
+    
+    def _store_one(self, city_key, var, arrays):
+        """
+        Agrega UNA serie al almacenamiento (usado por el modo perezoso)
+        
+        Llamar con self._store_lock: en modo cubo puede ampliar el eje de
+        años (ensure_years), y dos cargas de pares distintos no deben
+        ampliarlo a la vez.
+        """
+        if self.storage == 'cube':
+            if self.cube is None:
+                self.cube = ClimateCube.from_series(
+                    {(city_key, var): arrays}, self.city_coords.keys(), self.variables
+                )
+            else:
+                if len(arrays['year']) > 0:
+                    self.cube.ensure_years(int(arrays['year'].min()), int(arrays['year'].max()))
+                self.cube.set_series(city_key, var, arrays['year'], arrays['month'], arrays['values'])
+            self.data[city_key][var] = {'records': len(arrays['values'])}
+        elif self.storage == 'compact':
+            self.data[city_key][var] = self._build_compact_entry(arrays)
+        else:
+            self.data[city_key][var] = self._build_entry(var, arrays)
+    
+    @staticmethod
+    def _build_compact_entry(arrays):
+        """
+        Modo compacto: UN solo arreglo float32 ordenado por (mes, año)
+        
+        - 'values': float32, los meses quedan contiguos
+        - 'year': int16, año de cada valor
+        - 'offsets': int32[13], values[offsets[m-1]:offsets[m]] es el mes m
+        
+        Los valores por mes son vistas (sin copia) en lugar de un segundo
+        juego de arreglos como by_month.
+        """
+        order = np.lexsort((arrays['year'], arrays['month']))
+        months = np.asarray(arrays['month'])[order]
+        offsets = np.searchsorted(months, np.arange(1, 14), side='left').astype(np.int32)
+        
+        return {
+            'values': np.asarray(arrays['values'], dtype=np.float32)[order],
+            'year': np.asarray(arrays['year'], dtype=np.int16)[order],
+            'offsets': offsets,
+            'records': len(order)
+        }
+    
+    def _build_entry(self, var, arrays):
+        """Arma {'df', 'by_month'} a partir de arreglos ya convertidos (sin parsear texto)"""
+        df = pd.DataFrame({
+            'time': arrays['time'].astype('datetime64[ns]'),
+            var: arrays['values'],
+            'month': arrays['month'].astype(np.int32),
+            'year': arrays['year'].astype(np.int32)
+        })
+        
+        # PRE-AGRUPAR POR MES
+        months = arrays['month']
+        df_by_month = {}
+        for month in range(1, 13):
+            df_by_month[month] = arrays['values'][months == month]
+        
+        return {
+            'df': df,
+            'by_month': df_by_month
+        }
+    
+    def rebuild_station_index(self):
+        """Reconstruye el índice espacial (llamar si cambia city_coords)"""
+        self.station_index = SphereKDTree.from_places(self.city_coords)
+        self.interpolator = StationInterpolator(
+            self.station_index, k=self.interpolation_k, method=self.interpolation or 'idw'
+        )
+        return self.station_index
     
     def find_nearest_city(self, lat, lon):
-        """Encuentra ciudad más cercana"""
-        min_dist = float('inf')
-        nearest = None
+        """
+        Encuentra ciudad más cercana
+        
+        Returns:
+            (city_key, distancia en km de gran círculo)
+        """
+        return self.station_index.nearest(lat, lon)
+    
+    def find_covering_series(self, lat, lon, variable):
+        """
+        Serie cuya caja GIOVANNI cubre el punto (o la caja más cercana)
         
-        for city_key, coords in self.city_coords.items():
-            dist = (lat - coords['lat'])**2 + (lon - coords['lon'])**2
-            if dist < min_dist:
-                min_dist = dist
-                nearest = city_key
+        Si varias cajas cubren el punto gana la de la ciudad más cercana.
+        
+        Returns:
+            (city_key, km al borde de la caja, True si la cubre) o
+            (None, inf, False) si no hay cajas de esa variable
+        """
+        self._get_catalog()
+        tree = self.box_index.get(variable)
+        if tree is None:
+            return None, float('inf'), False
+        
+        covering = tree.query_point(lat, lon)
+        if covering:
+            distances = {
+                key: float(haversine_km(lat, lon, self.city_coords[key]['lat'], self.city_coords[key]['lon']))
+                if key in self.city_coords else float('inf')
+                for key in covering
+            }
+            return min(covering, key=lambda key: (distances[key], key)), 0.0, True
+        return tree.locate(lat, lon)
+    
+    def find_nearest_many(self, lats, lons, k=1):
+        """
+        Ciudades más cercanas a MUCHAS coordenadas en una llamada vectorizada
         
-        return nearest, min_dist
+        Returns:
+            (índices en self.station_index.keys, distancias en km) con la
+            forma de lats (k == 1) o [..., k]
+        """
+        return self.station_index.query_many(lats, lons, k=k)
     
-    def get_historical_data(self, lat, lon, variable, month, day):
-        """Obtiene datos históricos para un mes"""
+    def find_nearest_cities(self, lat, lon, k=3):
+        """Las k ciudades más cercanas: (lista de city_key, ndarray de km)"""
+        return self.station_index.query(lat, lon, k=k)
+    
+    def find_cities_within(self, lat, lon, radius_km):
+        """Ciudades a radius_km o menos: (lista de city_key, ndarray de km)"""
+        return self.station_index.query_radius(lat, lon, radius_km)
+    
+    def get_historical_data(self, lat, lon, variable, month, day, interpolation=None):
+        """
+        Obtiene datos históricos para un mes
+        
+        Args:
+            interpolation: None usa self.interpolation; 'nearest' fuerza la
+                           ciudad más cercana; 'idw'/'gaussian' mezcla ciudades
+        
+        Returns:
+            (valores por año, nombre de la ciudad o etiqueta de la mezcla)
+        """
+        mode = self._interpolation_mode(interpolation)
+        if mode:
+            aligned, label = self.get_interpolated_data(lat, lon, [variable], month, mode)
+            return (None if aligned is None else aligned[0]), label
+        
         city_key, _ = self.find_nearest_city(lat, lon)
+        self._ensure_loaded(city_key, variable)
         
         if city_key not in self.data:
             return None, None
@@ -134,11 +957,239 @@ class CSVProcessorOptimized:
         if variable not in self.data[city_key]:
             return None, self.city_coords[city_key]['name']
         
-        values = self.data[city_key][variable]['by_month'].get(month)
+        values = self.get_month_values(city_key, variable, month)
         city_name = self.city_coords[city_key]['name']
         
         return values, city_name
     
+    def get_month_values(self, city_key, variable, month):
+        """Valores históricos de una ciudad/variable en un mes (sin NaN)"""
+        self._ensure_loaded(city_key, variable)
+        
+        if variable not in self.data.get(city_key, {}):
+            return None
+        
+        if self.cube is not None:
+            return self.cube.month_values(city_key, variable, month)
+        
+        entry = self.data[city_key][variable]
+        
+        if self.storage == 'compact':
+            return entry['values'][entry['offsets'][month - 1]:entry['offsets'][month]]
+        
+        return entry['by_month'].get(month)
+    
+    def get_aligned_data(self, lat, lon, variables, month, interpolation=None):
+        """
+        Valores de varias variables en los MISMOS años para un mes
+        
+        Returns:
+            (ndarray [variable, año], city_name) o (None, city_name)
+        """
+        mode = self._interpolation_mode(interpolation)
+        if mode:
+            return self.get_interpolated_data(lat, lon, variables, month, mode)
+        
+        city_key, _ = self.find_nearest_city(lat, lon)
+        city_name = self.city_coords[city_key]['name']
+        
+        for var in variables:
+            self._ensure_loaded(city_key, var)
+        
+        if any(var not in self.data.get(city_key, {}) for var in variables):
+            return None, city_name
+        
+        if self.cube is not None:
+            return self.cube.aligned_month_values(city_key, variables, month), city_name
+        
+        if self.storage == 'compact':
+            # Años comunes a todas las variables
+            blocks = []
+            for var in variables:
+                entry = self.data[city_key][var]
+                start, end = entry['offsets'][month - 1], entry['offsets'][month]
+                blocks.append((entry['year'][start:end], entry['values'][start:end]))
+            
+            common = blocks[0][0]
+            for years, _ in blocks[1:]:
+                common = np.intersect1d(common, years)
+            
+            aligned = np.array([
+                values[np.isin(years, common)] for years, values in blocks
+            ], dtype=np.float64)
+            return aligned, city_name
+        
+        # Modo dataframe: alinear por año con los DataFrames
+        merged = None
+        for var in variables:
+            df = self.data[city_key][var]['df']
+            df_month = df.loc[df['month'] == month, ['year', var]]
+            merged = df_month if merged is None else merged.merge(df_month, on='year')
+        
+        return merged[variables].values.T, city_name
+    
+    def _interpolation_mode(self, interpolation):
+        """Método efectivo: None/'nearest' → sin mezcla"""
+        mode = self.interpolation if interpolation is None else interpolation
+        return None if mode in (None, 'nearest') else mode
+    
+    def _station_block(self, city_keys, var):
+        """
+        Series de varias ciudades alineadas por año
+        
+        Returns:
+            (ndarray [ciudad, año, mes] con NaN sin dato, primer año)
+        """
+        cube = self.cube
+        if cube is not None:
+            # Arreglo y año inicial del mismo instante: otra sesión puede
+            # ampliar el eje de años mientras tanto
+            values, first_year = cube.layout()
+            ci = [cube.city_index[key] for key in city_keys]
+            return values[ci, cube.var_index[var]], (first_year if first_year is not None else 0)
+        
+        series = [
+            self._series_arrays(key, var) if var in self.data.get(key, {}) else None
+            for key in city_keys
+        ]
+        years = [s['year'] for s in series if s is not None and len(s['year'])]
+        if not years:
+            return np.full((len(city_keys), 0, 12), np.nan), 0
+        
+        first_year = min(int(y.min()) for y in years)
+        last_year = max(int(y.max()) for y in years)
+        block = np.full((len(city_keys), last_year - first_year + 1, 12), np.nan)
+        for row, s in enumerate(series):
+            if s is not None:
+                block[row, s['year'].astype(np.int64) - first_year, s['month'].astype(np.int64) - 1] = s['values']
+        return block, first_year
+    
+    def _interpolation_stations(self, lat, lon, variables, interpolation):
+        """
+        Ciudades y pesos del interpolador para un punto
+        
+        Returns:
+            (claves, pesos, posiciones de las ciudades que tienen TODAS las
+            variables pedidas)
+        """
+        interpolator = self.interpolator
+        if interpolator.method != interpolation:
+            interpolator = StationInterpolator(self.station_index, k=self.interpolation_k, method=interpolation)
+            self.interpolator = interpolator
+        
+        keys, weights, _ = interpolator.weights(lat, lon)
+        
+        for var in variables:
+            for city_key in keys:
+                self._ensure_loaded(city_key, var)
+        
+        available = [
+            i for i, city_key in enumerate(keys)
+            if all(var in self.data.get(city_key, {}) for var in variables)
+        ]
+        return keys, weights, available
+    
+    def station_weights(self, lat, lon, variables, interpolation=None):
+        """
+        Ciudades y pesos con que se arman los valores de un punto
+        
+        Mismas reglas que get_historical_data / get_aligned_data: la ciudad
+        más cercana con peso 1 o, con interpolación, las ciudades que tienen
+        TODAS las variables con los pesos renormalizados. Los analizadores
+        lo usan para que lo que depende de la ciudad (ej: días lluviosos
+        por mes) salga de la misma mezcla que los valores.
+        
+        Returns:
+            (lista de city_key, ndarray de pesos); vacías si no hay datos
+        """
+        mode = self._interpolation_mode(interpolation)
+        if not mode:
+            city_key, _ = self.find_nearest_city(lat, lon)
+            return [city_key], np.ones(1)
+        
+        keys, weights, available = self._interpolation_stations(lat, lon, variables, mode)
+        if not available:
+            return [], np.zeros(0)
+        return [keys[i] for i in available], weights[available] / weights[available].sum()
+    
+    def get_interpolated_data(self, lat, lon, variables, month, interpolation='idw'):
+        """
+        Mezcla de las ciudades más cercanas, variable por variable
+        
+        Los pesos del punto salen de la caché del interpolador; la mezcla se
+        hace sobre [ciudad, año, mes] completo y después se toma el mes.
+        
+        Returns:
+            (ndarray [variable, año] solo con años en que todas las
+            variables tienen dato, etiqueta) o (None, etiqueta)
+        """
+        keys, weights, available = self._interpolation_stations(lat, lon, variables, interpolation)
+        if not available:
+            return None, interpolation_label([self.city_coords[k]['name'] for k in keys], weights)
+        
+        keys = [keys[i] for i in available]
+        weights = weights[available] / weights[available].sum()
+        label = interpolation_label([self.city_coords[k]['name'] for k in keys], weights)
+        
+        rows = []
+        first_years = []
+        for var in variables:
+            block, first_year = self._station_block(keys, var)
+            rows.append(blend(weights, block)[:, month - 1])
+            first_years.append(first_year)
+        
+        # Alinear años entre variables (en modo cubo ya comparten el eje)
+        start = min(first_years)
+        end = max(first + len(row) for first, row in zip(first_years, rows))
+        aligned = np.full((len(variables), end - start), np.nan)
+        for v, (first, row) in enumerate(zip(first_years, rows)):
+            aligned[v, first - start:first - start + len(row)] = row
+        
+        complete = ~np.isnan(aligned).any(axis=0)
+        if not complete.any():
+            return None, label
+        return aligned[:, complete], label
+    
+    def memory_report(self, verbose=True):
+        """
+        Bytes ocupados por ciudad y variable en el modo actual
+        
+        Returns:
+            dict {'by_series': {ciudad: {var: bytes}}, 'total': bytes}
+        """
+        by_series = {}
+        total = 0
+        
+        for city_key, variables in self.data.items():
+            by_series[city_key] = {}
+            for var, entry in variables.items():
+                if self.cube is not None:
+                    ci, vi = self.cube.city_index[city_key], self.cube.var_index[var]
+                    nbytes = self.cube.values[ci, vi].nbytes
+                elif self.storage == 'compact':
+                    nbytes = entry['values'].nbytes + entry['year'].nbytes + entry['offsets'].nbytes
+                else:
+                    nbytes = int(entry['df'].memory_usage(deep=True).sum())
+                    nbytes += sum(values.nbytes for values in entry['by_month'].values())
+                
+                by_series[city_key][var] = nbytes
+                total += nbytes
+        
+        # En modo cubo se cuenta el arreglo completo (incluye huecos NaN)
+        if self.cube is not None:
+            total = self.cube.nbytes()
+        
+        if verbose:
+            print(f"\n💾 MEMORIA ({self.storage})")
+            print("=" * 70)
+            for city_key, variables in by_series.items():
+                detail = ', '.join(f"{var}: {nbytes / 1024:.1f} KB" for var, nbytes in variables.items())
+                print(f"🏙️ {city_key}: {detail}")
+            print("=" * 70)
+            print(f"Total: {total / 1024:.1f} KB\n")
+        
+        return {'by_series': by_series, 'total': total}
+    
     def calculate_probability(self, values, threshold, condition='greater'):
         """Calcula probabilidad"""
         if values is None or len(values) == 0:
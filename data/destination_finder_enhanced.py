@@ -7,7 +7,8 @@ Integración completa con datos GIOVANNI de 5 variables
 
 import numpy as np
 from datetime import datetime
-from config.settings import CIUDADES_NASA, VARIABLES
+from config.settings import CIUDADES_NASA, VARIABLES, MEXICAN_CLIMATE_ZONES
+from data.spatial_index import SphereKDTree, to_unit_vectors, km_to_chord
 
 class DestinationFinderEnhanced:
     """
@@ -125,12 +126,48 @@ class DestinationFinderEnhanced:
         }
     }
     
-    def __init__(self, processor):
+    # ============================================
+    # BÚSQUEDA EN MALLA
+    # ============================================
+    # En la malla hay un valor por celda (no una serie de años), así que la
+    # "probabilidad" de cumplir un umbral se aproxima con una rampa lineal:
+    # 50% justo en el umbral, 0%/100% a ±SPREAD de distancia.
+    # SPREAD ≈ variación interanual típica de cada variable (constante de
+    # respaldo cuando el proveedor no trae spread() por celda).
+    # Es un ÍNDICE heurístico, no una frecuencia histórica como la de
+    # find_destinations; con mapas promedio (provider.monthly = False) el
+    # campo es el mismo para todos los meses.
+    GRID_SCORE_SPREAD = {
+        'temperatura': 3.0,     # °C
+        'precipitacion': 25.0,  # mm/mes
+        'viento': 5.0,          # km/h
+        'humedad': 10.0,        # % humedad relativa
+        'nubosidad': 10.0       # %
+    }
+    
+    # Agrupación de celdas en la búsqueda en malla: una zona no mezcla
+    # celdas con más de CLUSTER_SCORE_BAND puntos de diferencia con su pico
+    # ni se extiende más de CLUSTER_MAX_RADIUS_KM
+    CLUSTER_SCORE_BAND = 10.0
+    CLUSTER_MAX_RADIUS_KM = 150.0
+    
+    # Más lejos que esto del lugar conocido más cercano, la celda se
+    # etiqueta como zona remota en vez de "Cerca de ..."
+    MAX_PLACE_DISTANCE_KM = 100.0
+    
+    # Índice de lugares conocidos (se construye en la primera búsqueda en malla)
+    _places_index = None
+    
+    def __init__(self, processor, field_provider=None):
         """
         Args:
             processor: Instancia de CSVProcessorOptimized con datos cargados
+            field_provider: proveedor de campos en malla (ver data/grid_fields.py);
+                            por defecto default_field_provider() de
+                            data/grid_climatology.py
         """
         self.processor = processor
+        self.field_provider = field_provider
     
     def find_destinations(self, target_date, climate_condition, min_probability=10):
         """
@@ -241,6 +278,287 @@ class DestinationFinderEnhanced:
         
         return results
     
+    def _get_field_provider(self):
+        """Crea el proveedor por defecto la primera vez (climatologías o data/raw)"""
+        if self.field_provider is None:
+            from data.grid_climatology import default_field_provider
+            self.field_provider = default_field_provider()
+        return self.field_provider
+    
+    def _grid_condition_scores(self, values, condition, spread):
+        """
+        Probabilidad (0-1) de cumplir la condición en cada celda
+        
+        Misma semántica de operadores que find_destinations:
+        'less' (max), 'greater' (min), 'between' (min, max)
+        """
+        def below(threshold):
+            # P(valor < threshold) con rampa lineal centrada en el umbral
+            return np.clip(0.5 + (threshold - values) / (2 * spread), 0.0, 1.0)
+        
+        operator = condition['operator']
+        if operator == 'less':
+            return below(condition['max'])
+        if operator == 'greater':
+            return 1.0 - below(condition['min'])
+        if operator == 'between':
+            return np.clip(below(condition['max']) - below(condition['min']), 0.0, 1.0)
+        return np.full(values.shape, np.nan)
+    
+    def _grid_spread(self, provider, var_key, month):
+        """
+        Ancho de la rampa por celda
+        
+        Si el proveedor tiene spread() (climatología mensual) se usa la
+        desviación interanual de cada celda; donde falta o es 0 se usa
+        la constante de GRID_SCORE_SPREAD.
+        """
+        default = self.GRID_SCORE_SPREAD.get(var_key, 1.0)
+        spread = provider.spread(var_key, month) if hasattr(provider, 'spread') else None
+        if spread is None:
+            return default
+        return np.where(np.isnan(spread) | (spread <= 0), default, spread)
+    
+    def score_grid(self, month, climate_condition, tolerance=None):
+        """
+        Evalúa una condición en TODAS las celdas de la malla
+        
+        Args:
+            month: mes del viaje
+            climate_condition: key de CLIMATE_CONDITIONS
+            tolerance: tamaño de celda aceptable en grados; se usa el nivel
+                       de pirámide más grueso que no lo exceda (None = malla
+                       completa)
+        
+        Returns:
+            dict con 'lat', 'lon' (ejes), 'overall' [lat, lon] en %, NaN fuera
+            de México o sin datos, 'probabilities' y 'values' por variable,
+            'seasonal_bonus' y 'factor' (nivel usado); None si la condición
+            no existe
+        """
+        if climate_condition not in self.CLIMATE_CONDITIONS:
+            return None
+        
+        from data.grid_fields import fields_for_tolerance
+        
+        condition_info = self.CLIMATE_CONDITIONS[climate_condition]
+        provider, factor = fields_for_tolerance(self._get_field_provider(), tolerance)
+        lat, lon, mask = provider.grid()
+        
+        valid = mask.copy()
+        probabilities = {}
+        values = {}
+        
+        for var_key, condition in condition_info['conditions'].items():
+            field = provider.field(var_key, month)
+            if field is None:
+                continue
+            
+            spread = self._grid_spread(provider, var_key, month)
+            probabilities[var_key] = self._grid_condition_scores(field, condition, spread) * 100
+            values[var_key] = field
+            valid &= ~np.isnan(field)
+        
+        if probabilities:
+            overall = np.mean(np.stack(list(probabilities.values())), axis=0)
+        else:
+            overall = np.full(mask.shape, np.nan)
+        
+        # Mismo bonus estacional que en la búsqueda por ciudades, solo si los
+        # campos son del mes: sobre un promedio anual inflaría el índice sin
+        # que el mes cambie nada
+        monthly = getattr(provider, 'monthly', False)
+        seasonal_bonus = monthly and month in condition_info.get('months', [])
+        if seasonal_bonus:
+            overall = np.minimum(100, overall * 1.15)
+        
+        overall = np.where(valid, overall, np.nan)
+        
+        return {
+            'lat': lat,
+            'lon': lon,
+            'overall': overall,
+            'probabilities': probabilities,
+            'values': values,
+            'seasonal_bonus': seasonal_bonus,
+            'factor': factor,
+            'monthly': monthly,
+            'notes': {var: note for var, note in getattr(provider, 'notes', {}).items() if var in values}
+        }
+    
+    @staticmethod
+    def _grow_cluster(candidates, seed):
+        """
+        Celdas de 'candidates' conectadas (8-vecindad) con la celda 'seed'
+        
+        Dilata desde la semilla sin salir de 'candidates' hasta que no
+        crece; las iteraciones dependen del diámetro del grupo, no del
+        tamaño de la malla (sin scipy).
+        
+        Returns:
+            ndarray bool [lat, lon]
+        """
+        region = np.zeros(candidates.shape, dtype=bool)
+        region[seed] = True
+        
+        while True:
+            padded = np.pad(region, 1)
+            grown = np.logical_or.reduce([
+                padded[1 + di:padded.shape[0] - 1 + di, 1 + dj:padded.shape[1] - 1 + dj]
+                for di in (-1, 0, 1) for dj in (-1, 0, 1)
+            ]) & candidates
+            if np.array_equal(grown, region):
+                return region
+            region = grown
+    
+    def _cluster_peaks(self, overall, passing, lat, lon, top_k):
+        """
+        Un resultado por zona: picos de puntaje con su zona alrededor
+        
+        Toma la mejor celda que queda, le asigna las celdas conectadas que
+        están a CLUSTER_SCORE_BAND puntos o menos de ella y a
+        CLUSTER_MAX_RADIUS_KM o menos, y repite con el resto. Con
+        8-vecindad simple todo el continente que pasa el filtro quedaba
+        en un solo grupo.
+        
+        Returns:
+            (índices planos de los picos, tamaño de cada zona)
+        """
+        lat_grid, lon_grid = np.meshgrid(lat, lon, indexing='ij')
+        points = to_unit_vectors(lat_grid, lon_grid)
+        max_chord = km_to_chord(self.CLUSTER_MAX_RADIUS_KM)
+        
+        remaining = passing.copy()
+        peaks, sizes = [], []
+        while remaining.any() and len(peaks) < top_k:
+            peak = int(np.argmax(np.where(remaining, overall, -np.inf)))
+            seed = np.unravel_index(peak, overall.shape)
+            
+            chord = np.linalg.norm(points - points[seed], axis=-1)
+            candidates = (
+                remaining
+                & (overall >= overall[seed] - self.CLUSTER_SCORE_BAND)
+                & (chord <= max_chord)
+            )
+            region = self._grow_cluster(candidates, seed)
+            
+            peaks.append(peak)
+            sizes.append(int(region.sum()))
+            remaining &= ~region
+        
+        return np.array(peaks, dtype=np.int64), sizes
+    
+    def _nearest_place(self, lats, lons):
+        """Nombre y estado del lugar conocido más cercano a cada celda"""
+        if DestinationFinderEnhanced._places_index is None:
+            places = list(CIUDADES_NASA.values()) + [
+                city for zone in MEXICAN_CLIMATE_ZONES.values() for city in zone['cities']
+            ]
+            DestinationFinderEnhanced._places_index = SphereKDTree(
+                [p['lat'] for p in places], [p['lon'] for p in places], keys=places
+            )
+        
+        index = DestinationFinderEnhanced._places_index
+        nearest, distance_km = index.query_many(lats, lons, k=1)
+        return [
+            (index.keys[k]['name'], index.keys[k]['state'], float(distance))
+            for k, distance in zip(nearest, distance_km)
+        ]
+    
+    def find_grid_destinations(self, target_date, climate_condition, min_probability=10,
+                               top_k=10, cluster=False, tolerance=None):
+        """
+        Busca destinos en TODA la malla de México (no solo las 5 ciudades)
+        
+        Args:
+            target_date: Fecha objetivo (datetime o date)
+            climate_condition: key de CLIMATE_CONDITIONS
+            min_probability: Probabilidad mínima (%)
+            top_k: número de celdas (o grupos) a devolver
+            cluster: agrupar celdas vecinas de puntaje parecido (ver
+                     _cluster_peaks) y devolver un resultado por zona (su
+                     mejor celda)
+            tolerance: tamaño de celda aceptable en grados (ver score_grid)
+        
+        Returns:
+            Lista de resultados con el mismo formato que find_destinations,
+            más 'cell' (i, j en el nivel usado), 'grid_factor', 'cluster_size',
+            'remote' (sin lugar conocido a MAX_PLACE_DISTANCE_KM),
+            'score_label' (el puntaje es un índice heurístico: anual con mapas
+            promedio, mensual con climatologías) y 'score_notes'
+        """
+        scored = self.score_grid(target_date.month, climate_condition, tolerance=tolerance)
+        if scored is None:
+            return []
+        
+        overall = scored['overall']
+        passing = ~np.isnan(overall) & (overall >= min_probability)
+        if not passing.any():
+            return []
+        
+        flat = np.where(passing, overall, -np.inf).ravel()
+        
+        if cluster:
+            best, sizes = self._cluster_peaks(overall, passing, scored['lat'], scored['lon'], top_k)
+        else:
+            count = min(top_k, int(passing.sum()))
+            best = np.argpartition(-flat, count - 1)[:count]
+            best = best[np.argsort(-flat[best], kind='stable')]
+            sizes = [1] * count
+        
+        n_lon = len(scored['lon'])
+        rows, cols = best // n_lon, best % n_lon
+        cell_lats = scored['lat'][rows]
+        cell_lons = scored['lon'][cols]
+        places = self._nearest_place(cell_lats, cell_lons)
+        condition_info = self.CLIMATE_CONDITIONS[climate_condition]
+        score_label = 'Índice mensual' if scored['monthly'] else 'Índice anual'
+        
+        results = []
+        for k, (i, j) in enumerate(zip(rows, cols)):
+            place_name, place_state, distance_km = places[k]
+            lat_c = round(float(cell_lats[k]), 3)
+            lon_c = round(float(cell_lons[k]), 3)
+            
+            # Lejos de todo lugar conocido (p. ej. islas Revillagigedo) el
+            # "Cerca de ..." engaña: se etiqueta por coordenadas
+            remote = distance_km > self.MAX_PLACE_DISTANCE_KM
+            if remote:
+                coords = f"{abs(lat_c):.2f}°{'N' if lat_c >= 0 else 'S'}, {abs(lon_c):.2f}°{'O' if lon_c < 0 else 'E'}"
+                display_name = f"Zona remota ({coords})"
+                place_state = f"a {distance_km:.0f} km de {place_name}"
+            else:
+                display_name = f"Cerca de {place_name} ({distance_km:.0f} km)"
+            
+            results.append({
+                'city_key': f"celda_{i}_{j}",
+                'city_name': display_name,
+                'city_info': {
+                    'name': display_name if remote else place_name,
+                    'state': place_state,
+                    'lat': lat_c,
+                    'lon': lon_c,
+                    'icon': condition_info['icon'],
+                    'color': condition_info['color']
+                },
+                'probabilities': {
+                    var: round(float(p[i, j]), 1) for var, p in scored['probabilities'].items()
+                },
+                'average_values': {
+                    var: round(float(v[i, j]), 1) for var, v in scored['values'].items()
+                },
+                'overall_probability': round(float(overall[i, j]), 1),
+                'seasonal_bonus': scored['seasonal_bonus'],
+                'cell': (int(i), int(j)),
+                'grid_factor': scored['factor'],
+                'score_label': score_label,
+                'score_notes': scored['notes'],
+                'cluster_size': sizes[k],
+                'remote': remote
+            })
+        
+        return results
+    
     def get_condition_info(self, climate_condition):
         """Obtiene información detallada de una condición climática"""
         return self.CLIMATE_CONDITIONS.get(climate_condition, None)
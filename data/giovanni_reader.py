@@ -0,0 +1,267 @@
+# data/giovanni_reader.py
+"""
+Lector de Series de Tiempo GIOVANNI
+===================================
+Lee los CSV "Time Series, Area-Averaged" de NASA GIOVANNI en una sola pasada.
+
+POR QUÉ EXISTE:
+- Antes se usaba pd.read_csv(skiprows=9) y se renombraban columnas por posición
+- Si GIOVANNI agrega o quita un renglón del encabezado, skiprows=9 se rompe
+- Este lector interpreta el encabezado (Title, Bounding Box, Fill Value...) y
+  convierte el cuerpo directamente a arreglos NumPy, sin crear un DataFrame
+
+FORMATO DEL ARCHIVO:
+    Title:,"Time Series, Area-Averaged of ..."
+    User Start Date:,1990-01-01T00:00:00Z
+    ...
+    Data Bounding Box:,"-99.375,19,-98.75,20"
+    Fill Value (mean_M2TMNXSLV_5_12_4_T2M):, 1000000000000000
+
+    time, mean_M2TMNXSLV_5_12_4_T2M
+    1990-01-01 00:00:00,12.0424137
+    ...
+"""
+
+import csv
+import os
+import time
+
+import numpy as np
+
+# Renglones del encabezado que se guardan en los metadatos
+HEADER_KEYS = {
+    'Title': 'title',
+    'User Start Date': 'user_start',
+    'User End Date': 'user_end',
+    'User Bounding Box': 'user_bbox',
+    'Data Bounding Box': 'data_bbox',
+    'URL to Reproduce Results': 'url'
+}
+
+
+def _parse_bbox(text):
+    """'-99.375,19,-98.75,20' → (west, south, east, north)"""
+    try:
+        west, south, east, north = (float(v) for v in text.split(','))
+    except ValueError:
+        return None
+    return (west, south, east, north)
+
+
+def _parse_header(lines):
+    """
+    Interpreta los renglones del encabezado hasta la fila de columnas ('time, ...')
+
+    Args:
+        lines: iterable de renglones de texto
+
+    Returns:
+        dict de metadatos; 'header_lines' incluye la fila de columnas
+    """
+    metadata = {
+        'title': None,
+        'user_start': None,
+        'user_end': None,
+        'user_bbox': None,
+        'data_bbox': None,
+        'url': None,
+        'fill_value': None,
+        'variable': None,
+        'header_lines': 0
+    }
+
+    for count, line in enumerate(lines, start=1):
+        stripped = line.strip()
+
+        if not stripped:
+            continue
+
+        # Fila de columnas: fin del encabezado
+        if stripped.lower().startswith('time,'):
+            metadata['variable'] = stripped.split(',', 1)[1].strip()
+            metadata['header_lines'] = count
+            return metadata
+
+        row = next(csv.reader([stripped]))
+        if len(row) < 2:
+            continue
+
+        key = row[0].rstrip(':').strip()
+        value = row[1].strip()
+
+        if key.startswith('Fill Value'):
+            try:
+                metadata['fill_value'] = float(value)
+            except ValueError:
+                pass
+        elif key in HEADER_KEYS:
+            field = HEADER_KEYS[key]
+            metadata[field] = _parse_bbox(value) if field.endswith('bbox') else value
+
+    raise ValueError("No se encontró la fila de columnas 'time, ...'")
+
+
+def read_giovanni_header(filepath):
+    """
+    Lee SOLO el encabezado de un CSV de GIOVANNI (no toca el cuerpo)
+
+    Returns:
+        dict con title, user_bbox, data_bbox, fill_value, variable, header_lines...
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return _parse_header(f)
+
+
+def parse_giovanni_rows(text, fill_value=None, time_unit='M'):
+    """
+    Convierte renglones 'YYYY-MM-DD HH:MM:SS,valor' a arreglos NumPy
+
+    Args:
+        text: cuerpo del CSV (sin encabezado)
+        fill_value: valor de relleno de GIOVANNI (se convierte a NaN)
+        time_unit: unidad del datetime64 resultante ('M' para series mensuales)
+
+    Returns:
+        (times, values) — datetime64[time_unit] y float64 con NaN en faltantes
+    """
+    text = text.strip()
+
+    if not text:
+        return np.array([], dtype=f'datetime64[{time_unit}]'), np.array([], dtype=np.float64)
+
+    # Una sola separación: todos los campos en un arreglo plano de 2 columnas
+    fields = np.array(text.replace('\r', '').replace('\n', ',').split(','))
+    if len(fields) % 2 != 0:
+        raise ValueError("Renglones con número de columnas inválido")
+    fields = fields.reshape(-1, 2)
+
+    times = fields[:, 0].astype('datetime64[s]').astype(f'datetime64[{time_unit}]')
+
+    try:
+        values = fields[:, 1].astype(np.float64)
+    except ValueError:
+        # Hay texto no numérico: convertir uno por uno (equivale a errors='coerce')
+        values = np.array([_to_float(v) for v in fields[:, 1]], dtype=np.float64)
+
+    if fill_value is not None:
+        values[values == fill_value] = np.nan
+
+    return times, values
+
+
+def _to_float(text):
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def read_giovanni_csv(filepath, time_unit='M'):
+    """
+    Lee un CSV de GIOVANNI completo: encabezado + cuerpo
+
+    Args:
+        filepath: ruta del CSV
+        time_unit: unidad del datetime64 de la columna de tiempo
+
+    Returns:
+        dict con los metadatos del encabezado más:
+        - 'time': datetime64[time_unit]
+        - 'values': float64 (NaN donde había fill value o texto inválido)
+        - 'body_offset': byte donde empieza el cuerpo
+        - 'end_offset': byte después del último renglón completo (para
+          lecturas incrementales)
+    """
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+
+    text = raw.decode('utf-8')
+    lines = text.splitlines(keepends=True)
+    metadata = _parse_header(lines)
+
+    header_text = ''.join(lines[:metadata['header_lines']])
+    body_offset = len(header_text.encode('utf-8'))
+
+    body = text[len(header_text):]
+    try:
+        times, values = parse_giovanni_rows(body, metadata['fill_value'], time_unit)
+    except ValueError:
+        # Último renglón a medio escribir: quedarse con los completos
+        times, values = parse_giovanni_rows(
+            body[:body.rfind('\n') + 1], metadata['fill_value'], time_unit
+        )
+
+    metadata['time'] = times
+    metadata['values'] = values
+    metadata['body_offset'] = body_offset
+    # Solo hasta el último salto de línea: un renglón sin terminar se vuelve
+    # a leer completo en la siguiente lectura incremental
+    metadata['end_offset'] = max(body_offset, raw.rfind(b'\n') + 1)
+    return metadata
+
+
+def month_index(times):
+    """
+    Año y mes (1-12) de un arreglo datetime64, sin pasar por pandas
+
+    Returns:
+        (years int16, months int8)
+    """
+    months_since_epoch = times.astype('datetime64[M]').astype(np.int64)
+    years = (months_since_epoch // 12 + 1970).astype(np.int16)
+    months = (months_since_epoch % 12 + 1).astype(np.int8)
+    return years, months
+
+
+# ============================================
+# BENCHMARK: lector NumPy vs. pandas
+# ============================================
+if __name__ == "__main__":
+    import pandas as pd
+
+    csv_folder = 'data/csv'
+    files = sorted(
+        os.path.join(csv_folder, name)
+        for name in os.listdir(csv_folder)
+        if name.lower().endswith('.csv')
+    )
+    repeats = 20
+
+    print("\n⏱️ BENCHMARK: LECTOR GIOVANNI vs PANDAS")
+    print("=" * 70)
+
+    def pandas_path(filepath):
+        df = pd.read_csv(filepath, skiprows=9)
+        df.columns = ['time', 'value']
+        df['time'] = pd.to_datetime(df['time'])
+        df['value'] = pd.to_numeric(df['value'], errors='coerce')
+        return df
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for filepath in files:
+            pandas_path(filepath)
+    pandas_seconds = (time.perf_counter() - started) / repeats
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for filepath in files:
+            read_giovanni_csv(filepath)
+    reader_seconds = (time.perf_counter() - started) / repeats
+
+    # Verificar que ambos caminos dan los mismos valores.
+    # skiprows=9 toma el primer dato como fila de columnas, así que pandas
+    # pierde el primer mes de cada serie; se comparan los renglones comunes.
+    lost_rows = 0
+    for filepath in files:
+        df = pandas_path(filepath)
+        series = read_giovanni_csv(filepath)
+        lost_rows += len(series['values']) - len(df)
+        assert np.allclose(df['value'].values, series['values'][-len(df):], equal_nan=True), filepath
+
+    print(f"📄 Archivos: {len(files)}")
+    print(f"🐼 pandas:   {pandas_seconds * 1000:.1f} ms por pasada")
+    print(f"⚡ GIOVANNI: {reader_seconds * 1000:.1f} ms por pasada")
+    print(f"🚀 Aceleración: {pandas_seconds / reader_seconds:.1f}x")
+    print(f"⚠️ Renglones que skiprows=9 descarta: {lost_rows}")
+    print("=" * 70)
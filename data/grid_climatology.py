@@ -0,0 +1,490 @@
+# data/grid_climatology.py
+"""
+Climatología Mensual en Malla (ingesta por streaming)
+=====================================================
+Lee pilas mensuales de NetCDF (un archivo por mes, o un archivo con eje
+time) rebanada por rebanada y acumula, para CADA celda y CADA mes del año:
+
+    count, mean, m2 (varianza de Welford), min, max      [12, lat, lon]
+
+Es el equivalente en malla de 'by_month' de CSVProcessorOptimized: en vez de
+guardar todos los años de cada celda, se guardan sus estadísticas.
+
+POR QUÉ EXISTE:
+- En data/raw solo hay mapas promedio (timeAvgMap): sin dimensión de tiempo
+  no hay estacionalidad por celda
+- Con la climatología, la búsqueda de destinos en malla usa el campo del MES
+  del viaje y la desviación interanual real de cada celda
+
+MEMORIA:
+- Solo hay una rebanada [lat, lon] en memoria a la vez, más los acumuladores
+- Welford actualiza media y varianza en una pasada (numéricamente estable)
+- Dos climatologías parciales se pueden combinar con merge()
+
+USO:
+    python -m data.grid_climatology <variable> <archivo.nc> [<archivo.nc> ...]
+"""
+
+import os
+import re
+
+import numpy as np
+
+from data.grid_fields import regrid_array
+from data.grid_reader import GridDataset, UNIT_SCALE
+
+try:
+    import netCDF4
+except ImportError:  # Dependencia opcional (ver requirements.txt)
+    netCDF4 = None
+
+# Subir este número si cambia el contenido del .npz (la versión 1 no
+# guardaba cuántos pasos de cada archivo se acumularon)
+CLIMATOLOGY_VERSION = 2
+READABLE_VERSIONS = (1, CLIMATOLOGY_VERSION)
+
+CLIMATOLOGY_FOLDER = 'data/cache/climatology'
+
+
+class MonthlyClimatology:
+    """Acumuladores de Welford por mes y por celda"""
+
+    def __init__(self, lat, lon):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+
+        shape = (12, len(self.lat), len(self.lon))
+        self.count = np.zeros(shape, dtype=np.int32)
+        self.mean = np.zeros(shape, dtype=np.float64)
+        self.m2 = np.zeros(shape, dtype=np.float64)
+        self.min = np.full(shape, np.nan)
+        self.max = np.full(shape, np.nan)
+
+        self.first_year = None
+        self.last_year = None
+        self.slices = 0
+
+        # Archivos ya acumulados: {nombre base: pasos de tiempo acumulados}
+        # (None = desconocido, archivo completo); ingest_monthly_stack solo
+        # agrega los pasos que un archivo ganó después
+        self.sources = {}
+
+    def update(self, year, month, field):
+        """
+        Agrega una rebanada mensual (NaN = sin dato en esa celda)
+
+        Args:
+            year, month: fecha de la rebanada
+            field: ndarray [lat, lon] en unidades de la app
+        """
+        m = month - 1
+        field = np.asarray(field, dtype=np.float64)
+        valid = ~np.isnan(field)
+
+        count = self.count[m] + valid
+        delta = np.where(valid, field - self.mean[m], 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean[m] += np.where(valid, delta / np.maximum(count, 1), 0.0)
+        self.m2[m] += np.where(valid, delta * (np.where(valid, field, 0.0) - self.mean[m]), 0.0)
+        self.count[m] = count
+
+        self.min[m] = np.fmin(self.min[m], field)
+        self.max[m] = np.fmax(self.max[m], field)
+
+        self.first_year = year if self.first_year is None else min(self.first_year, year)
+        self.last_year = year if self.last_year is None else max(self.last_year, year)
+        self.slices += 1
+
+    def merge(self, other):
+        """Combina otra climatología de la misma malla (fórmula de Chan)"""
+        total = self.count + other.count
+        delta = other.mean - self.mean
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(total > 0, self.mean + delta * other.count / np.maximum(total, 1), 0.0)
+            m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / np.maximum(total, 1)
+
+        self.count, self.mean, self.m2 = total, mean, m2
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+
+        years = [y for y in (self.first_year, self.last_year, other.first_year, other.last_year) if y is not None]
+        if years:
+            self.first_year, self.last_year = min(years), max(years)
+        self.slices += other.slices
+        for name, steps in other.sources.items():
+            current = self.sources.get(name, 0)
+            self.sources[name] = None if None in (current, steps) else max(current, steps)
+        return self
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def month_mean(self, month):
+        """Media del mes por celda (NaN si la celda no tiene datos)"""
+        return np.where(self.count[month - 1] > 0, self.mean[month - 1], np.nan)
+
+    def month_std(self, month):
+        """Desviación estándar interanual (muestral) del mes por celda"""
+        count = self.count[month - 1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = self.m2[month - 1] / (count - 1)
+        return np.where(count > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+
+    def month_stats(self, month):
+        """dict con count, mean, std, min y max del mes (como get_statistics)"""
+        m = month - 1
+        return {
+            'count': self.count[m],
+            'mean': self.month_mean(month),
+            'std': self.month_std(month),
+            'min': self.min[m],
+            'max': self.max[m]
+        }
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    def save(self, path):
+        """Guarda en .npz (escritura atómica)"""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        names = sorted(self.sources)
+        tmp_path = f"{path[:-4]}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            version=np.array(CLIMATOLOGY_VERSION),
+            lat=self.lat, lon=self.lon,
+            count=self.count, mean=self.mean, m2=self.m2, min=self.min, max=self.max,
+            years=np.array([
+                -1 if self.first_year is None else self.first_year,
+                -1 if self.last_year is None else self.last_year
+            ]),
+            slices=np.array(self.slices),
+            sources=np.array(names, dtype=str),
+            source_steps=np.array([
+                -1 if self.sources[name] is None else self.sources[name] for name in names
+            ], dtype=np.int64)
+        )
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Lee un .npz guardado con save(); None si falta o es de otra versión"""
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as npz:
+            if int(npz['version']) not in READABLE_VERSIONS:
+                return None
+            climatology = cls(npz['lat'], npz['lon'])
+            for key in ('count', 'mean', 'm2', 'min', 'max'):
+                setattr(climatology, key, npz[key])
+            first_year, last_year = npz['years'].tolist()
+            climatology.first_year = None if first_year < 0 else first_year
+            climatology.last_year = None if last_year < 0 else last_year
+            climatology.slices = int(npz['slices'])
+            names = npz['sources'].tolist()
+            steps = npz['source_steps'].tolist() if 'source_steps' in npz.files else [-1] * len(names)
+            climatology.sources = {
+                name: None if count < 0 else int(count) for name, count in zip(names, steps)
+            }
+
+        return climatology
+
+
+# ============================================
+# LECTURA POR STREAMING
+# ============================================
+_DATE_IN_NAME = re.compile(r'(?<!\d)((?:19|20)\d{2})[-_]?(0[1-9]|1[0-2])(?:\d{2})?(?!\d)')
+
+
+def _file_date(path, nc):
+    """(año, mes) de un archivo de UN solo mes (atributos o nombre)"""
+    for attr in ('start_time', 'userstartdate', 'RangeBeginningDate'):
+        value = getattr(nc, attr, None)
+        if value:
+            return int(str(value)[:4]), int(str(value)[5:7])
+
+    match = _DATE_IN_NAME.search(os.path.basename(path))
+    if match:
+        return int(match.group(1)), int(match.group(2))
+
+    raise ValueError(f"No se pudo determinar el mes de {path}")
+
+
+def _slice_dates(path, nc, var):
+    """[(año, mes)] de cada paso de tiempo de un archivo"""
+    if var.ndim == 3 and 'time' in nc.variables and var.shape[0] > 1:
+        time_var = nc.variables['time']
+        dates = netCDF4.num2date(
+            time_var[:], time_var.units, getattr(time_var, 'calendar', 'standard')
+        )
+        return [(d.year, d.month) for d in dates]
+    return [_file_date(path, nc)]
+
+
+def time_steps(path):
+    """Pasos de tiempo de un archivo (1 si es de un solo mes)"""
+    if netCDF4 is None:
+        raise ImportError("Se requiere netCDF4 para leer pilas mensuales: pip install netCDF4")
+
+    with netCDF4.Dataset(path, 'r') as nc:
+        var = nc.variables[GridDataset._find_field(nc)]
+        return len(_slice_dates(path, nc, var))
+
+
+def iter_monthly_slices(paths, variable=None, skip=None):
+    """
+    Genera (año, mes, lat, lon, campo) rebanada por rebanada
+
+    Acepta archivos de un mes (campo [lat, lon] o [1, lat, lon]) y archivos
+    con eje time ([time, lat, lon]). El relleno se convierte en NaN y se
+    aplican las conversiones de unidades de la app.
+
+    Args:
+        skip: {nombre base: pasos} que se saltan al inicio de cada archivo
+              (los que ya se acumularon)
+    """
+    if netCDF4 is None:
+        raise ImportError("Se requiere netCDF4 para leer pilas mensuales: pip install netCDF4")
+
+    scale = UNIT_SCALE.get(variable, 1.0)
+    skip = skip or {}
+
+    for path in paths:
+        with netCDF4.Dataset(path, 'r') as nc:
+            field_name = GridDataset._find_field(nc)
+            var = nc.variables[field_name]
+            var.set_auto_maskandscale(False)
+
+            fill_values = [
+                float(getattr(var, attr)) for attr in ('_FillValue', 'missing_value')
+                if attr in var.ncattrs()
+            ]
+            lat = np.asarray(nc.variables['lat'][:], dtype=np.float64)
+            lon = np.asarray(nc.variables['lon'][:], dtype=np.float64)
+
+            dates = _slice_dates(path, nc, var)
+            first = skip.get(os.path.basename(path), 0)
+
+            for t, (year, month) in enumerate(dates[first:], start=first):
+                raw = var[t] if var.ndim == 3 else var[:]
+                field = np.array(raw, dtype=np.float64)
+                for fill in fill_values:
+                    field[field == fill] = np.nan
+                if scale != 1.0:
+                    field *= scale
+                yield year, month, lat, lon, field
+
+
+def build_climatology(paths, variable=None, target_lat=None, target_lon=None, skip=None):
+    """
+    Ingiere una pila mensual completa en UNA pasada
+
+    Args:
+        paths: archivos .nc (en cualquier orden)
+        variable: variable de la app (para conversión de unidades)
+        target_lat, target_lon: malla de salida; por defecto la del primer
+                                archivo (las demás se regridean)
+        skip: pasos ya acumulados por archivo (ver iter_monthly_slices)
+
+    Returns:
+        MonthlyClimatology (None si no hubo rebanadas) con sources = pasos
+        de cada archivo
+    """
+    climatology = None
+
+    for year, month, lat, lon, field in iter_monthly_slices(paths, variable, skip):
+        if climatology is None:
+            climatology = MonthlyClimatology(
+                lat if target_lat is None else target_lat,
+                lon if target_lon is None else target_lon
+            )
+        field = regrid_array(field, lat, lon, climatology.lat, climatology.lon)
+        climatology.update(year, month, field)
+
+    if climatology is not None:
+        climatology.sources = {os.path.basename(p): time_steps(p) for p in paths}
+    return climatology
+
+
+def climatology_path(variable, folder=CLIMATOLOGY_FOLDER):
+    return os.path.join(folder, f'{variable}.npz')
+
+
+def ingest_monthly_stack(paths, variable, folder=CLIMATOLOGY_FOLDER):
+    """
+    Actualiza la climatología guardada de una variable con archivos nuevos
+
+    Si ya existe, los archivos nuevos se combinan con merge() sin releer
+    los anteriores. De cada archivo se recuerda cuántos pasos de tiempo se
+    acumularon: si vuelve a llegar igual se salta (contarlo otra vez
+    duplicaría sus meses en el estado de Welford) y si su eje time creció
+    en el mismo archivo solo se agregan los pasos nuevos.
+
+    Returns:
+        MonthlyClimatology combinada
+    """
+    path = climatology_path(variable, folder)
+    existing = MonthlyClimatology.load(path)
+    done = existing.sources if existing is not None else {}
+
+    # {ruta: pasos ya acumulados} de los archivos con algo nuevo
+    pending = {}
+    for p in paths:
+        name = os.path.basename(p)
+        steps = time_steps(p)
+        already = done.get(name, 0)
+        if already is None:
+            # Climatología de la versión 1: no se sabe cuántos pasos tenía
+            continue
+        if steps < already:
+            print(f"⚠️ {name} tiene {steps} pasos y ya se acumularon {already}: se salta "
+                  f"(reconstruir {path} si el archivo se reescribió)")
+        elif steps > already:
+            pending[p] = already
+
+    skipped = len(paths) - len(pending)
+    if existing is not None and skipped:
+        print(f"⏭️ {skipped} archivos ya incluidos en {path}")
+    if not pending:
+        return existing
+
+    skip = {os.path.basename(p): already for p, already in pending.items()}
+    if existing is None:
+        climatology = build_climatology(list(pending), variable, skip=skip)
+    else:
+        update = build_climatology(list(pending), variable, existing.lat, existing.lon, skip=skip)
+        climatology = existing.merge(update) if update is not None else existing
+
+    if climatology is not None:
+        climatology.save(path)
+    return climatology
+
+
+class ClimatologyFields:
+    """
+    Proveedor de campos por MES para DestinationFinderEnhanced
+
+    Misma interfaz que TimeAveragedFields (data/grid_fields.py), más
+    spread(): la desviación interanual de cada celda.
+    """
+
+    monthly = True
+
+    def __init__(self, climatologies, mask=None, target='temperatura'):
+        """
+        Args:
+            climatologies: dict {variable: MonthlyClimatology}
+            mask: máscara [lat, lon] de la malla objetivo (None = celdas con dato)
+            target: variable cuya malla se usa como común
+        """
+        self.climatologies = climatologies
+        self.target = target if target in climatologies else next(iter(climatologies))
+        self.mask = mask
+        self.notes = {}
+
+    @classmethod
+    def from_folder(cls, folder=CLIMATOLOGY_FOLDER, mask=None):
+        """Carga todas las climatologías guardadas en la carpeta"""
+        climatologies = {}
+        if os.path.isdir(folder):
+            for filename in sorted(os.listdir(folder)):
+                if filename.endswith('.npz') and not filename.endswith('.tmp.npz'):
+                    climatology = MonthlyClimatology.load(os.path.join(folder, filename))
+                    if climatology is not None:
+                        climatologies[filename[:-4]] = climatology
+        return cls(climatologies, mask=mask) if climatologies else None
+
+    def grid(self):
+        target = self.climatologies[self.target]
+        mask = self.mask
+        if mask is None:
+            mask = (target.count > 0).any(axis=0)
+        return target.lat, target.lon, mask
+
+    def _on_target(self, variable, values):
+        source = self.climatologies[variable]
+        target = self.climatologies[self.target]
+        return regrid_array(values, source.lat, source.lon, target.lat, target.lon)
+
+    def field(self, variable, month):
+        if variable == 'humedad':
+            return self._relative_humidity(month)
+        if variable not in self.climatologies:
+            return None
+        return self._on_target(variable, self.climatologies[variable].month_mean(month))
+
+    def spread(self, variable, month):
+        if variable not in self.climatologies or variable == 'humedad':
+            return None
+        return self._on_target(variable, self.climatologies[variable].month_std(month))
+
+    def _relative_humidity(self, month):
+        """Humedad específica media + temperatura media del mes → humedad relativa (%)"""
+        if 'humedad' not in self.climatologies or 'temperatura' not in self.climatologies:
+            return None
+
+        from data.humidity_analyzer import HumidityAnalyzer
+
+        q = self._on_target('humedad', self.climatologies['humedad'].month_mean(month))
+        temp = self._on_target('temperatura', self.climatologies['temperatura'].month_mean(month))
+        rh = HumidityAnalyzer().specific_to_relative_humidity(q.ravel(), temp.ravel())
+        return np.asarray(rh).reshape(q.shape)
+
+
+def default_field_provider(folder=CLIMATOLOGY_FOLDER):
+    """
+    Proveedor para la búsqueda en malla: climatologías mensuales si se
+    generaron (python -m data.grid_climatology), si no los mapas promedio
+
+    La máscara de México se toma de la malla de data/raw llevada a la malla
+    de la climatología (si data/raw no está disponible, celdas con dato).
+    """
+    from data.grid_fields import TimeAveragedFields
+
+    if os.path.isdir(folder):
+        provider = ClimatologyFields.from_folder(folder)
+        if provider is not None:
+            try:
+                lat, lon, mask = TimeAveragedFields().grid()
+                target_lat, target_lon, _ = provider.grid()
+                provider.mask = regrid_array(mask.astype(np.float64), lat, lon, target_lat, target_lon) >= 0.5
+            except (ImportError, OSError, KeyError, ValueError) as e:
+                print(f"⚠️ Climatología sin máscara de México: {e}")
+            return provider
+
+    return TimeAveragedFields()
+
+
+# ============================================
+# COMANDO: ingerir una pila mensual
+# ============================================
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 3:
+        print("Uso: python -m data.grid_climatology <variable> <archivo.nc> [<archivo.nc> ...]")
+        sys.exit(1)
+
+    variable, paths = sys.argv[1], sorted(sys.argv[2:])
+
+    print(f"\n📥 INGIRIENDO PILA MENSUAL: {variable} ({len(paths)} archivos)")
+    print("=" * 70)
+
+    started = time.perf_counter()
+    climatology = ingest_monthly_stack(paths, variable)
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ {climatology.slices} rebanadas, {climatology.first_year}-{climatology.last_year}, "
+          f"malla {climatology.mean.shape[1:]} en {elapsed:.1f} s")
+    for month in (1, 7):
+        stats = climatology.month_stats(month)
+        print(f"   Mes {month:>2}: media {np.nanmean(stats['mean']):.3f}, "
+              f"std {np.nanmean(stats['std']):.3f}, años por celda {stats['count'].max()}")
+    print(f"💾 {climatology_path(variable)}")
@@ -0,0 +1,254 @@
+# data/grid_fields.py
+"""
+Proveedores de Campos en Malla
+==============================
+Entregan, para una variable y un mes, el campo 2-D de toda la república
+sobre UNA malla común, listo para evaluarse con aritmética vectorizada.
+
+POR QUÉ EXISTE:
+- La búsqueda de destinos en malla (DestinationFinderEnhanced) no debe saber
+  de dónde salen los campos: hoy son mapas promedio (timeAvgMap), mañana
+  pueden ser climatologías mensuales
+- Las mallas de data/raw tienen resoluciones distintas (0.1° precipitación,
+  0.5x0.625° MERRA); aquí se llevan todas a la malla objetivo
+
+INTERFAZ DE UN PROVEEDOR:
+- grid() → (lat, lon, mask): ejes de la malla común y máscara de México
+- field(variable, month) → ndarray [lat, lon] con NaN, o None si no hay dato
+  Unidades de la app: °C, mm/mes, km/h, humedad RELATIVA (%), nubosidad (%)
+- spread(variable, month) (opcional) → desviación estándar interanual por
+  celda; si el proveedor no la tiene se usa una constante por variable
+- monthly: True si field() cambia con el mes (False = un solo mapa promedio)
+- notes: dict {variable: texto} con las aproximaciones hechas a un campo
+
+PROVEEDORES:
+- TimeAveragedFields: mapas promedio de data/raw (sin meses)
+- ClimatologyFields (data/grid_climatology.py): climatologías mensuales
+- CoarsenedFields: cualquiera de los anteriores reducido 2x/4x/8x por
+  bloques; fields_for_tolerance() elige el nivel más grueso cuya celda no
+  exceda la tolerancia (misma regla que data/grid_pyramid.py)
+"""
+
+import numpy as np
+
+from data.area_average import area_average
+from data.grid_pyramid import GridLevel, block_average, factor_for_tolerance
+from data.grid_reader import ClimateGrids, GridDataset
+from data.humidity_analyzer import HumidityAnalyzer
+
+
+# Las mallas de viento son SPEEDMAX (máximo horario) y los umbrales de
+# DestinationFinderEnhanced se calibraron con el SPEED de los CSV. Factor
+# SPEED/SPEEDMAX: mediana del cociente CSV/malla en las cajas de las cinco
+# ciudades (python -m data.consistency_check: 0.945-1.135)
+WIND_SPEEDMAX_TO_SPEED = 0.975
+
+
+def bounds_boxes(lat_bounds, lon_bounds):
+    """(oeste, sur, este, norte) de cada celda, en orden [lat, lon]"""
+    n_lat, n_lon = len(lat_bounds), len(lon_bounds)
+    south = np.repeat(lat_bounds[:, 0], n_lon)
+    north = np.repeat(lat_bounds[:, 1], n_lon)
+    west = np.tile(lon_bounds[:, 0], n_lat)
+    east = np.tile(lon_bounds[:, 1], n_lat)
+    return np.column_stack([west, south, east, north])
+
+
+def cell_boxes(grid):
+    """(oeste, sur, este, norte) de cada celda de un GridDataset, en orden [lat, lon]"""
+    grid.open()
+    return bounds_boxes(grid.lat_bounds, grid.lon_bounds)
+
+
+def regrid_array(values, lat, lon, target_lat, target_lon):
+    """
+    Igual que regrid() pero para arreglos en memoria (ejes regulares)
+
+    - Fuente más fina: promedio por área
+    - Igual o más gruesa: celda más cercana
+    """
+    if len(lat) == len(target_lat) and len(lon) == len(target_lon) \
+            and np.allclose(lat, target_lat) and np.allclose(lon, target_lon):
+        return values
+
+    source_cell = abs(lat[1] - lat[0]) * abs(lon[1] - lon[0])
+    target_cell = abs(target_lat[1] - target_lat[0]) * abs(target_lon[1] - target_lon[0])
+
+    if source_cell < target_cell:
+        boxes = bounds_boxes(
+            GridDataset._bounds_from_centers(target_lat),
+            GridDataset._bounds_from_centers(target_lon)
+        )
+        return area_average(values, lat, lon, boxes).reshape(len(target_lat), len(target_lon))
+
+    lats, lons = np.meshgrid(target_lat, target_lon, indexing='ij')
+    return GridLevel(values, lat, lon, 1).sample(lats, lons)
+
+
+def regrid(source, target):
+    """
+    Lleva la malla 'source' a las celdas de 'target' (ambos GridDataset)
+
+    - Si source es más fina: promedio por área de las celdas que caen en
+      cada celda destino (como hace GIOVANNI)
+    - Si es igual o más gruesa: interpolación bilineal en los centros
+    """
+    source.open()
+    target.open()
+
+    if source.path == target.path:
+        return source.read_all()
+
+    source_cell = abs(source.lat[1] - source.lat[0]) * abs(source.lon[1] - source.lon[0])
+    target_cell = abs(target.lat[1] - target.lat[0]) * abs(target.lon[1] - target.lon[0])
+
+    if source_cell < target_cell:
+        values = area_average(source.read_all(), source.lat, source.lon, cell_boxes(target))
+        return values.reshape(len(target.lat), len(target.lon))
+
+    lats, lons = np.meshgrid(target.lat, target.lon, indexing='ij')
+    return source.sample(lats, lons, method='bilinear')
+
+
+class TimeAveragedFields:
+    """
+    Proveedor con los mapas promedio de data/raw
+
+    No hay dimensión de tiempo en esos archivos: el mismo campo sirve para
+    todos los meses (monthly = False).
+    """
+
+    monthly = False
+
+    def __init__(self, grids=None, target='temperatura'):
+        """
+        Args:
+            grids: ClimateGrids (por defecto las de data/raw)
+            target: variable cuya malla se usa como malla común
+        """
+        self.grids = grids if grids is not None else ClimateGrids()
+        self.target = target
+        self._fields = {}
+        self._grid = None
+        self.notes = {}
+
+    def grid(self):
+        """(lat, lon, mask) de la malla común"""
+        if self._grid is None:
+            target = self.grids.get(self.target).open()
+            self._grid = (target.lat, target.lon, target.mask())
+        return self._grid
+
+    def _regridded(self, variable):
+        if variable not in self._fields:
+            if variable in self.grids.grids:
+                source = self.grids.get(variable)
+                field = regrid(source, self.grids.get(self.target))
+                if variable == 'viento' and 'SPEEDMAX' in source.path:
+                    field = field * WIND_SPEEDMAX_TO_SPEED
+                    self.notes['viento'] = (
+                        f"SPEEDMAX (máximo horario) × {WIND_SPEEDMAX_TO_SPEED} ≈ SPEED de los CSV"
+                    )
+                self._fields[variable] = field
+            else:
+                self._fields[variable] = None
+        return self._fields[variable]
+
+    def field(self, variable, month=None):
+        """Campo de una variable en unidades de la app (month se ignora)"""
+        if variable == 'humedad':
+            return self._relative_humidity()
+        return self._regridded(variable)
+
+    def _relative_humidity(self):
+        """Humedad específica (kg/kg) + temperatura → humedad relativa (%)"""
+        if 'humedad_relativa' not in self._fields:
+            q = self._regridded('humedad')
+            temp = self._regridded('temperatura')
+            if q is None or temp is None:
+                self._fields['humedad_relativa'] = None
+            else:
+                rh = HumidityAnalyzer().specific_to_relative_humidity(q.ravel(), temp.ravel())
+                self._fields['humedad_relativa'] = np.asarray(rh).reshape(q.shape)
+        return self._fields['humedad_relativa']
+
+
+class CoarsenedFields:
+    """
+    Proveedor reducido por bloques factor x factor (un nivel de pirámide)
+
+    Cada campo se reduce una sola vez (promedio ponderado por cos(lat), sin
+    NaN) y queda en caché; las búsquedas siguientes recorren 1/factor² de
+    las celdas.
+    """
+
+    # Fracción mínima de celdas dentro de la máscara para que el bloque cuente
+    MASK_FRACTION = 0.5
+
+    def __init__(self, provider, factor):
+        self.provider = provider
+        self.factor = factor
+        self._fields = {}
+        self._grid = None
+
+    @property
+    def monthly(self):
+        return getattr(self.provider, 'monthly', False)
+
+    @property
+    def notes(self):
+        return getattr(self.provider, 'notes', {})
+
+    def grid(self):
+        """(lat, lon, mask) reducidos"""
+        if self._grid is None:
+            lat, lon, mask = self.provider.grid()
+            fraction, coarse_lat, coarse_lon = block_average(mask.astype(np.float64), lat, lon, self.factor)
+            self._grid = (coarse_lat, coarse_lon, np.nan_to_num(fraction) >= self.MASK_FRACTION)
+        return self._grid
+
+    def _coarsen(self, kind, variable, month, read):
+        key = (kind, variable, month)
+        if key not in self._fields:
+            values = read()
+            if values is not None:
+                lat, lon, _ = self.provider.grid()
+                values = block_average(values, lat, lon, self.factor)[0]
+            self._fields[key] = values
+        return self._fields[key]
+
+    def field(self, variable, month=None):
+        return self._coarsen('field', variable, month, lambda: self.provider.field(variable, month))
+
+    def spread(self, variable, month=None):
+        if not hasattr(self.provider, 'spread'):
+            return None
+        return self._coarsen('spread', variable, month, lambda: self.provider.spread(variable, month))
+
+
+def native_cell_size(provider):
+    """Celda de la malla común de un proveedor, en grados (el eje más grande)"""
+    lat, lon, _ = provider.grid()
+    return max(abs(float(lat[1] - lat[0])), abs(float(lon[1] - lon[0])))
+
+
+def fields_for_tolerance(provider, tolerance):
+    """
+    Proveedor al nivel más grueso cuya celda mide <= tolerance grados
+
+    Los niveles se guardan en el proveedor original, así que cada nivel se
+    reduce una sola vez por proceso.
+
+    Returns:
+        (proveedor, factor); factor 1 = el proveedor original
+    """
+    factor = factor_for_tolerance(native_cell_size(provider), tolerance)
+    if factor == 1:
+        return provider, 1
+
+    levels = getattr(provider, '_coarse_levels', None)
+    if levels is None:
+        levels = provider._coarse_levels = {}
+    if factor not in levels:
+        levels[factor] = CoarsenedFields(provider, factor)
+    return levels[factor], factor
@@ -0,0 +1,289 @@
+# data/grid_pyramid.py
+"""
+Pirámide Multi-Resolución de Mallas
+===================================
+Versiones 2x, 4x y 8x más gruesas de cada malla de data/raw, promediadas por
+bloques (ponderadas por cos(latitud) e ignorando NaN), guardadas en la caché
+(data/raw queda de solo lectura):
+
+    data/raw/<archivo>.nc
+    data/cache/pyramids/<archivo>.pyramid.npz      (niveles 2, 4, 8)
+
+POR QUÉ EXISTE:
+- Con todo México a la vista, un mapa o una búsqueda en toda la malla no
+  necesita celdas de 0.1°: un píxel de pantalla ya cubre varias
+- Un nivel 4x tiene 1/16 de las celdas: los mapas de calor y las búsquedas
+  a escala país cuestan una fracción de la pasada completa
+
+CÓMO SE ELIGE EL NIVEL:
+- level_for_zoom(zoom): el más grueso cuyas celdas sigan ocupando al menos
+  PIXELS_PER_CELL píxeles en pantalla a ese zoom
+- level_for_tolerance(grados): el más grueso cuya celda no exceda la
+  tolerancia pedida (factor_for_tolerance; también lo usa la búsqueda de
+  destinos en malla, ver data/grid_fields.py)
+
+USO:
+    python -m data.grid_pyramid        # genera los .pyramid.npz
+"""
+
+import os
+
+import numpy as np
+
+from data.area_average import latitude_weights
+
+# Factores de reducción que se guardan (1 = malla original)
+PYRAMID_FACTORS = (2, 4, 8)
+
+PYRAMID_FOLDER = 'data/cache/pyramids'
+
+# Subir este número si cambia el contenido del .pyramid.npz
+PYRAMID_VERSION = 1
+
+# Tamaño mínimo en pantalla de una celda para elegir nivel por zoom
+PIXELS_PER_CELL = 8
+TILE_SIZE = 256
+
+
+def block_average(values, lat, lon, factor):
+    """
+    Promedio por bloques factor x factor, ponderado por cos(lat) y sin NaN
+
+    Los bordes que no completan un bloque se rellenan con NaN (cuentan como
+    celdas sin dato), así que no se pierde ninguna celda.
+
+    Returns:
+        (values, lat, lon) del nivel grueso; NaN en bloques sin dato
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    n_lat, n_lon = values.shape
+
+    pad_lat = -n_lat % factor
+    pad_lon = -n_lon % factor
+
+    # Ejes extendidos con el mismo paso para los bloques del borde
+    lat_ext = lat[0] + (lat[1] - lat[0]) * np.arange(n_lat + pad_lat)
+    lon_ext = lon[0] + (lon[1] - lon[0]) * np.arange(n_lon + pad_lon)
+    padded = np.pad(values, ((0, pad_lat), (0, pad_lon)), constant_values=np.nan)
+
+    weights = np.broadcast_to(latitude_weights(lat_ext)[:, None], padded.shape)
+    valid = ~np.isnan(padded)
+    weights = np.where(valid, weights, 0.0)
+
+    shape = (padded.shape[0] // factor, factor, padded.shape[1] // factor, factor)
+    numerator = (np.where(valid, padded, 0.0) * weights).reshape(shape).sum(axis=(1, 3))
+    total = weights.reshape(shape).sum(axis=(1, 3))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        coarse = numerator / total
+    coarse[total == 0] = np.nan
+
+    return coarse, lat_ext.reshape(-1, factor).mean(axis=1), lon_ext.reshape(-1, factor).mean(axis=1)
+
+
+class GridLevel:
+    """Una malla regular en memoria (original o reducida)"""
+
+    def __init__(self, values, lat, lon, factor):
+        self.values = values
+        self.lat = lat
+        self.lon = lon
+        self.factor = factor
+        self.lat_step = float(lat[1] - lat[0]) if len(lat) > 1 else 0.0
+        self.lon_step = float(lon[1] - lon[0]) if len(lon) > 1 else 0.0
+
+    @property
+    def cell_size(self):
+        """Tamaño de celda en grados (el eje más grande)"""
+        return max(abs(self.lat_step), abs(self.lon_step))
+
+    def sample(self, lats, lons):
+        """Valor de la celda que contiene cada punto (NaN fuera de la malla)"""
+        lats, lons = np.broadcast_arrays(
+            np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)
+        )
+
+        i = np.rint((lats - self.lat[0]) / self.lat_step).astype(np.int64)
+        j = np.rint((lons - self.lon[0]) / self.lon_step).astype(np.int64)
+        inside = (i >= 0) & (i < len(self.lat)) & (j >= 0) & (j < len(self.lon))
+
+        result = np.full(lats.shape, np.nan)
+        result[inside] = self.values[i[inside], j[inside]]
+        return result
+
+
+def factor_for_tolerance(native_cell, tolerance, factors=PYRAMID_FACTORS):
+    """Factor más grueso cuya celda (native_cell * factor) mide <= tolerance grados"""
+    if not tolerance:
+        return 1
+    candidates = [f for f in factors if f * native_cell <= tolerance + 1e-9]
+    return max(candidates) if candidates else 1
+
+
+def pyramid_path(grid_path, folder=PYRAMID_FOLDER):
+    """data/raw/x.nc → data/cache/pyramids/x.pyramid.npz"""
+    stem = os.path.splitext(os.path.basename(grid_path))[0]
+    return os.path.join(folder, stem + '.pyramid.npz')
+
+
+def build_pyramid(grid, factors=PYRAMID_FACTORS, folder=PYRAMID_FOLDER):
+    """
+    Calcula y guarda los niveles reducidos de un GridDataset
+
+    Se guardan sin conversión de unidades (como en el .nc); GridPyramid
+    aplica la escala del GridDataset al leer.
+
+    Returns:
+        ruta del .pyramid.npz
+    """
+    grid.open()
+    values = grid.read_all()
+    if grid.scale != 1.0:
+        values = values / grid.scale
+
+    stat = os.stat(grid.path)
+    arrays = {
+        'version': np.array(PYRAMID_VERSION),
+        'source_size': np.array(stat.st_size),
+        'source_mtime_ns': np.array(stat.st_mtime_ns),
+        'factors': np.array(factors)
+    }
+    for factor in factors:
+        coarse, lat, lon = block_average(values, grid.lat, grid.lon, factor)
+        arrays[f'values_{factor}'] = coarse.astype(np.float32)
+        arrays[f'lat_{factor}'] = lat
+        arrays[f'lon_{factor}'] = lon
+
+    os.makedirs(folder, exist_ok=True)
+    path = pyramid_path(grid.path, folder)
+    tmp_path = f"{path[:-4]}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+class GridPyramid:
+    """Niveles 1x/2x/4x/8x de un GridDataset, con elección por zoom o tolerancia"""
+
+    def __init__(self, grid, build_missing=True, folder=PYRAMID_FOLDER):
+        """
+        Args:
+            grid: GridDataset (nivel 1)
+            build_missing: generar el .pyramid.npz si falta o está viejo
+            folder: carpeta de los .pyramid.npz (caché, nunca data/raw)
+        """
+        self.grid = grid
+        self.build_missing = build_missing
+        self.folder = folder
+        self._levels = None
+
+    def _load(self):
+        """Lee el .pyramid.npz (o lo genera) la primera vez"""
+        if self._levels is not None:
+            return self._levels
+
+        grid = self.grid.open()
+        path = pyramid_path(grid.path, self.folder)
+        levels = {1: None}  # el nivel 1 se lee del .nc al pedirlo
+
+        arrays = self._read_pyramid(path)
+        if arrays is None and self.build_missing:
+            build_pyramid(grid, folder=self.folder)
+            arrays = self._read_pyramid(path)
+
+        if arrays is not None:
+            for factor in arrays['factors'].tolist():
+                values = arrays[f'values_{factor}'].astype(np.float64)
+                if grid.scale != 1.0:
+                    values *= grid.scale
+                levels[factor] = GridLevel(values, arrays[f'lat_{factor}'], arrays[f'lon_{factor}'], factor)
+
+        self._levels = levels
+        return levels
+
+    def _read_pyramid(self, path):
+        """Arreglos del .pyramid.npz si existe y corresponde al .nc actual"""
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path) as npz:
+                arrays = {key: npz[key] for key in npz.files}
+        except (OSError, ValueError):
+            return None
+
+        stat = os.stat(self.grid.path)
+        if (int(arrays['version']) != PYRAMID_VERSION
+                or int(arrays['source_size']) != stat.st_size
+                or int(arrays['source_mtime_ns']) != stat.st_mtime_ns):
+            return None
+        return arrays
+
+    @property
+    def factors(self):
+        return sorted(self._load())
+
+    def level(self, factor=1):
+        """GridLevel de un factor (1 = malla original completa)"""
+        levels = self._load()
+        if factor not in levels:
+            raise KeyError(f"Nivel {factor}x no disponible (hay {sorted(levels)})")
+
+        if levels[factor] is None:
+            grid = self.grid
+            levels[factor] = GridLevel(grid.read_all(), grid.lat, grid.lon, 1)
+        return levels[factor]
+
+    def native_cell_size(self):
+        grid = self.grid.open()
+        return max(abs(grid.lat[1] - grid.lat[0]), abs(grid.lon[1] - grid.lon[0]))
+
+    def level_for_tolerance(self, tolerance):
+        """Factor más grueso cuya celda mide <= tolerance grados"""
+        return factor_for_tolerance(self.native_cell_size(), tolerance, self.factors)
+
+    def level_for_zoom(self, zoom):
+        """Factor más grueso cuyas celdas ocupen >= PIXELS_PER_CELL píxeles a ese zoom"""
+        degrees_per_pixel = 360.0 / (TILE_SIZE * 2 ** zoom)
+        return self.level_for_tolerance(degrees_per_pixel * PIXELS_PER_CELL)
+
+    def for_zoom(self, zoom):
+        return self.level(self.level_for_zoom(zoom))
+
+    def for_tolerance(self, tolerance):
+        return self.level(self.level_for_tolerance(tolerance))
+
+
+def open_pyramids(grids, build_missing=True, folder=PYRAMID_FOLDER):
+    """GridPyramid por variable para un dict de open_grids()"""
+    return {
+        variable: GridPyramid(grid, build_missing=build_missing, folder=folder)
+        for variable, grid in grids.items()
+    }
+
+
+# ============================================
+# COMANDO: generar pirámides
+# ============================================
+if __name__ == "__main__":
+    import time
+
+    from data.grid_reader import open_grids
+
+    print("\n🔺 GENERANDO PIRÁMIDES DE MALLAS")
+    print("=" * 70)
+
+    for variable, grid in open_grids().items():
+        started = time.perf_counter()
+        path = build_pyramid(grid)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        pyramid = GridPyramid(grid, build_missing=False)
+        sizes = ', '.join(
+            f"{f}x {pyramid.level(f).values.shape}" for f in pyramid.factors
+        )
+        print(f"🗺️ {variable}: {sizes} → {os.path.basename(path)} ({elapsed:.0f} ms)")
+        print(f"   zoom 3 → {pyramid.level_for_zoom(3)}x | zoom 5 → {pyramid.level_for_zoom(5)}x | "
+              f"zoom 8 → {pyramid.level_for_zoom(8)}x")
@@ -0,0 +1,482 @@
+# data/grid_reader.py
+"""
+Lector de Mallas GIOVANNI (timeAvgMap)
+======================================
+Acceso perezoso a los mapas promedio g4.timeAvgMap.*.nc de data/raw.
+
+POR QUÉ EXISTE:
+- Los CSV solo cubren 5 ciudades; las mallas cubren todo México
+- Con este módulo se puede consultar cualquier punto o ventana sin cargar
+  la malla completa en RAM en cada proceso
+
+CÓMO LEE:
+- El archivo se abre hasta la primera consulta y solo se cargan los ejes
+  lat/lon (unos cientos de números)
+- Las lecturas de un punto o ventana piden a netCDF4 SOLO ese slice; HDF5
+  descomprime únicamente los chunks que lo tocan
+- Los valores de relleno (_FillValue / missing_value) se devuelven como NaN
+- Toda lectura pasa por la caché LRU de chunks (data/tile_cache.py): un
+  chunk se descomprime una sola vez mientras quepa en el presupuesto
+
+Las mallas de GIOVANNI vienen en chunks comprimidos con zlib, así que no se
+pueden mapear en memoria byte a byte; la lectura por slices es el equivalente
+más cercano (solo se tocan los bytes de los chunks necesarios).
+"""
+
+import glob
+import os
+import threading
+
+import numpy as np
+
+from data.tile_cache import DEFAULT_TILE_CACHE
+
+try:
+    import netCDF4
+except ImportError:  # Dependencia opcional (ver requirements.txt)
+    netCDF4 = None
+
+# Sufijo del nombre de archivo → variable de la app
+GRID_VARIABLES = ['temperatura', 'precipitacion', 'viento', 'humedad', 'nubosidad']
+
+# Mismas conversiones que CSVProcessorOptimized._convert_units
+UNIT_SCALE = {
+    'viento': 3.6,      # m/s → km/h
+    'nubosidad': 100.0  # fracción → porcentaje
+}
+
+# Variables auxiliares que no son el campo de datos
+AUXILIARY_VARIABLES = {'lat', 'lon', 'lat_bnds', 'lon_bnds', 'shape_mask', 'time', 'time_bnds'}
+
+
+class GridDataset:
+    """Una malla lat/lon de un archivo timeAvgMap, abierta de forma perezosa"""
+
+    def __init__(self, path, variable=None, convert_units=True, tile_cache=None):
+        """
+        Args:
+            path: ruta del .nc
+            variable: variable de la app ('temperatura', ...) para conversión de unidades
+            convert_units: aplicar las mismas conversiones que el procesador de CSVs
+            tile_cache: TileCache para los chunks (por defecto la compartida)
+        """
+        self.path = path
+        self.variable = variable
+        self.scale = UNIT_SCALE.get(variable, 1.0) if convert_units else 1.0
+        self.tile_cache = tile_cache if tile_cache is not None else DEFAULT_TILE_CACHE
+
+        self._nc = None
+        self._lock = threading.Lock()
+
+        # Se llenan al abrir
+        self.field_name = None
+        self.lat = None
+        self.lon = None
+        self.lat_bounds = None
+        self.lon_bounds = None
+        self.fill_values = ()
+        self.units = None
+        self.shape = None
+        self.dtype = None
+        self.chunks = None
+        self.start_date = None
+        self.end_date = None
+
+    # ------------------------------------------------------------------
+    # Apertura perezosa
+    # ------------------------------------------------------------------
+    def open(self):
+        """Abre el archivo y lee SOLO los ejes (idempotente)"""
+        if self._nc is not None:
+            return self
+
+        if netCDF4 is None:
+            raise ImportError("Se requiere netCDF4 para leer mallas (.nc): pip install netCDF4")
+
+        with self._lock:
+            if self._nc is not None:
+                return self
+
+            nc = netCDF4.Dataset(self.path, 'r')
+            field_name = self._find_field(nc)
+            var = nc.variables[field_name]
+            var.set_auto_maskandscale(False)
+
+            self.field_name = field_name
+            self.lat = np.asarray(nc.variables['lat'][:], dtype=np.float64)
+            self.lon = np.asarray(nc.variables['lon'][:], dtype=np.float64)
+            self.lat_bounds = self._read_bounds(nc, 'lat_bnds', self.lat)
+            self.lon_bounds = self._read_bounds(nc, 'lon_bnds', self.lon)
+            self.fill_values = tuple(
+                float(getattr(var, attr)) for attr in ('_FillValue', 'missing_value')
+                if attr in var.ncattrs()
+            )
+            self.units = getattr(var, 'units', None)
+            self.shape = var.shape
+            self.dtype = var.dtype
+            chunking = var.chunking()
+            self.chunks = tuple(chunking) if isinstance(chunking, list) else var.shape
+
+            # Periodo promediado (lo que pidió el usuario en GIOVANNI)
+            self.start_date = getattr(nc, 'userstartdate', getattr(nc, 'start_time', None))
+            self.end_date = getattr(nc, 'userenddate', getattr(nc, 'end_time', None))
+
+            self._nc = nc
+
+        return self
+
+    def close(self):
+        with self._lock:
+            if self._nc is not None:
+                self._nc.close()
+                self._nc = None
+
+    @staticmethod
+    def _find_field(nc):
+        """Primer campo 2-D (lat, lon) que no sea auxiliar"""
+        for name, var in nc.variables.items():
+            if name in AUXILIARY_VARIABLES:
+                continue
+            if var.dimensions[-2:] == ('lat', 'lon'):
+                return name
+        raise ValueError("El archivo no tiene un campo (lat, lon)")
+
+    @staticmethod
+    def _read_bounds(nc, name, centers):
+        """Límites de celda; si no vienen, se calculan a media distancia"""
+        if name in nc.variables:
+            return np.asarray(nc.variables[name][:], dtype=np.float64)
+        return GridDataset._bounds_from_centers(centers)
+
+    @staticmethod
+    def _bounds_from_centers(centers):
+        half = np.diff(centers) / 2
+        edges = np.concatenate([[centers[0] - half[0]], centers[:-1] + half, [centers[-1] + half[-1]]])
+        return np.column_stack([edges[:-1], edges[1:]])
+
+    # ------------------------------------------------------------------
+    # Lecturas
+    # ------------------------------------------------------------------
+    def _has_variable(self, name):
+        return name in self._nc.variables
+
+    def _chunk_shape(self, name):
+        """Forma de chunk de una variable (la malla entera si es contigua)"""
+        var = self._nc.variables[name]
+        chunking = var.chunking()
+        return tuple(chunking) if isinstance(chunking, list) else var.shape
+
+    def _load_tile(self, name, ci, cj, chunk_shape):
+        """Lee y limpia UN chunk (relleno → NaN en el campo de datos)"""
+        ch_i, ch_j = chunk_shape
+        with self._lock:
+            var = self._nc.variables[name]
+            var.set_auto_maskandscale(False)
+            raw = var[ci * ch_i:(ci + 1) * ch_i, cj * ch_j:(cj + 1) * ch_j]
+
+        values = np.array(raw, dtype=np.float64)
+        if name == self.field_name:
+            for fill in self.fill_values:
+                values[values == fill] = np.nan
+        return values
+
+    def _read_tiled(self, name, i0, i1, j0, j1):
+        """Arma la ventana [i0:i1, j0:j1] con los chunks de la caché"""
+        out = np.empty((max(i1 - i0, 0), max(j1 - j0, 0)), dtype=np.float64)
+        if out.size == 0:
+            return out
+
+        chunk_shape = self._chunk_shape(name)
+        ch_i, ch_j = chunk_shape
+
+        for ci in range(i0 // ch_i, (i1 - 1) // ch_i + 1):
+            for cj in range(j0 // ch_j, (j1 - 1) // ch_j + 1):
+                tile = self.tile_cache.get(
+                    (self.path, name, (ci, cj)),
+                    lambda ci=ci, cj=cj: self._load_tile(name, ci, cj, chunk_shape)
+                )
+
+                # Intersección del chunk con la ventana pedida
+                ti0, tj0 = ci * ch_i, cj * ch_j
+                a0, a1 = max(i0, ti0), min(i1, ti0 + tile.shape[0])
+                b0, b1 = max(j0, tj0), min(j1, tj0 + tile.shape[1])
+                out[a0 - i0:a1 - i0, b0 - j0:b1 - j0] = tile[a0 - ti0:a1 - ti0, b0 - tj0:b1 - tj0]
+
+        return out
+
+    def read_window(self, i0, i1, j0, j1):
+        """
+        Lee el bloque [i0:i1, j0:j1] (índices de lat, lon)
+
+        Returns:
+            ndarray float64 con NaN en celdas sin dato
+        """
+        self.open()
+        values = self._read_tiled(self.field_name, i0, i1, j0, j1)
+        if self.scale != 1.0:
+            values *= self.scale
+        return values
+
+    def read_all(self):
+        """Lee la malla completa (solo para procesos batch)"""
+        self.open()
+        return self.read_window(0, self.shape[0], 0, self.shape[1])
+
+    def cell_index(self, lat, lon):
+        """
+        Celda más cercana a (lat, lon); acepta escalares o arreglos
+
+        Returns:
+            (i, j) índices enteros, o -1 fuera de la malla
+        """
+        self.open()
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+
+        i = self._axis_index(self.lat, self.lat_bounds, lat)
+        j = self._axis_index(self.lon, self.lon_bounds, lon)
+        return i, j
+
+    @staticmethod
+    def _axis_index(centers, bounds, coords):
+        """Índice de la celda que contiene cada coordenada (eje regular)"""
+        step = centers[1] - centers[0]
+        index = np.floor((coords - bounds[0, 0]) / step).astype(np.int64)
+        outside = (coords < bounds[:, 0].min()) | (coords > bounds[:, 1].max())
+        index = np.clip(index, 0, len(centers) - 1)
+        return np.where(outside, -1, index)
+
+    def value_at(self, lat, lon):
+        """Valor de la celda que contiene (lat, lon); NaN fuera de la malla"""
+        i, j = self.cell_index(lat, lon)
+        if i < 0 or j < 0:
+            return float('nan')
+        return float(self.read_window(int(i), int(i) + 1, int(j), int(j) + 1)[0, 0])
+
+    def window(self, south, north, west, east):
+        """
+        Celdas cuyo centro cae dentro de la caja
+
+        Returns:
+            (lats, lons, values) — solo se leen los chunks de la caja
+        """
+        self.open()
+        i_sel = np.nonzero((self.lat >= south) & (self.lat <= north))[0]
+        j_sel = np.nonzero((self.lon >= west) & (self.lon <= east))[0]
+
+        if len(i_sel) == 0 or len(j_sel) == 0:
+            empty = np.empty((len(i_sel), len(j_sel)))
+            return self.lat[i_sel], self.lon[j_sel], empty
+
+        i0, i1 = int(i_sel[0]), int(i_sel[-1]) + 1
+        j0, j1 = int(j_sel[0]), int(j_sel[-1]) + 1
+        return self.lat[i0:i1], self.lon[j0:j1], self.read_window(i0, i1, j0, j1)
+
+    def sample(self, lats, lons, method='nearest'):
+        """
+        Valores en muchos puntos en una sola pasada vectorizada
+
+        Args:
+            lats, lons: arreglos (o escalares) de coordenadas
+            method: 'nearest' (celda que contiene el punto) o 'bilinear'
+                    (interpolación entre los 4 centros vecinos)
+
+        Returns:
+            ndarray float64 con la forma de lats; NaN fuera de la malla.
+            En bilinear, los vecinos sin dato (ej: mar) se ignoran y los
+            pesos se renormalizan con los que sí tienen dato.
+        """
+        if method not in ('nearest', 'bilinear'):
+            raise ValueError(f"Método no soportado: {method}")
+
+        self.open()
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        lats, lons = np.broadcast_arrays(lats, lons)
+        shape = lats.shape
+        lats = lats.ravel()
+        lons = lons.ravel()
+
+        result = np.full(lats.shape, np.nan)
+        i, j = self.cell_index(lats, lons)
+        inside = (i >= 0) & (j >= 0)
+        if not inside.any():
+            return result.reshape(shape)
+
+        if method == 'nearest':
+            i, j = i[inside], j[inside]
+            # Solo se lee la ventana que cubre los puntos
+            i0, i1 = int(i.min()), int(i.max()) + 1
+            j0, j1 = int(j.min()), int(j.max()) + 1
+            block = self.read_window(i0, i1, j0, j1)
+            result[inside] = block[i - i0, j - j0]
+            return result.reshape(shape)
+
+        # Bilinear: posición fraccional respecto a los centros de celda
+        fi, ti = self._fractional_index(self.lat, lats[inside])
+        fj, tj = self._fractional_index(self.lon, lons[inside])
+
+        i0, i1 = int(fi.min()), int(fi.max()) + 2
+        j0, j1 = int(fj.min()), int(fj.max()) + 2
+        block = self.read_window(i0, i1, j0, j1)
+        fi -= i0
+        fj -= j0
+
+        corners = np.stack([
+            block[fi, fj],
+            block[fi, fj + 1],
+            block[fi + 1, fj],
+            block[fi + 1, fj + 1]
+        ])
+        weights = np.stack([
+            (1 - ti) * (1 - tj),
+            (1 - ti) * tj,
+            ti * (1 - tj),
+            ti * tj
+        ])
+
+        valid = ~np.isnan(corners)
+        weights = np.where(valid, weights, 0.0)
+        total = weights.sum(axis=0)
+        weighted = np.where(valid, corners, 0.0) * weights
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = weighted.sum(axis=0) / total
+        values[total == 0] = np.nan
+
+        result[inside] = values
+        return result.reshape(shape)
+
+    @staticmethod
+    def _fractional_index(centers, coords):
+        """
+        Índice del centro inferior y fracción [0, 1] hacia el siguiente
+
+        Entre el último centro y el borde de la malla se usa el valor del
+        borde (fracción recortada), no se extrapola.
+        """
+        step = centers[1] - centers[0]
+        position = (coords - centers[0]) / step
+        index = np.clip(np.floor(position).astype(np.int64), 0, len(centers) - 2)
+        fraction = np.clip(position - index, 0.0, 1.0)
+        return index, fraction
+
+    def mask(self):
+        """Máscara booleana de celdas válidas (ej: dentro de México)"""
+        self.open()
+        if self._has_variable('shape_mask'):
+            return self._read_tiled('shape_mask', 0, self.shape[0], 0, self.shape[1]) != 0
+        return ~np.isnan(self.read_all())
+
+
+def find_grid_files(raw_folder='data/raw'):
+    """
+    Archivos timeAvgMap por variable (según el sufijo '-<variable>.nc')
+
+    Returns:
+        dict {variable: ruta}
+    """
+    files = {}
+    for path in sorted(glob.glob(os.path.join(raw_folder, 'g4.timeAvgMap.*.nc'))):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        suffix = stem.rsplit('-', 1)[-1].lower()
+        if suffix in GRID_VARIABLES:
+            files[suffix] = path
+    return files
+
+
+def open_grids(raw_folder='data/raw', convert_units=True, tile_cache=None):
+    """
+    GridDataset perezoso por variable (no lee nada hasta la primera consulta)
+
+    Returns:
+        dict {variable: GridDataset}
+    """
+    return {
+        variable: GridDataset(path, variable=variable, convert_units=convert_units,
+                              tile_cache=tile_cache)
+        for variable, path in find_grid_files(raw_folder).items()
+    }
+
+
+class ClimateGrids:
+    """Todas las mallas de data/raw con una API de muestreo por variable"""
+
+    def __init__(self, raw_folder='data/raw', convert_units=True, tile_cache=None, store_folder=None):
+        """
+        Args:
+            raw_folder: carpeta con los .nc
+            store_folder: almacén por chunks (python -m data.chunk_store); las
+                          variables convertidas se leen de ahí y el resto del .nc
+        """
+        self.raw_folder = raw_folder
+        self.tile_cache = tile_cache if tile_cache is not None else DEFAULT_TILE_CACHE
+        self.grids = open_grids(raw_folder, convert_units=convert_units, tile_cache=self.tile_cache)
+
+        if store_folder:
+            from data.chunk_store import open_store_grids
+            self.grids.update(open_store_grids(store_folder, convert_units=convert_units,
+                                               tile_cache=self.tile_cache))
+
+    @property
+    def variables(self):
+        return list(self.grids)
+
+    def get(self, variable):
+        """GridDataset de una variable (KeyError si no hay malla)"""
+        if variable not in self.grids:
+            raise KeyError(f"No hay malla para '{variable}' en {self.raw_folder}")
+        return self.grids[variable]
+
+    def sample(self, lats, lons, variable, method='nearest'):
+        """
+        Muestrea una variable en muchos puntos (ver GridDataset.sample)
+
+        Ejemplo:
+            grids = ClimateGrids()
+            temps = grids.sample(lats, lons, 'temperatura', method='bilinear')
+        """
+        return self.get(variable).sample(lats, lons, method=method)
+
+    def cache_stats(self):
+        """Aciertos/fallos de la caché de chunks"""
+        return self.tile_cache.stats()
+
+    def close(self):
+        for grid in self.grids.values():
+            grid.close()
+
+
+# PRUEBA
+if __name__ == "__main__":
+    print("\n🧪 PROBANDO GRID READER")
+    print("=" * 70)
+
+    grids = open_grids()
+    for variable, grid in grids.items():
+        grid.open()
+        value = grid.value_at(19.43, -99.13)
+        print(f"🗺️ {variable}: malla {grid.shape} chunks {grid.chunks} [{grid.units}] "
+              f"→ CDMX: {value:.3f}")
+
+    # Benchmark: 10^5 puntos aleatorios sobre México
+    import time
+
+    climate_grids = ClimateGrids()
+    rng = np.random.default_rng(0)
+    n_points = 100_000
+    lats = rng.uniform(14.5, 32.7, n_points)
+    lons = rng.uniform(-118.4, -86.7, n_points)
+
+    print(f"\n⏱️ sample() con {n_points:,} puntos")
+    for variable in climate_grids.variables:
+        for method in ('nearest', 'bilinear'):
+            started = time.perf_counter()
+            values = climate_grids.sample(lats, lons, variable, method=method)
+            elapsed = (time.perf_counter() - started) * 1000
+            valid = np.count_nonzero(~np.isnan(values))
+            print(f"   {variable:<14} {method:<9} {elapsed:7.1f} ms ({valid:,} con dato)")
+
+    stats = climate_grids.cache_stats()
+    print(f"\n📦 Caché de chunks: {stats['tiles']} bloques, {stats['bytes'] / 1024:.0f} KB, "
+          f"{stats['hits']} aciertos / {stats['misses']} fallos")
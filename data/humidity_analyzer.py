@@ -9,6 +9,8 @@ Requiere datos de temperatura para la conversión.
 import numpy as np
 from datetime import datetime
 
+from data.station_interpolation import point_stations
+
 class HumidityAnalyzer:
     """Analiza y convierte datos de humedad"""
     
@@ -37,26 +39,18 @@ class HumidityAnalyzer:
         
         # Constantes
         e0 = 611  # Pa
-        Rv = 461.5  # J/(kg·K)
-        
-        # Arrays de salida
-        rh_values = np.zeros(len(q_values))
-        
-        for i in range(len(q_values)):
-            q = q_values[i]
-            T = temp_values[i]
-            
-            # Presión de vapor actual
-            e = (q * pressure) / (0.622 + q)
-            
-            # Presión de vapor de saturación (ecuación de Magnus)
-            es = e0 * np.exp((17.27 * T) / (T + 237.3))
-            
-            # Humedad relativa
-            rh = (e / es) * 100
-            
-            # Limitar a 0-100%
-            rh_values[i] = np.clip(rh, 0, 100)
+        
+        q = np.asarray(q_values, dtype=np.float64)
+        T = np.asarray(temp_values, dtype=np.float64)
+        
+        # Presión de vapor actual
+        e = (q * pressure) / (0.622 + q)
+        
+        # Presión de vapor de saturación (ecuación de Magnus)
+        es = e0 * np.exp((17.27 * T) / (T + 237.3))
+        
+        # Humedad relativa limitada a 0-100%
+        rh_values = np.clip((e / es) * 100, 0, 100)
         
         return rh_values
     
@@ -158,22 +152,36 @@ class HumidityAnalyzer:
         return message
 
 
-def integrate_humidity_with_processor(processor, humidity_analyzer, lat, lon, month, day):
-    """Integra analizador de humedad con procesador"""
-    # Obtener humedad específica
-    humidity_values, city_name = processor.get_historical_data(
-        lat, lon, 'humedad', month, day
-    )
+def integrate_humidity_with_processor(processor, humidity_analyzer, lat, lon, month, day, interpolation=None):
+    """Integra analizador de humedad con procesador (interpolation: ver integrate_wind_with_processor)"""
+    options = {} if interpolation is None else {'interpolation': interpolation}
     
-    # Obtener temperatura (necesaria para conversión)
-    temp_values, _ = processor.get_historical_data(
-        lat, lon, 'temperatura', month, day
-    )
+    if hasattr(processor, 'get_aligned_data'):
+        # Humedad y temperatura del MISMO año (un solo slice)
+        aligned, city_name = processor.get_aligned_data(
+            lat, lon, ['humedad', 'temperatura'], month, **options
+        )
+        
+        if aligned is None:
+            return None
+        
+        humidity_values, temp_values = aligned
+    else:
+        # Obtener humedad específica
+        humidity_values, city_name = processor.get_historical_data(
+            lat, lon, 'humedad', month, day, **options
+        )
+        
+        # Obtener temperatura (necesaria para conversión)
+        temp_values, _ = processor.get_historical_data(
+            lat, lon, 'temperatura', month, day, **options
+        )
     
     if humidity_values is None or temp_values is None:
         return None
     
-    city_key = processor.find_nearest_city(lat, lon)[0]
+    city_weights = point_stations(processor, lat, lon, ['humedad', 'temperatura'], interpolation)
+    city_key = next(iter(city_weights), None)
     date = datetime(2024, month, day)
     
     analysis = humidity_analyzer.analyze_monthly_data(
@@ -183,5 +191,6 @@ def integrate_humidity_with_processor(processor, humidity_analyzer, lat, lon, mo
     if analysis:
         analysis['message'] = humidity_analyzer.get_humidity_message(analysis, date)
         analysis['city_name'] = city_name
+        analysis['interpolated'] = len(city_weights) > 1
     
     return analysis
\ No newline at end of file
@@ -0,0 +1,306 @@
+# data/place_index.py
+"""
+Índice de Lugares para Autocompletar
+====================================
+Búsqueda por prefijo, sin acentos ni mayúsculas, sobre TODOS los lugares
+conocidos (CIUDADES_NASA, las ciudades de MEXICAN_CLIMATE_ZONES y, si se
+carga, un nomenclátor como las localidades del INEGI).
+
+POR QUÉ EXISTE:
+- El sidebar solo ofrecía las 5 claves de CIUDADES_NASA aunque
+  config/settings.py ya tiene decenas de lugares con coordenadas y altitud
+  (Nevado de Toluca, Creel, Arteaga...)
+- Con decenas de miles de localidades, recorrer la lista por cada tecla no
+  escala; con un arreglo ordenado + bisect cada consulta es O(log n)
+
+CÓMO FUNCIONA:
+- Cada lugar genera una llave por cada palabra desde la que se puede
+  empezar a escribir: "Nevado de Toluca" → "nevado de toluca",
+  "de toluca", "toluca"
+- Las llaves se normalizan (sin acentos, minúsculas, espacios simples) y se
+  guardan en arreglos ordenados; una consulta busca con bisect el primer
+  elemento >= prefijo y avanza mientras siga empezando con el prefijo
+- Hay un arreglo por tipo de llave y fuente: primero salen los lugares
+  cuyo NOMBRE empieza con el prefijo (CIUDADES_NASA, zonas, nomenclátor),
+  después los que lo tienen en otra palabra
+
+NOMENCLÁTOR (load_gazetteer):
+- CSV/TSV con columnas nombre, estado, lat, lon[, alt]; se aceptan los
+  encabezados del INEGI (NOM_LOC, NOM_ENT, LAT_DECIMAL, LON_DECIMAL, ALTITUD)
+- Sin encabezado, se toman las columnas en ese orden
+"""
+
+import csv
+import os
+import unicodedata
+from bisect import bisect_left
+
+from config.settings import CIUDADES_NASA, MEXICAN_CLIMATE_ZONES
+
+# Orden de preferencia entre fuentes al desempatar
+SOURCE_PRIORITY = {'nasa': 0, 'zona': 1, 'nomenclator': 2}
+
+DEFAULT_LIMIT = 10
+
+# Encabezados aceptados → campo
+GAZETTEER_COLUMNS = {
+    'name': 'name', 'nombre': 'name', 'nom_loc': 'name', 'localidad': 'name',
+    'state': 'state', 'estado': 'state', 'nom_ent': 'state', 'entidad': 'state',
+    'lat': 'lat', 'latitud': 'lat', 'lat_decimal': 'lat', 'latitude': 'lat',
+    'lon': 'lon', 'longitud': 'lon', 'lon_decimal': 'lon', 'longitude': 'lon', 'lng': 'lon',
+    'alt': 'alt', 'altitud': 'alt', 'altitude': 'alt', 'elevacion': 'alt'
+}
+GAZETTEER_ORDER = ('name', 'state', 'lat', 'lon', 'alt')
+
+
+def fold_text(text):
+    """'  Nevado  de TOLUCA ' → 'nevado de toluca' (sin acentos ni mayúsculas)"""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.lower().replace('-', ' ').split())
+
+
+def _word_suffixes(folded):
+    """'nevado de toluca' → ['nevado de toluca', 'de toluca', 'toluca']"""
+    words = folded.split(' ')
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+def known_places():
+    """Lugares de config/settings.py: CIUDADES_NASA y ciudades de cada zona"""
+    places = []
+    for city_key, info in CIUDADES_NASA.items():
+        places.append({
+            'name': info['name'], 'state': info['state'],
+            'lat': info['lat'], 'lon': info['lon'], 'alt': None,
+            'source': 'nasa', 'city_key': city_key,
+            'icon': info['icon'], 'color': info['color'], 'description': info['description']
+        })
+    for zone_key, zone in MEXICAN_CLIMATE_ZONES.items():
+        for city in zone['cities']:
+            places.append({
+                'name': city['name'], 'state': city['state'],
+                'lat': city['lat'], 'lon': city['lon'], 'alt': city.get('alt'),
+                'source': 'zona', 'zone': zone_key,
+                'icon': zone['emoji'], 'color': zone['color'], 'description': zone['nombre']
+            })
+    return places
+
+
+class PlaceIndex:
+    """Arreglos ordenados de llaves normalizadas → lugares"""
+
+    def __init__(self, places=()):
+        self.places = []
+        self._seen = {}
+        # Nombre normalizado → ids de lugar (resolve sin estado, O(1))
+        self._by_name = {}
+        self._groups = []
+        self.add_places(places)
+
+    def __len__(self):
+        return len(self.places)
+
+    def add_places(self, places):
+        """
+        Agrega lugares (dicts con name, state, lat, lon) y reordena el índice
+
+        Un lugar con el mismo nombre y estado que uno existente se ignora
+        (gana la primera fuente: CIUDADES_NASA antes que el nomenclátor).
+
+        Returns:
+            número de lugares nuevos
+        """
+        added = 0
+        for place in places:
+            folded = fold_text(place['name'])
+            if not folded:
+                continue
+            identity = (folded, fold_text(place.get('state') or ''))
+            if identity in self._seen:
+                continue
+            self._seen[identity] = len(self.places)
+            self._by_name.setdefault(folded, []).append(len(self.places))
+            self.places.append(dict(place, folded=folded))
+            added += 1
+
+        if added:
+            self._rebuild()
+        return added
+
+    def _rebuild(self):
+        """Un arreglo ordenado por (tipo de llave, fuente): nombre completo o palabra interna"""
+        groups = {}
+        for place_id, place in enumerate(self.places):
+            tier = SOURCE_PRIORITY.get(place.get('source'), len(SOURCE_PRIORITY))
+            for position, key in enumerate(_word_suffixes(place['folded'])):
+                groups.setdefault((0 if position == 0 else 1, tier), []).append((key, place_id))
+
+        self._groups = []
+        for group in sorted(groups):
+            entries = sorted(groups[group])
+            self._groups.append(([key for key, _ in entries], [place_id for _, place_id in entries]))
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Lugares cuyo nombre (o alguna palabra del nombre) empieza con 'query'
+
+        Orden: primero los que EMPIEZAN con el prefijo, por fuente y en orden
+        alfabético; después los que lo tienen en otra palabra. Se deja de leer
+        al juntar 'limit' lugares, así que el costo casi no depende de
+        cuántos lugares coinciden.
+
+        Returns:
+            lista de dicts de lugar, los mejores primero
+        """
+        prefix = fold_text(query)
+        if not prefix or limit <= 0:
+            return []
+
+        found = []
+        seen = set()
+        for keys, ids in self._groups:
+            position = bisect_left(keys, prefix)
+            while position < len(keys) and keys[position].startswith(prefix):
+                place_id = ids[position]
+                if place_id not in seen:
+                    seen.add(place_id)
+                    found.append(self.places[place_id])
+                    if len(found) == limit:
+                        return found
+                position += 1
+        return found
+
+    def resolve(self, name, state=None):
+        """
+        Lugar con ese nombre exacto (sin acentos); None si no existe
+
+        Sin estado, entre homónimos gana la fuente preferida (el mismo que
+        sale primero en search)
+        """
+        folded = fold_text(name)
+        if state is not None:
+            place_id = self._seen.get((folded, fold_text(state)))
+            return None if place_id is None else self.places[place_id]
+
+        place_ids = self._by_name.get(folded)
+        if not place_ids:
+            return None
+        place_id = min(
+            place_ids,
+            key=lambda i: (SOURCE_PRIORITY.get(self.places[i].get('source'), len(SOURCE_PRIORITY)), i)
+        )
+        return self.places[place_id]
+
+    def load_gazetteer(self, path, source='nomenclator', encoding='utf-8'):
+        """
+        Carga un nomenclátor CSV/TSV (ver encabezado del módulo)
+
+        Las filas sin nombre o con coordenadas inválidas se omiten.
+
+        Returns:
+            número de lugares nuevos
+        """
+        with open(path, 'r', encoding=encoding, errors='replace', newline='') as f:
+            # Separador: el que más aparece en el primer renglón
+            first_line = f.readline()
+            f.seek(0)
+            delimiter = max(',;\t|', key=first_line.count)
+            rows = csv.reader(f, delimiter=delimiter)
+
+            first = next(rows, None)
+            if first is None:
+                return 0
+
+            header = [GAZETTEER_COLUMNS.get(fold_text(column).replace(' ', '_')) for column in first]
+            if 'name' in header and 'lat' in header and 'lon' in header:
+                columns = {field: i for i, field in enumerate(header) if field}
+                pending = rows
+            else:
+                columns = {field: i for i, field in enumerate(GAZETTEER_ORDER)}
+                pending = _chain_first(first, rows)
+
+            return self.add_places(_gazetteer_places(pending, columns, source))
+
+
+def _chain_first(first, rows):
+    yield first
+    yield from rows
+
+
+def _gazetteer_places(rows, columns, source):
+    """Filas del nomenclátor → dicts de lugar (omite las inválidas)"""
+    for row in rows:
+        try:
+            name = row[columns['name']].strip()
+            lat = float(row[columns['lat']])
+            lon = float(row[columns['lon']])
+        except (IndexError, KeyError, ValueError):
+            continue
+        if not name or not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+            continue
+
+        state = row[columns['state']].strip() if 'state' in columns and len(row) > columns['state'] else ''
+        alt = None
+        if 'alt' in columns and len(row) > columns['alt']:
+            try:
+                alt = float(row[columns['alt']])
+            except ValueError:
+                alt = None
+
+        yield {'name': name, 'state': state, 'lat': lat, 'lon': lon, 'alt': alt, 'source': source}
+
+
+def build_place_index(gazetteer_path=None):
+    """Índice con los lugares de settings y, si existe, el nomenclátor"""
+    index = PlaceIndex(known_places())
+    if gazetteer_path and os.path.exists(gazetteer_path):
+        index.load_gazetteer(gazetteer_path)
+    return index
+
+
+# ============================================
+# PRUEBA Y BENCHMARK
+# ============================================
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+
+    print("\n🔎 PROBANDO AUTOCOMPLETAR DE LUGARES")
+    print("=" * 70)
+
+    index = build_place_index(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"📚 {len(index)} lugares")
+
+    for query in ('nev', 'TOLU', 'creel', 'cancun', 'san', 'mérida'):
+        results = index.search(query, limit=5)
+        names = ', '.join(f"{p['name']} ({p['state']})" for p in results)
+        print(f"   '{query}' → {names or 'sin resultados'}")
+
+    # Nomenclátor sintético para medir con decenas de miles de localidades
+    rng = random.Random(3)
+    syllables = ['san', 'ta', 'ma', 'ri', 'a', 'jo', 'se', 'del', 'mon', 'te', 'lo', 'pe', 'chi', 'hua', 'co']
+    synthetic = [
+        {
+            'name': ' '.join(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+                             for _ in range(rng.randint(1, 3))).title(),
+            'state': f"Estado {i % 32}",
+            'lat': rng.uniform(14.5, 32.7), 'lon': rng.uniform(-118, -86.7),
+            'alt': None, 'source': 'nomenclator'
+        }
+        for i in range(50000)
+    ]
+
+    started = time.perf_counter()
+    index.add_places(synthetic)
+    print(f"\n🏗️ +{len(synthetic)} localidades en {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    queries = ['sa', 'mon', 'chihua', 'pe', 'tol', 'josema']
+    started = time.perf_counter()
+    for _ in range(100):
+        for query in queries:
+            index.search(query)
+    per_query = (time.perf_counter() - started) / (100 * len(queries)) * 1000
+    print(f"⚡ Búsqueda: {per_query:.3f} ms por consulta ({len(index)} lugares)")
+    print("=" * 70)
@@ -14,6 +14,8 @@ import numpy as np
 import pandas as pd
 from datetime import datetime
 
+from data.station_interpolation import point_stations
+
 class PrecipitationAnalyzer:
     """
     Transforma precipitación mensual → análisis diario
@@ -59,7 +61,7 @@ class PrecipitationAnalyzer:
             7: 31, 8: 31, 9: 30, 10: 31, 11: 30, 12: 31
         }
     
-    def analyze_monthly_data(self, monthly_precip_values, city_key, month):
+    def analyze_monthly_data(self, monthly_precip_values, city_key, month, city_weights=None):
         """
         FUNCIÓN PRINCIPAL: Analiza datos mensuales y calcula estadísticas diarias
         
@@ -77,6 +79,9 @@ class PrecipitationAnalyzer:
             monthly_precip_values: numpy array con mm mensuales (1 valor por año)
             city_key: 'veracruz', 'cdmx', 'cancun', 'monterrey', 'tijuana'
             month: mes (1-12)
+            city_weights: dict {city_key: peso} si los valores son una mezcla
+                          de ciudades (interpolación); los días lluviosos
+                          esperados se mezclan con los mismos pesos
         
         Returns:
             dict con todas las estadísticas diarias
@@ -104,7 +109,13 @@ class PrecipitationAnalyzer:
         # PASO 2: Días lluviosos según climatología
         # ==========================================
         # De los patrones del SMN, ¿cuántos días llueve en este mes?
-        expected_rainy_days = self.rainy_days_patterns.get(city_key, {}).get(month, 10)
+        if city_weights:
+            expected_rainy_days = sum(
+                weight * self.rainy_days_patterns.get(key, {}).get(month, 10)
+                for key, weight in city_weights.items()
+            ) / sum(city_weights.values())
+        else:
+            expected_rainy_days = self.rainy_days_patterns.get(city_key, {}).get(month, 10)
         total_days = self.days_in_month[month]
         
         # ==========================================
@@ -246,7 +257,7 @@ class PrecipitationAnalyzer:
 # ============================================
 # FUNCIÓN DE INTEGRACIÓN
 # ============================================
-def integrate_with_processor(processor, precipitation_analyzer, lat, lon, month, day):
+def integrate_with_processor(processor, precipitation_analyzer, lat, lon, month, day, interpolation=None):
     """
     FUNCIÓN PUENTE: Conecta tu procesador existente con el analizador nuevo
     
@@ -260,26 +271,31 @@ def integrate_with_processor(processor, precipitation_analyzer, lat, lon, month,
         precipitation_analyzer: instancia de PrecipitationAnalyzer
         lat, lon: coordenadas
         month, day: fecha
+        interpolation: None (la del procesador), 'nearest', 'idw' o 'gaussian'
     
     Returns:
-        dict con análisis completo listo para mostrar
+        dict con análisis completo listo para mostrar ('interpolated' es
+        True si los valores son una mezcla de ciudades)
     """
+    options = {} if interpolation is None else {'interpolation': interpolation}
+    
     # 1. Obtener datos mensuales históricos de tu procesador
     precip_values, city_name = processor.get_historical_data(
-        lat, lon, 'precipitacion', month, day
+        lat, lon, 'precipitacion', month, day, **options
     )
     
     if precip_values is None:
         return None
     
-    # 2. Determinar qué ciudad es
-    city_key = processor.find_nearest_city(lat, lon)[0]
+    # 2. Ciudades (y pesos) de las que salieron esos valores
+    city_weights = point_stations(processor, lat, lon, ['precipitacion'], interpolation)
+    city_key = next(iter(city_weights), None)
     
     # 3. Analizar con el nuevo analizador
     date = datetime(2024, month, day)
     
     analysis = precipitation_analyzer.analyze_monthly_data(
-        precip_values, city_key, month
+        precip_values, city_key, month, city_weights=city_weights
     )
     
     # 4. Agregar mensaje y nombre de ciudad
@@ -288,6 +304,7 @@ def integrate_with_processor(processor, precipitation_analyzer, lat, lon, month,
             analysis, date
         )
         analysis['city_name'] = city_name
+        analysis['interpolated'] = len(city_weights) > 1
     
     return analysis
 
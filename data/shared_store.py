@@ -0,0 +1,228 @@
+# data/shared_store.py
+"""
+Almacén Compartido entre Procesos
+=================================
+Publica el ClimateCube en un archivo .npy mapeado en memoria más un pequeño
+descriptor JSON. Otros procesos (réplicas de Streamlit en la misma máquina)
+se "adjuntan" sin copiar: todos leen las mismas páginas del caché del
+sistema operativo.
+
+POR QUÉ EXISTE:
+- @st.cache_resource guarda un procesador por proceso de Python
+- Con varias réplicas detrás de un balanceador, cada una parseaba y guardaba
+  su propia copia de los datos
+- Con el archivo mapeado, la memoria se mantiene plana al agregar réplicas
+
+POR QUÉ UN ARCHIVO Y NO multiprocessing.shared_memory:
+- El segmento sobrevive a reinicios de réplicas (no depende del proceso que
+  lo creó ni del resource_tracker)
+- np.load(mmap_mode='r') da un arreglo de solo lectura sin copias
+
+VARIAS RÉPLICAS PUBLICANDO A LA VEZ:
+- Solo publica quien crea el candado {name}.lock (O_CREAT | O_EXCL); las
+  demás esperan y usan lo que esa réplica publicó
+- Los temporales llevan el pid, así que dos escrituras nunca comparten
+  archivo; un candado más viejo que PUBLISH_LOCK_STALE_SECONDS se considera
+  de un proceso que murió y se reemplaza
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from data.climate_cube import ClimateCube
+
+# Subir este número si cambia el formato del descriptor
+SHARED_STORE_VERSION = 1
+
+# Espera máxima por otra réplica que está publicando, y edad a partir de la
+# cual su candado se considera abandonado
+PUBLISH_WAIT_SECONDS = 120
+PUBLISH_LOCK_STALE_SECONDS = 600
+PUBLISH_POLL_SECONDS = 0.2
+
+
+def _descriptor_path(folder, name):
+    return os.path.join(folder, f"{name}.json")
+
+
+def _source_signatures(source_files):
+    """{ruta: [tamaño, mtime_ns]} de los archivos con los que se armó el cubo"""
+    signatures = {}
+    for path in source_files:
+        stat = os.stat(path)
+        signatures[path] = [stat.st_size, stat.st_mtime_ns]
+    return signatures
+
+
+@contextmanager
+def _publish_lock(folder, name):
+    """
+    Candado de publicación entre procesos
+
+    Yields:
+        True si este proceso tiene el candado; False si otra réplica lo
+        tuvo durante toda la espera
+    """
+    lock_path = os.path.join(folder, f"{name}.lock")
+    deadline = time.monotonic() + PUBLISH_WAIT_SECONDS
+    acquired = False
+
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale = time.time() - os.path.getmtime(lock_path) > PUBLISH_LOCK_STALE_SECONDS
+            except OSError:
+                continue  # se liberó entre os.open y getmtime
+            if stale:
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+                continue
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(PUBLISH_POLL_SECONDS)
+        else:
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+            acquired = True
+            break
+
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+
+def publish_cube(cube, source_files, records, folder='data/cache/shared', name='climate_cube'):
+    """
+    Escribe el cubo como .npy + descriptor JSON (escritura atómica)
+
+    Si otra réplica está publicando, espera a que termine y devuelve su
+    descriptor en lugar de escribir otra vez.
+
+    Args:
+        cube: ClimateCube ya cargado
+        source_files: rutas de los CSV usados (para detectar datos viejos)
+        records: dict {'ciudad/variable': número de registros}
+        folder: carpeta compartida por las réplicas
+        name: nombre base de los archivos
+
+    Returns:
+        dict descriptor, o None si otra réplica tiene el candado y no
+        publicó nada vigente a tiempo
+    """
+    os.makedirs(folder, exist_ok=True)
+
+    with _publish_lock(folder, name) as acquired:
+        if not acquired:
+            return read_descriptor(folder, name)
+
+        # Otra réplica pudo publicar los mismos CSV mientras esperábamos
+        current = read_descriptor(folder, name)
+        if current is not None and current['sources'] == _source_signatures(source_files):
+            return current
+
+        return _write_cube(cube, source_files, records, folder, name)
+
+
+def _write_cube(cube, source_files, records, folder, name):
+    """Escribe .npy y descriptor con temporales propios del proceso"""
+    suffix = f".{os.getpid()}.tmp"
+
+    array_path = os.path.join(folder, f"{name}.npy")
+    tmp_array = os.path.join(folder, f"{name}{suffix}.npy")
+    values, first_year = cube.layout()
+    np.save(tmp_array, np.ascontiguousarray(values))
+    os.replace(tmp_array, array_path)
+
+    descriptor = {
+        'version': SHARED_STORE_VERSION,
+        'array': os.path.basename(array_path),
+        'shape': list(values.shape),
+        'dtype': str(values.dtype),
+        'city_keys': cube.city_keys,
+        'variables': cube.variables,
+        'first_year': first_year,
+        'last_year': None if first_year is None else first_year + values.shape[2] - 1,
+        'records': records,
+        'sources': _source_signatures(source_files)
+    }
+
+    descriptor_path = _descriptor_path(folder, name)
+    tmp_descriptor = descriptor_path + suffix
+    with open(tmp_descriptor, 'w', encoding='utf-8') as f:
+        json.dump(descriptor, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_descriptor, descriptor_path)
+
+    return descriptor
+
+
+def read_descriptor(folder='data/cache/shared', name='climate_cube'):
+    """
+    Lee el descriptor si existe y sigue vigente
+
+    Returns:
+        dict descriptor o None si falta, es de otra versión o los CSV cambiaron
+    """
+    descriptor_path = _descriptor_path(folder, name)
+
+    if not os.path.exists(descriptor_path):
+        return None
+
+    try:
+        with open(descriptor_path, 'r', encoding='utf-8') as f:
+            descriptor = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if descriptor.get('version') != SHARED_STORE_VERSION:
+        return None
+
+    for path, signature in descriptor['sources'].items():
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        if [stat.st_size, stat.st_mtime_ns] != signature:
+            return None
+
+    return descriptor
+
+
+def attach_cube(folder='data/cache/shared', name='climate_cube'):
+    """
+    Se adjunta (sin copiar) al cubo publicado por otro proceso
+
+    Returns:
+        (ClimateCube de solo lectura, descriptor) o (None, None)
+    """
+    descriptor = read_descriptor(folder, name)
+    if descriptor is None:
+        return None, None
+
+    array_path = os.path.join(folder, descriptor['array'])
+    try:
+        values = np.load(array_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None, None
+
+    if list(values.shape) != descriptor['shape'] or str(values.dtype) != descriptor['dtype']:
+        return None, None
+
+    cube = ClimateCube.from_array(
+        values,
+        descriptor['city_keys'],
+        descriptor['variables'],
+        descriptor['first_year']
+    )
+    return cube, descriptor
@@ -0,0 +1,200 @@
+# data/snapshot.py
+"""
+Snapshot de Arranque
+====================
+Serializa en UN archivo versionado el estado listo para servir:
+- CSVProcessorOptimized con todos los arreglos cargados y agrupados por mes
+- Analizadores (precipitación, viento, humedad, nubosidad) con sus tablas
+  precalculadas, como rainy_days_patterns
+
+POR QUÉ EXISTE:
+- Un arranque en frío construye el procesador y cuatro analizadores
+- Con el snapshot, init_processor() restaura todo con un solo pickle.load
+
+CUÁNDO SE DESCARTA:
+- Si cambió SNAPSHOT_VERSION
+- Si cambió el código de los módulos de datos o config/settings.py (hash
+  de los .py)
+- Si cambiaron los CSVs (tamaño/mtime de cada archivo del catálogo)
+- Si la configuración pedida al restaurar (ej: DATA_CONFIG['interpolation'],
+  que también viene de NASA_INTERPOLATION) no es con la que se guardó
+En cualquiera de esos casos se vuelve a la carga completa.
+
+USO:
+    python -m data.snapshot        # genera data/cache/snapshot.pkl
+"""
+
+import hashlib
+import os
+import pickle
+import time
+
+from data.csv_catalog import build_catalog
+
+# Subir este número si cambia el contenido del snapshot
+SNAPSHOT_VERSION = 2
+
+# Módulos cuyo código define el estado guardado
+SNAPSHOT_MODULES = [
+    'config/settings.py',
+    'data/csv_processor_optimized.py',
+    'data/climate_cube.py',
+    'data/csv_cache.py',
+    'data/csv_catalog.py',
+    'data/giovanni_reader.py',
+    'data/precipitation_analyzer.py',
+    'data/wind_analyzer.py',
+    'data/humidity_analyzer.py',
+    'data/cloudiness_analyzer.py',
+    'data/spatial_index.py',
+    'data/station_interpolation.py',
+    'data/bbox_index.py'
+]
+
+
+def code_fingerprint(modules=SNAPSHOT_MODULES):
+    """SHA-1 del código de los módulos que definen el estado"""
+    sha = hashlib.sha1()
+    for path in modules:
+        sha.update(path.encode('utf-8'))
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                sha.update(f.read())
+    return sha.hexdigest()
+
+
+def data_fingerprint(csv_folder):
+    """SHA-1 de nombre, tamaño y mtime de cada CSV del catálogo"""
+    catalog = build_catalog(csv_folder, read_metadata=False)
+    sha = hashlib.sha1()
+    for key in sorted(catalog):
+        entry = catalog[key]
+        sha.update(f"{entry['filename']}:{entry['size']}:{entry['mtime_ns']}".encode('utf-8'))
+    return sha.hexdigest()
+
+
+def processor_settings(processor):
+    """Opciones del procesador que cambian lo que sirve (se comparan al restaurar)"""
+    return {
+        'interpolation': processor.interpolation,
+        'interpolation_k': processor.interpolation_k
+    }
+
+
+def save_snapshot(path, processor, analyzers):
+    """
+    Guarda el procesador (cargado por completo) y los analizadores
+
+    Args:
+        path: archivo de salida (.pkl)
+        processor: CSVProcessorOptimized
+        analyzers: dict {nombre: analizador}
+
+    Returns:
+        ruta del snapshot
+    """
+    if processor.lazy:
+        processor.preload()
+
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'code_hash': code_fingerprint(),
+        'data_hash': data_fingerprint(processor.csv_folder),
+        'settings': processor_settings(processor),
+        'created': time.time(),
+        'processor': processor,
+        'analyzers': analyzers
+    }
+
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def load_snapshot(path, csv_folder='data/csv', settings=None):
+    """
+    Restaura el snapshot si sigue vigente
+
+    Args:
+        path: archivo del snapshot
+        csv_folder: carpeta de los CSV (para la huella de datos)
+        settings: dict con las opciones esperadas (ver processor_settings);
+                  si alguna difiere de la guardada, el snapshot se descarta
+
+    Returns:
+        dict {'processor', 'analyzers', ...} o None si falta o está viejo
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except Exception:
+        return None
+
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+
+    if snapshot.get('code_hash') != code_fingerprint():
+        return None
+
+    if snapshot.get('data_hash') != data_fingerprint(csv_folder):
+        return None
+
+    saved_settings = snapshot.get('settings', {})
+    for key, value in (settings or {}).items():
+        if saved_settings.get(key) != value:
+            return None
+
+    return snapshot
+
+
+# ============================================
+# COMANDO: generar snapshot
+# ============================================
+if __name__ == "__main__":
+    from config.settings import DATA_CONFIG
+    from data.csv_processor_optimized import CSVProcessorOptimized
+    from data.precipitation_analyzer import PrecipitationAnalyzer
+    from data.wind_analyzer import WindAnalyzer
+    from data.humidity_analyzer import HumidityAnalyzer
+    from data.cloudiness_analyzer import CloudinessAnalyzer
+
+    print("\n📸 GENERANDO SNAPSHOT")
+    print("=" * 70)
+
+    processor = CSVProcessorOptimized(storage='cube', interpolation=DATA_CONFIG['interpolation'])
+    processor.load_all_csvs()
+
+    analyzers = {
+        'precipitation': PrecipitationAnalyzer(),
+        'wind': WindAnalyzer(),
+        'humidity': HumidityAnalyzer(),
+        'cloudiness': CloudinessAnalyzer()
+    }
+
+    snapshot_path = DATA_CONFIG['snapshot_path']
+    save_snapshot(snapshot_path, processor, analyzers)
+
+    started = time.perf_counter()
+    restored = load_snapshot(snapshot_path, processor.csv_folder, processor_settings(processor))
+    elapsed = (time.perf_counter() - started) * 1000
+
+    print(f"✅ Snapshot: {snapshot_path} ({os.path.getsize(snapshot_path) / 1024:.1f} KB)")
+    print(f"⚡ Restauración: {elapsed:.1f} ms ({'vigente' if restored else 'INVÁLIDO'})")
+
+    # load_all_csvs ya verificó CSV ↔ malla; el reporte completo sale de la caché
+    try:
+        from data.consistency_check import check_consistency, print_report
+        print_report(check_consistency(processor.csv_folder, cache_folder=processor.cache_folder))
+    except ImportError as e:
+        print(f"⚠️ Sin verificación CSV ↔ malla: {e}")
+    print("=" * 70)
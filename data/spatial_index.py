@@ -0,0 +1,321 @@
+# data/spatial_index.py
+"""
+Índice Espacial de Estaciones (KD-tree sobre la esfera)
+=======================================================
+Responde "¿qué estación está más cerca?" con distancias de gran círculo
+REALES (km), sin recorrer todas las estaciones.
+
+POR QUÉ EXISTE:
+- find_nearest_city recorría todas las ciudades con distancia en grados²:
+  a la latitud de Tijuana (32.5°) un grado de longitud mide ~94 km contra
+  ~111 km de latitud, así que el "más cercano" podía no serlo
+- Con miles de estaciones (ej: localidades o celdas), el recorrido lineal
+  por cada consulta deja de ser barato
+
+CÓMO FUNCIONA:
+- Cada (lat, lon) se convierte en un vector unitario 3-D (x, y, z)
+- En 3-D la distancia euclidiana (cuerda) crece igual que la de gran
+  círculo, así que el vecino más cercano por cuerda es el más cercano en km
+- El árbol parte las estaciones por la mediana del eje de mayor rango;
+  una rama se descarta si el plano de corte está más lejos que el mejor
+  candidato (la distancia al plano nunca excede la cuerda real)
+- Las hojas (LEAF_SIZE estaciones) se evalúan con NumPy vectorizado
+- Para miles de coordenadas a la vez (query_many) no se recorre el árbol:
+  se calculan las cuerdas por bloques con un producto punto
+  (cuerda² = 2 - 2·p·q) y argpartition elige las k menores de cada fila
+
+CONVERSIÓN:
+    cuerda = 2·sen(d / 2R)        d = 2R·asen(cuerda / 2)
+"""
+
+import numpy as np
+
+# Radio medio de la Tierra (IUGG)
+EARTH_RADIUS_KM = 6371.0088
+
+LEAF_SIZE = 16
+
+# Consultas en lote: máximo de distancias (consulta × estación) por bloque
+BATCH_CELLS = 1 << 22
+
+
+def to_unit_vectors(lats, lons):
+    """(lat, lon) en grados → ndarray [n, 3] de vectores unitarios"""
+    lat = np.deg2rad(np.asarray(lats, dtype=np.float64))
+    lon = np.deg2rad(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord):
+    """Cuerda en la esfera unitaria → km de gran círculo"""
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2.0, 0.0, 1.0))
+
+
+def km_to_chord(km):
+    """km de gran círculo → cuerda en la esfera unitaria"""
+    angle = np.minimum(np.asarray(km, dtype=np.float64) / EARTH_RADIUS_KM, np.pi)
+    return 2.0 * np.sin(angle / 2.0)
+
+
+class SphereKDTree:
+    """KD-tree de estaciones (lat, lon) con consultas en km"""
+
+    def __init__(self, lats, lons, keys=None, leaf_size=LEAF_SIZE):
+        """
+        Args:
+            lats, lons: coordenadas de las estaciones (grados)
+            keys: clave de cada estación (por defecto su posición)
+            leaf_size: estaciones por hoja
+        """
+        self.lats = np.asarray(lats, dtype=np.float64).ravel()
+        self.lons = np.asarray(lons, dtype=np.float64).ravel()
+        self.keys = list(keys) if keys is not None else list(range(len(self.lats)))
+        self.leaf_size = max(1, int(leaf_size))
+
+        if len(self.keys) != len(self.lats) or len(self.lats) != len(self.lons):
+            raise ValueError("lats, lons y keys deben tener el mismo largo")
+
+        self.points = to_unit_vectors(self.lats, self.lons)
+
+        # Nodos en arreglos paralelos; las hojas apuntan a un rango de 'order'
+        self.order = np.arange(len(self.lats))
+        self._start, self._end = [], []
+        self._axis, self._split = [], []
+        self._left, self._right = [], []
+
+        if len(self.lats):
+            self._build(0, len(self.lats))
+
+        self._start = np.array(self._start, dtype=np.int64)
+        self._end = np.array(self._end, dtype=np.int64)
+        self._axis = np.array(self._axis, dtype=np.int64)
+        self._split = np.array(self._split, dtype=np.float64)
+        self._left = np.array(self._left, dtype=np.int64)
+        self._right = np.array(self._right, dtype=np.int64)
+
+        # Puntos en el orden del árbol: cada hoja es un bloque contiguo
+        self._sorted_points = self.points[self.order]
+
+    @classmethod
+    def from_places(cls, places, leaf_size=LEAF_SIZE):
+        """Índice de un dict {clave: {'lat', 'lon', ...}} (ej: city_coords)"""
+        keys = list(places.keys())
+        return cls(
+            [places[key]['lat'] for key in keys],
+            [places[key]['lon'] for key in keys],
+            keys=keys,
+            leaf_size=leaf_size
+        )
+
+    def __len__(self):
+        return len(self.keys)
+
+    # ------------------------------------------------------------------
+    # Construcción
+    # ------------------------------------------------------------------
+    def _new_node(self, start, end):
+        self._start.append(start)
+        self._end.append(end)
+        self._axis.append(-1)
+        self._split.append(0.0)
+        self._left.append(-1)
+        self._right.append(-1)
+        return len(self._start) - 1
+
+    def _build(self, start, end):
+        """Construye el subárbol de order[start:end]; devuelve su nodo"""
+        node = self._new_node(start, end)
+        if end - start <= self.leaf_size:
+            return node
+
+        block = self.points[self.order[start:end]]
+        axis = int(np.argmax(block.max(axis=0) - block.min(axis=0)))
+
+        # Mediana por argpartition: a la izquierda los menores del eje
+        mid = (end - start) // 2
+        partition = np.argpartition(block[:, axis], mid)
+        self.order[start:end] = self.order[start:end][partition]
+
+        self._axis[node] = axis
+        self._split[node] = float(self.points[self.order[start + mid], axis])
+        self._left[node] = self._build(start, start + mid)
+        self._right[node] = self._build(start + mid, end)
+        return node
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def _search(self, point, k, max_chord):
+        """
+        Las k estaciones más cercanas a 'point' con cuerda <= max_chord
+
+        Returns:
+            (posiciones en self.keys, cuerdas) ordenadas por distancia
+        """
+        best_idx = np.empty(0, dtype=np.int64)
+        best_chord = np.empty(0, dtype=np.float64)
+        if not len(self.keys):
+            return best_idx, best_chord
+
+        bound = max_chord
+        stack = [0]
+
+        while stack:
+            node = stack.pop()
+            axis = self._axis[node]
+
+            if axis < 0:
+                start, end = self._start[node], self._end[node]
+                chords = np.sqrt(((self._sorted_points[start:end] - point) ** 2).sum(axis=1))
+                keep = chords <= bound
+                if keep.any():
+                    best_idx = np.concatenate([best_idx, self.order[start:end][keep]])
+                    best_chord = np.concatenate([best_chord, chords[keep]])
+                    if len(best_chord) > k:
+                        top = np.argpartition(best_chord, k - 1)[:k]
+                        best_idx, best_chord = best_idx[top], best_chord[top]
+                    if len(best_chord) == k:
+                        bound = min(bound, float(best_chord.max()))
+                continue
+
+            # Primero el lado donde cae el punto; el otro solo si el plano
+            # de corte está más cerca que el peor candidato aceptado
+            gap = point[axis] - self._split[node]
+            near, far = (self._left[node], self._right[node]) if gap < 0 else (self._right[node], self._left[node])
+            if abs(gap) <= bound:
+                stack.append(far)
+            stack.append(near)
+
+        ordering = np.argsort(best_chord, kind='stable')
+        return best_idx[ordering], best_chord[ordering]
+
+    def query(self, lat, lon, k=1):
+        """
+        Las k estaciones más cercanas
+
+        Returns:
+            (claves, distancias en km) ordenadas de la más cercana a la más lejana
+        """
+        k = min(int(k), len(self.keys))
+        if k <= 0:
+            return [], np.empty(0)
+        idx, chords = self._search(to_unit_vectors(lat, lon), k, np.inf)
+        return [self.keys[i] for i in idx], chord_to_km(chords)
+
+    def nearest(self, lat, lon):
+        """(clave, km) de la estación más cercana; (None, inf) si el índice está vacío"""
+        keys, distances = self.query(lat, lon, k=1)
+        if not keys:
+            return None, float('inf')
+        return keys[0], float(distances[0])
+
+    def query_radius(self, lat, lon, radius_km):
+        """
+        Todas las estaciones a radius_km o menos
+
+        Returns:
+            (claves, distancias en km) ordenadas por distancia
+        """
+        idx, chords = self._search(to_unit_vectors(lat, lon), len(self.keys), float(km_to_chord(radius_km)))
+        return [self.keys[i] for i in idx], chord_to_km(chords)
+
+    def query_many(self, lats, lons, k=1, batch_cells=BATCH_CELLS):
+        """
+        Las k estaciones más cercanas a CADA coordenada, en una llamada
+
+        Args:
+            lats, lons: arreglos de coordenadas (misma forma)
+            k: vecinos por coordenada
+            batch_cells: tamaño del bloque (consultas × estaciones) para
+                         acotar la memoria
+
+        Returns:
+            (índices en self.keys, distancias en km): forma [..., k], o la
+            forma de lats si k == 1; ordenados del más cercano al más lejano
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        shape = np.broadcast_shapes(lats.shape, lons.shape)
+        queries = to_unit_vectors(np.broadcast_to(lats, shape).ravel(), np.broadcast_to(lons, shape).ravel())
+
+        n_stations = len(self.keys)
+        k_eff = min(int(k), n_stations)
+        indices = np.full((len(queries), int(k)), -1, dtype=np.int64)
+        chords = np.full((len(queries), int(k)), np.inf)
+
+        if k_eff > 0:
+            rows = max(1, int(batch_cells) // n_stations)
+            for start in range(0, len(queries), rows):
+                block = queries[start:start + rows]
+                squared = np.maximum(2.0 - 2.0 * (block @ self.points.T), 0.0)
+
+                if k_eff < n_stations:
+                    top = np.argpartition(squared, k_eff - 1, axis=1)[:, :k_eff]
+                else:
+                    top = np.broadcast_to(np.arange(n_stations), (len(block), n_stations))
+                top_squared = np.take_along_axis(squared, top, axis=1)
+
+                ordering = np.argsort(top_squared, axis=1, kind='stable')
+                indices[start:start + rows, :k_eff] = np.take_along_axis(top, ordering, axis=1)
+                chords[start:start + rows, :k_eff] = np.sqrt(np.take_along_axis(top_squared, ordering, axis=1))
+
+        distances = np.where(np.isfinite(chords), chord_to_km(np.where(np.isfinite(chords), chords, 0.0)), np.inf)
+
+        if int(k) == 1:
+            return indices[:, 0].reshape(shape), distances[:, 0].reshape(shape)
+        return indices.reshape(shape + (int(k),)), distances.reshape(shape + (int(k),))
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distancia de gran círculo (km), vectorizada con broadcasting"""
+    lat1, lon1, lat2, lon2 = (np.deg2rad(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+# ============================================
+# PRUEBA Y BENCHMARK
+# ============================================
+if __name__ == "__main__":
+    import time
+
+    print("\n🧭 PROBANDO ÍNDICE ESPACIAL")
+    print("=" * 70)
+
+    rng = np.random.default_rng(42)
+    n = 5000
+    lats = rng.uniform(14.5, 32.7, n)
+    lons = rng.uniform(-118.4, -86.7, n)
+
+    started = time.perf_counter()
+    tree = SphereKDTree(lats, lons)
+    print(f"🌲 {n} estaciones indexadas en {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    queries = np.column_stack([rng.uniform(14.5, 32.7, 1000), rng.uniform(-118.4, -86.7, 1000)])
+
+    # Validar contra fuerza bruta (haversine)
+    errors = 0
+    for lat, lon in queries[:200]:
+        keys, distances = tree.query(lat, lon, k=5)
+        brute = haversine_km(lat, lon, lats, lons)
+        expected = np.sort(brute)[:5]
+        errors += not np.allclose(distances, expected)
+    print(f"✅ k=5 vs fuerza bruta: {200 - errors}/200 correctas")
+
+    started = time.perf_counter()
+    for lat, lon in queries:
+        tree.nearest(lat, lon)
+    per_query = (time.perf_counter() - started) / len(queries) * 1000
+    print(f"⚡ nearest: {per_query:.3f} ms por consulta")
+
+    started = time.perf_counter()
+    idx, dist = tree.query_many(queries[:, 0], queries[:, 1], k=3)
+    elapsed = (time.perf_counter() - started) * 1000
+    loop = [tree.query(lat, lon, k=3)[1] for lat, lon in queries]
+    print(f"📦 query_many k=3 ({len(queries)} coordenadas): {elapsed:.1f} ms, "
+          f"coincide con query(): {np.allclose(dist, np.array(loop))}")
+
+    keys, distances = tree.query_radius(19.43, -99.13, 50)
+    print(f"📍 A 50 km de CDMX: {len(keys)} estaciones (máx {distances.max():.1f} km)")
+    print("=" * 70)
@@ -0,0 +1,211 @@
+# data/station_interpolation.py
+"""
+Interpolación entre Estaciones
+==============================
+Mezcla las series mensuales de las k estaciones más cercanas a un punto
+con pesos por distancia, en vez de copiar la serie de UNA sola ciudad.
+
+POR QUÉ EXISTE:
+- get_historical_data asignaba cualquier (lat, lon) a la ciudad más cercana:
+  un clic en Oaxaca devolvía los datos de Veracruz o CDMX sin cambios
+- Con pesos, un punto entre dos ciudades recibe una mezcla de ambas y un
+  punto junto a una ciudad recibe esencialmente su serie
+
+MÉTODOS:
+- 'idw': inverso de la distancia, w = 1 / d^power
+- 'gaussian': w = exp(-(d / bandwidth)² / 2)
+- A menos de EXACT_KM de una estación se usa solo esa estación
+
+VECTORIZACIÓN:
+- Los pesos de cada punto se calculan una vez y se guardan en caché
+- La mezcla se hace sobre el bloque [estación, año, mes] completo; en los
+  años en que a una estación le falta el dato, los pesos se renormalizan
+  entre las que sí lo tienen
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+INTERPOLATION_METHODS = ('idw', 'gaussian')
+
+# Más cerca que esto (km) se considera "en la estación"
+EXACT_KM = 1.0
+
+DEFAULT_K = 3
+DEFAULT_POWER = 2.0
+DEFAULT_BANDWIDTH_KM = 250.0
+
+# Puntos con pesos en caché (los más viejos se descartan)
+MAX_CACHED_POINTS = 4096
+
+# Decimales con los que se redondea (lat, lon) para la caché (~10 m)
+CACHE_DECIMALS = 4
+
+
+def idw_weights(distances_km, power=DEFAULT_POWER):
+    """Pesos normalizados 1/d^power por fila (última dimensión = estaciones)"""
+    distances_km = np.asarray(distances_km, dtype=np.float64)
+    exact = distances_km < EXACT_KM
+
+    with np.errstate(divide='ignore'):
+        weights = 1.0 / np.maximum(distances_km, EXACT_KM) ** power
+    weights = np.where(exact.any(axis=-1, keepdims=True), exact.astype(np.float64), weights)
+    weights = np.where(np.isfinite(distances_km), weights, 0.0)
+    return weights / weights.sum(axis=-1, keepdims=True)
+
+
+def gaussian_weights(distances_km, bandwidth_km=DEFAULT_BANDWIDTH_KM):
+    """Pesos normalizados exp(-(d/bandwidth)²/2) por fila"""
+    distances_km = np.asarray(distances_km, dtype=np.float64)
+    exact = distances_km < EXACT_KM
+
+    weights = np.exp(-0.5 * (distances_km / bandwidth_km) ** 2)
+    weights = np.where(np.isfinite(distances_km), weights, 0.0)
+
+    # Si todas quedan muy lejos, el kernel se hace 0: usar la más cercana
+    empty = weights.sum(axis=-1, keepdims=True) <= 0
+    nearest = distances_km == np.min(distances_km, axis=-1, keepdims=True)
+    weights = np.where(empty, nearest.astype(np.float64), weights)
+
+    weights = np.where(exact.any(axis=-1, keepdims=True), exact.astype(np.float64), weights)
+    return weights / weights.sum(axis=-1, keepdims=True)
+
+
+def blend(weights, stack):
+    """
+    Promedio ponderado a lo largo del eje 0 ignorando NaN
+
+    Args:
+        weights: ndarray [estaciones]
+        stack: ndarray [estaciones, ...] con NaN sin dato
+
+    Returns:
+        ndarray [...]; NaN donde ninguna estación tiene dato
+    """
+    stack = np.asarray(stack, dtype=np.float64)
+    w = np.asarray(weights, dtype=np.float64).reshape((-1,) + (1,) * (stack.ndim - 1))
+
+    valid = ~np.isnan(stack)
+    total = np.where(valid, w, 0.0).sum(axis=0)
+    weighted = np.where(valid, stack * w, 0.0).sum(axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total > 0, weighted / total, np.nan)
+
+
+class StationInterpolator:
+    """Pesos por punto (con caché) sobre un SphereKDTree de estaciones"""
+
+    def __init__(self, index, k=DEFAULT_K, method='idw', power=DEFAULT_POWER,
+                 bandwidth_km=DEFAULT_BANDWIDTH_KM, max_cached=MAX_CACHED_POINTS):
+        """
+        Args:
+            index: SphereKDTree de las estaciones
+            k: estaciones que se mezclan
+            method: 'idw' o 'gaussian'
+            power: exponente de IDW
+            bandwidth_km: ancho del kernel gaussiano
+            max_cached: puntos con pesos en caché
+        """
+        if method not in INTERPOLATION_METHODS:
+            raise ValueError(f"Método de interpolación inválido: {method}")
+
+        self.index = index
+        self.k = max(1, min(int(k), len(index)))
+        self.method = method
+        self.power = power
+        self.bandwidth_km = bandwidth_km
+        self.max_cached = max_cached
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        """Para snapshots (pickle): el lock y la caché no se serializan"""
+        state = self.__dict__.copy()
+        state.pop('_lock', None)
+        state['_cache'] = OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _weights_for(self, distances_km):
+        if self.method == 'gaussian':
+            return gaussian_weights(distances_km, self.bandwidth_km)
+        return idw_weights(distances_km, self.power)
+
+    def weights(self, lat, lon):
+        """
+        Estaciones y pesos de un punto (de la caché si ya se pidió)
+
+        Returns:
+            (claves, pesos ndarray, distancias km ndarray); solo estaciones con peso > 0
+        """
+        key = (round(float(lat), CACHE_DECIMALS), round(float(lon), CACHE_DECIMALS))
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        keys, distances = self.index.query(lat, lon, k=self.k)
+        weights = self._weights_for(distances)
+        used = weights > 0
+        result = ([k for k, u in zip(keys, used) if u], weights[used], distances[used])
+
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+        return result
+
+    def weights_many(self, lats, lons):
+        """
+        Pesos de MUCHOS puntos en una llamada (sin caché)
+
+        Returns:
+            (índices [..., k] en index.keys, pesos [..., k])
+        """
+        indices, distances = self.index.query_many(lats, lons, k=self.k)
+        if self.k == 1:
+            indices, distances = indices[..., None], distances[..., None]
+        return indices, self._weights_for(distances)
+
+    def cache_info(self):
+        with self._lock:
+            return {'points': len(self._cache), 'max_points': self.max_cached}
+
+
+def interpolation_label(names, weights):
+    """'Interpolado: Veracruz 62%, Ciudad de México 38%' (o solo el nombre)"""
+    if len(names) == 1:
+        return names[0]
+    parts = [
+        f"{name} {weight * 100:.0f}%"
+        for name, weight in sorted(zip(names, weights), key=lambda item: -item[1])
+        if round(weight * 100) > 0
+    ]
+    return parts[0].rsplit(' ', 1)[0] if len(parts) == 1 else "Interpolado: " + ", ".join(parts)
+
+
+def point_stations(processor, lat, lon, variables, interpolation=None):
+    """
+    Ciudades y pesos detrás de los valores de un punto (para integrate_*)
+
+    Con procesadores sin station_weights (csv_processor.py) es la ciudad
+    más cercana con peso 1.
+
+    Returns:
+        dict {city_key: peso}, de mayor a menor peso
+    """
+    if hasattr(processor, 'station_weights'):
+        keys, weights = processor.station_weights(lat, lon, variables, interpolation)
+    else:
+        keys, weights = [processor.find_nearest_city(lat, lon)[0]], [1.0]
+    return dict(sorted(zip(keys, (float(w) for w in weights)), key=lambda item: -item[1]))
@@ -0,0 +1,105 @@
+# data/tile_cache.py
+"""
+Caché LRU de Bloques de Malla
+=============================
+Guarda en memoria los chunks ya descomprimidos de las mallas .nc, con un
+presupuesto de bytes y desalojo del menos usado recientemente (LRU).
+
+POR QUÉ EXISTE:
+- Cada lectura de netCDF4 vuelve a descomprimir (zlib) los chunks que toca
+- Clics vecinos en el mapa y búsquedas de destinos en la misma región piden
+  los mismos chunks una y otra vez
+- Con la caché, la segunda consulta sobre un chunk es una copia en memoria
+
+CLAVE: (archivo, variable, índice de chunk)
+"""
+
+import threading
+from collections import OrderedDict
+
+# Presupuesto por defecto (las mallas de data/raw caben completas)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class TileCache:
+    """Caché LRU de bloques NumPy con límite de bytes y contadores"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            max_bytes: presupuesto total; al pasarse se desalojan los bloques
+                       usados hace más tiempo
+        """
+        self.max_bytes = int(max_bytes)
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, loader):
+        """
+        Devuelve el bloque de 'key'; si no está, lo lee con loader()
+
+        Args:
+            key: (archivo, variable, índice de chunk)
+            loader: función sin argumentos que devuelve el ndarray del bloque
+
+        Returns:
+            ndarray de solo lectura (no modificar; copiar si hace falta)
+        """
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return tile
+            self.misses += 1
+
+        # La lectura va fuera del candado: otros hilos siguen leyendo la caché
+        tile = loader()
+        tile.flags.writeable = False
+
+        with self._lock:
+            if key not in self._tiles:
+                self._tiles[key] = tile
+                self.current_bytes += tile.nbytes
+                self._evict()
+            return self._tiles[key]
+
+    def _evict(self):
+        """Desaloja bloques viejos hasta quedar dentro del presupuesto"""
+        while self.current_bytes > self.max_bytes and len(self._tiles) > 1:
+            _, tile = self._tiles.popitem(last=False)
+            self.current_bytes -= tile.nbytes
+            self.evictions += 1
+
+    def invalidate(self, path=None):
+        """Borra los bloques de un archivo (o todos si path es None)"""
+        with self._lock:
+            keys = [key for key in self._tiles if path is None or key[0] == path]
+            for key in keys:
+                self.current_bytes -= self._tiles.pop(key).nbytes
+
+    def stats(self):
+        """Contadores para diagnóstico"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'tiles': len(self._tiles),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+    def __len__(self):
+        return len(self._tiles)
+
+
+# Caché compartida por todas las mallas del proceso
+DEFAULT_TILE_CACHE = TileCache()
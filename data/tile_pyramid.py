@@ -0,0 +1,304 @@
+# data/tile_pyramid.py
+"""
+Pirámide de Teselas Climáticas (z/x/y PNG)
+==========================================
+Paso de construcción que pinta cada malla de data/raw como teselas
+Web Mercator de 256x256 con una paleta FIJA y las guarda en disco:
+
+    static/tiles/<variable>/<z>/<x>/<y>.png
+    static/tiles/tiles.json                  (paleta, zooms, límites)
+
+POR QUÉ EXISTE:
+- Un ImageOverlay manda la imagen completa dentro del HTML del mapa en
+  cada rerun de Streamlit
+- Con teselas, el navegador pide solo las que ve y las guarda en su caché
+- Los mapas de components/ agregan cada variable como folium.TileLayer
+
+DETALLES:
+- Cada píxel toma el valor de la celda que lo contiene (sample 'nearest'),
+  así que se ven las celdas reales de la malla, sin suavizado inventado
+- En zooms lejanos se pinta el nivel reducido de data/grid_pyramid.py que
+  corresponde a ese zoom (ya no hace falta la resolución nativa)
+- Celdas sin dato (fuera de México) quedan transparentes; las teselas
+  completamente vacías no se escriben
+- Cada variable se pinta en una carpeta temporal que después reemplaza a
+  la anterior, y al final se borran las carpetas de variables que ya no
+  están en tiles.json: en disco solo quedan las teselas del índice
+- El PNG se codifica con zlib de la biblioteca estándar (no requiere Pillow)
+
+USO:
+    python -m data.tile_pyramid
+"""
+
+import json
+import math
+import os
+import shutil
+import struct
+import zlib
+
+import numpy as np
+
+from config.settings import TILE_CONFIG
+from data.grid_pyramid import GridPyramid
+from data.grid_reader import open_grids
+
+TILE_SIZE = 256
+
+# Subir este número si cambia el formato de las teselas
+TILE_PYRAMID_VERSION = 2
+
+
+# ============================================
+# PALETA Y PNG
+# ============================================
+def _hex_to_rgb(color):
+    color = color.lstrip('#')
+    return [int(color[k:k + 2], 16) for k in (0, 2, 4)]
+
+
+def colorize(values, colormap):
+    """
+    Valores → RGBA uint8 con la paleta fija (interpolación lineal entre colores)
+
+    Args:
+        values: ndarray 2-D con NaN sin dato
+        colormap: {'vmin', 'vmax', 'colors'} de TILE_CONFIG['colormaps']
+
+    Returns:
+        ndarray [alto, ancho, 4] uint8; NaN → transparente
+    """
+    stops = np.array([_hex_to_rgb(c) for c in colormap['colors']], dtype=np.float64)
+    span = colormap['vmax'] - colormap['vmin']
+
+    valid = ~np.isnan(values)
+    position = np.clip((np.where(valid, values, colormap['vmin']) - colormap['vmin']) / span, 0.0, 1.0)
+    position *= len(stops) - 1
+
+    low = np.minimum(np.floor(position).astype(np.int64), len(stops) - 2)
+    fraction = (position - low)[..., None]
+    rgb = stops[low] * (1 - fraction) + stops[low + 1] * fraction
+
+    rgba = np.zeros(values.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = np.round(rgb).astype(np.uint8)
+    rgba[..., 3] = np.where(valid, 255, 0)
+    return rgba
+
+
+def encode_png(rgba):
+    """RGBA uint8 [alto, ancho, 4] → bytes PNG (8 bits, sin filtro)"""
+    height, width = rgba.shape[:2]
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xFFFFFFFF)
+
+    # Cada fila lleva un byte de filtro (0 = ninguno)
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', header)
+        + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6))
+        + chunk(b'IEND', b'')
+    )
+
+
+# ============================================
+# GEOMETRÍA WEB MERCATOR
+# ============================================
+def tile_range(west, south, east, north, zoom):
+    """Rango (x0, x1, y0, y1) inclusivo de teselas que cubren la caja"""
+    n = 2 ** zoom
+
+    def to_x(lon):
+        return int(np.clip((lon + 180.0) / 360.0 * n, 0, n - 1))
+
+    def to_y(lat):
+        lat_rad = math.radians(lat)
+        y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+        return int(np.clip(y, 0, n - 1))
+
+    return to_x(west), to_x(east), to_y(north), to_y(south)
+
+
+def tile_pixel_coords(zoom, x, y, size=TILE_SIZE):
+    """Latitud/longitud del centro de cada píxel de una tesela"""
+    n = 2 ** zoom
+    offsets = (np.arange(size) + 0.5) / size
+
+    lons = (x + offsets) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+
+    return np.meshgrid(lats, lons, indexing='ij')
+
+
+# ============================================
+# CONSTRUCCIÓN
+# ============================================
+def _grid_bounds(grid):
+    """(oeste, sur, este, norte) de la malla según los límites de celda"""
+    return (
+        float(grid.lon_bounds.min()), float(grid.lat_bounds.min()),
+        float(grid.lon_bounds.max()), float(grid.lat_bounds.max())
+    )
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def read_tiles_index(folder=None):
+    """Lee tiles.json ({variable: info de la capa}); {} si no existe"""
+    folder = folder or TILE_CONFIG['folder']
+    index_path = os.path.join(folder, 'tiles.json')
+
+    if not os.path.exists(index_path):
+        return {}
+
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if index.get('version') != TILE_PYRAMID_VERSION:
+        return {}
+    return index.get('layers', {})
+
+
+def build_variable_tiles(grid, variable, folder, min_zoom, max_zoom, colormap):
+    """
+    Pinta todas las teselas de una variable
+
+    Returns:
+        número de teselas escritas
+    """
+    west, south, east, north = _grid_bounds(grid)
+    pyramid = GridPyramid(grid)
+    written = 0
+
+    for zoom in range(min_zoom, max_zoom + 1):
+        x0, x1, y0, y1 = tile_range(west, south, east, north, zoom)
+        level = pyramid.for_zoom(zoom)
+
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                lats, lons = tile_pixel_coords(zoom, x, y)
+                if level.factor == 1:
+                    values = grid.sample(lats, lons, method='nearest')
+                else:
+                    values = level.sample(lats, lons)
+
+                if np.isnan(values).all():
+                    continue
+
+                tile_dir = os.path.join(folder, variable, str(zoom), str(x))
+                os.makedirs(tile_dir, exist_ok=True)
+                with open(os.path.join(tile_dir, f"{y}.png"), 'wb') as f:
+                    f.write(encode_png(colorize(values, colormap)))
+                written += 1
+
+    return written
+
+
+def _swap_dir(new_dir, target_dir):
+    """Pone new_dir en lugar de target_dir y borra la versión anterior"""
+    old_dir = f"{target_dir}.{os.getpid()}.old"
+    if os.path.isdir(target_dir):
+        os.replace(target_dir, old_dir)
+    os.replace(new_dir, target_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _remove_stale_layers(folder, layers):
+    """Borra carpetas de variables (o temporales) que no están en el índice"""
+    for entry in os.scandir(folder):
+        if entry.is_dir() and entry.name not in layers:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            print(f"   🗑️ {entry.name}: eliminada (ya no está en el índice)")
+
+
+def build_tile_pyramid(raw_folder='data/raw', folder=None, min_zoom=None, max_zoom=None, force=False):
+    """
+    Genera (o actualiza) la pirámide de todas las variables
+
+    Una variable se vuelve a pintar solo si cambió su .nc, la paleta o el
+    rango de zooms (a menos que force=True). Las teselas de variables o
+    zooms que ya no se generan se borran del disco.
+
+    Returns:
+        dict {variable: info de la capa}
+    """
+    folder = folder or TILE_CONFIG['folder']
+    min_zoom = TILE_CONFIG['min_zoom'] if min_zoom is None else min_zoom
+    max_zoom = TILE_CONFIG['max_zoom'] if max_zoom is None else max_zoom
+
+    previous = read_tiles_index(folder)
+    layers = {}
+
+    for variable, grid in open_grids(raw_folder).items():
+        colormap = TILE_CONFIG['colormaps'].get(variable)
+        if colormap is None:
+            continue
+
+        grid.open()
+        layer = {
+            'url': f"{TILE_CONFIG['url']}/{variable}/{{z}}/{{x}}/{{y}}.png",
+            'source': os.path.basename(grid.path),
+            'signature': _source_signature(grid.path),
+            'colormap': colormap,
+            'units': grid.units,
+            'min_zoom': min_zoom,
+            'max_zoom': max_zoom,
+            'bounds': _grid_bounds(grid)
+        }
+
+        old = previous.get(variable)
+        if not force and old and all(old.get(k) == v for k, v in layer.items() if k not in ('url', 'bounds')):
+            layers[variable] = dict(old, url=layer['url'])
+            print(f"   ⏭️ {variable}: sin cambios")
+            continue
+
+        # Se pinta aparte y se cambia de carpeta al terminar: no quedan
+        # teselas de zooms que ya no se generan
+        tmp_folder = os.path.join(folder, f".{variable}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        layer['tiles'] = build_variable_tiles(grid, variable, tmp_folder, min_zoom, max_zoom, colormap)
+        built_dir = os.path.join(tmp_folder, variable)
+        os.makedirs(built_dir, exist_ok=True)
+        _swap_dir(built_dir, os.path.join(folder, variable))
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        layers[variable] = layer
+        print(f"   🖼️ {variable}: {layer['tiles']} teselas (z{min_zoom}-{max_zoom})")
+
+    os.makedirs(folder, exist_ok=True)
+    index_path = os.path.join(folder, 'tiles.json')
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': TILE_PYRAMID_VERSION, 'layers': layers}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, index_path)
+
+    _remove_stale_layers(folder, layers)
+    return layers
+
+
+# ============================================
+# COMANDO: generar teselas
+# ============================================
+if __name__ == "__main__":
+    import time
+
+    print("\n🗺️ GENERANDO PIRÁMIDE DE TESELAS")
+    print("=" * 70)
+
+    started = time.perf_counter()
+    built = build_tile_pyramid()
+    elapsed = time.perf_counter() - started
+
+    total = sum(layer.get('tiles', 0) for layer in built.values())
+    print(f"\n✅ {len(built)} capas, {total} teselas en {TILE_CONFIG['folder']} ({elapsed:.1f} s)")
+    print("=" * 70)
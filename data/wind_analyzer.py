@@ -13,6 +13,8 @@ POR QUÉ EXISTE:
 import numpy as np
 from datetime import datetime
 
+from data.station_interpolation import point_stations
+
 class WindAnalyzer:
     """
     Analiza datos de viento y categoriza intensidades
@@ -177,7 +179,7 @@ class WindAnalyzer:
         return message
 
 
-def integrate_wind_with_processor(processor, wind_analyzer, lat, lon, month, day):
+def integrate_wind_with_processor(processor, wind_analyzer, lat, lon, month, day, interpolation=None):
     """
     Integra analizador de viento con el procesador de CSVs
     
@@ -186,20 +188,25 @@ def integrate_wind_with_processor(processor, wind_analyzer, lat, lon, month, day
         wind_analyzer: WindAnalyzer
         lat, lon: coordenadas
         month, day: fecha
+        interpolation: None (la del procesador), 'nearest', 'idw' o 'gaussian'
     
     Returns:
-        dict con análisis completo de viento
+        dict con análisis completo de viento ('interpolated' es True si los
+        valores son una mezcla de ciudades)
     """
+    options = {} if interpolation is None else {'interpolation': interpolation}
+    
     # Obtener datos mensuales de viento
     wind_values, city_name = processor.get_historical_data(
-        lat, lon, 'viento', month, day
+        lat, lon, 'viento', month, day, **options
     )
     
     if wind_values is None:
         return None
     
-    # Determinar city_key
-    city_key = processor.find_nearest_city(lat, lon)[0]
+    # Ciudades de las que salieron los valores (la de mayor peso primero)
+    city_weights = point_stations(processor, lat, lon, ['viento'], interpolation)
+    city_key = next(iter(city_weights), None)
     
     # Analizar
     date = datetime(2024, month, day)
@@ -213,6 +220,7 @@ def integrate_wind_with_processor(processor, wind_analyzer, lat, lon, month, day
             analysis, date
         )
         analysis['city_name'] = city_name
+        analysis['interpolated'] = len(city_weights) > 1
     
     return analysis
 